@@ -3,6 +3,13 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Under an ASGI server, set ASYNC_VIEWS=True so the dashboards and the report
+page are served by their async views, e.g.
+
+    ASYNC_VIEWS=True uvicorn config.asgi:application --workers 4
+
+`manage.py benchmark_asgi` compares the sync and async views through this handler.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
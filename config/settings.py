@@ -28,12 +28,14 @@ INSTALLED_APPS = [
     'users',
     'widget_tweaks',
     'service',
+    'utils',
 ]
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'utils.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,12 +63,32 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Serve the dashboards and the report page with their async variants; set
+# when running under an ASGI server (see config/asgi.py)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == 'True'
+
+# Server-Sent Events push of notifications and request status (see utils.events).
+# The stream holds its connection open, so it is only offered under ASGI.
+EVENT_STREAM = os.getenv('EVENT_STREAM', str(ASYNC_VIEWS)) == 'True'
+EVENT_BROKER = os.getenv('EVENT_BROKER', 'database')  # 'local' for a single worker process
+EVENT_POLL_INTERVAL = float(os.getenv('EVENT_POLL_INTERVAL', 1.0))  # seconds between polls of the Event table
+EVENT_RETENTION = 60 * 60  # seconds an event can be replayed after a reconnect
+EVENT_BACKLOG = 200  # events replayed at most after a reconnect
+EVENT_QUEUE_SIZE = 100  # events waiting for a slow client before its stream is ended
+EVENT_HEARTBEAT = 15  # seconds between keep-alive comments
 
 # Database
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # How long a writer waits for SQLite's write lock. Transactions that
+            # must take it up front use utils.db.write_lock (BEGIN IMMEDIATE)
+            'timeout': 20,
+        },
     }
 }
 
@@ -90,5 +112,54 @@ STATICFILES_DIRS = [BASE_DIR / "static",]
 
 LOGIN_REDIRECT_URL = '/'
 
+# Background report exports (see utils.jobs)
+REPORT_EXPORT_DIR = BASE_DIR / 'report_exports'
+REPORT_JOB_TTL = int(os.getenv('REPORT_JOB_TTL', 60 * 60))  # seconds a finished report is reused
+
+# Request attachments, stored by content hash (see service.storage)
+ATTACHMENT_ROOT = Path(os.getenv('ATTACHMENT_ROOT', BASE_DIR / 'attachments'))
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024  # bytes hashed and written per step
+ATTACHMENT_GC_GRACE = int(os.getenv('ATTACHMENT_GC_GRACE', 24 * 60 * 60))  # seconds an unused blob is kept
+
+# Resolution deadlines (see service.sla)
+SLA_DUE_SOON_HOURS = 8  # window of the due-soon queue
+
+# SQL query budgets per URL name (see utils.middleware.QueryBudgetMiddleware)
+QUERY_BUDGET_DEFAULT = int(os.getenv('QUERY_BUDGET_DEFAULT', 20))
+# List pages include the ChangeVersion lookup of their conditional GET validator;
+# every page reads the notification badge versions (one query, see users.notifications)
+# and, on a cold cache, rebuilds the badge (two more). Budgets are for a cold cache.
+QUERY_BUDGETS = {
+    'adminn_dashboard': 10,
+    'adminn_dashboard_async': 10,
+    'staff_dashboard': 9,
+    'staff_dashboard_async': 9,
+    'technician_dashboard': 9,
+    'technician_dashboard_async': 9,
+    'manager_dashboard': 6,
+    'all_requests': 11,
+    'my_requests': 8,
+    'pending_requests': 9,
+    'overdue_requests': 9,
+    'due_soon_requests': 10,
+    'technician_assigned_requests': 8,
+    'technician_accepted_requests': 8,
+    'technician_rejected_requests': 8,
+    'technician_completed_requests': 8,
+    'technician_awaiting_confirmation': 8,
+    'technician_in_progress': 8,
+    # The summary reads the rollups: the same queries for an hour or for years
+    'request_reports': 16,
+    'request_reports_async': 16,
+    'request_reports_print': 5,
+    # Counters and rollups are written two statements per 50 keys touched
+    # (utils.db.apply_count_deltas), not per request
+    'bulk_update_requests': 15,
+    'assign_technician': 20,
+    # 15 plus one UPDATE per technician given requests, not per request
+    'auto_assign_requests': 20,
+}
+QUERY_BUDGET_HEADERS = DEBUG or os.getenv('QUERY_BUDGET_HEADERS') == 'True'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
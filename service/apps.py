@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'service'
+
+    def ready(self):
+        from . import signals, counters, rollups, attachments, freshness, sla  # noqa: F401  (connect receivers)
+        from .search import ensure_search_index
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,274 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from utils.db import write_lock
+
+from .models import ServiceRequest, TechnicianProfile
+from .signals import TRACKED_FIELDS, remember_state, request_changed, state_of
+
+# Statuses requests can be assigned (or reassigned) from in bulk
+ASSIGNABLE_STATUSES = ('New', 'Rejected')
+
+# Statuses an admin can move requests to in bulk, with the statuses each may come from.
+# Not 'Completed': only the requester confirms completion (views.confirm_completion).
+BULK_TRANSITIONS = {
+    # Back to the pending queue, unassigned
+    'New': ('Assigned', 'Rejected'),
+    # Needs a reason, as a technician's rejection does
+    'Rejected': ('New', 'Assigned'),
+}
+
+
+class AssignmentConflict(Exception):
+    """The request was assigned or changed by someone else in the meantime."""
+
+
+# Rows an assignment may still overwrite when its UPDATE runs
+UNASSIGNED = Q(status='New', assigned_to__isnull=True)
+
+# An assignment starts over: a previous technician's rejection goes
+CLEARED_REJECTION = {'rejection_reason': None, 'rejected_at': None}
+
+
+def with_workload(technicians):
+    """Annotate a TechnicianProfile queryset with `active_count` in the same query."""
+    return technicians.annotate(
+        active_count=Count(
+            'user__requests_assigned',
+            filter=Q(user__requests_assigned__status__in=TechnicianProfile.ACTIVE_STATUSES),
+            distinct=True,
+        )
+    )
+
+
+def ranked_technicians(category):
+    """Technicians with expertise in `category`, least loaded first (one query)."""
+    technicians = TechnicianProfile.objects.filter(expertise=category).select_related('user')
+    return with_workload(technicians).order_by('active_count', 'id')
+
+
+def assign_request(request_id, technician):
+    """
+    Assign an unassigned request to `technician` (a TechnicianProfile).
+    The UPDATE only matches the row while it is still unassigned, so two
+    admins cannot both assign it.
+    """
+    with write_lock():
+        service_request = ServiceRequest.objects.select_for_update().filter(pk=request_id).filter(UNASSIGNED).first()
+        if service_request is None:
+            raise AssignmentConflict(f"Request #{request_id} is already assigned.")
+        write_changes(
+            [({'assigned_to_id': technician.user_id, 'status': 'Assigned', **CLEARED_REJECTION}, [service_request])],
+            guard=UNASSIGNED,
+        )
+    return service_request
+
+
+def pick_technicians(service_requests):
+    """
+    The least-loaded technician with matching expertise for each request, in
+    order, as (service_request, technician) pairs; requests without a qualified
+    technician are left out. Locks every candidate technician (where the
+    backend has row locks), so it must run in the transaction that writes the
+    assignments.
+    """
+    category_ids = {r.category_id for r in service_requests}
+    candidate_ids = sorted(set(
+        TechnicianProfile.objects.select_for_update()
+        .filter(expertise__in=category_ids)
+        .order_by('id')
+        .values_list('id', flat=True)
+    ))
+    technicians = {
+        t.id: t for t in with_workload(
+            TechnicianProfile.objects.filter(id__in=candidate_ids).select_related('user')
+        )
+    }
+    experts = {}
+    for technician_id, category_id in TechnicianProfile.expertise.through.objects.filter(
+        technicianprofile_id__in=candidate_ids, servicecategory_id__in=category_ids
+    ).values_list('technicianprofile_id', 'servicecategory_id'):
+        experts.setdefault(category_id, []).append(technicians[technician_id])
+
+    pairs = []
+    for service_request in service_requests:
+        candidates = experts.get(service_request.category_id)
+        if not candidates:
+            continue
+        technician = min(candidates, key=lambda t: (t.active_count, t.id))
+        technician.active_count += 1
+        pairs.append((service_request, technician))
+    return pairs
+
+
+def write_changes(groups, guard=None):
+    """
+    Apply `groups` of (values, service_requests) with one UPDATE per group and
+    send request_changed for every row. `values` are column values for
+    QuerySet.update(); status_rank, open_due_at and updated_at are added here.
+    Runs inside the caller's transaction. `guard` (a Q) is what the rows must
+    still match when they are written: if another writer got there first,
+    fewer rows match and AssignmentConflict is raised, rolling the transaction
+    back. This holds on backends without row locks (SQLite ignores
+    select_for_update).
+    """
+    now = timezone.now()
+    changes = []
+    for values, service_requests in groups:
+        values = {**values, 'updated_at': now}
+        if 'status' in values:
+            values['status_rank'] = ServiceRequest.STATUS_RANKS[values['status']]
+            values['open_due_at'] = F('due_at') if values['status'] in ServiceRequest.SLA_OPEN_STATUSES else None
+        rows = ServiceRequest.objects.filter(pk__in=[r.pk for r in service_requests])
+        if guard is not None:
+            rows = rows.filter(guard)
+        if rows.update(**values) != len(service_requests):
+            raise AssignmentConflict("Some of the requests were changed by someone else in the meantime.")
+        for service_request in service_requests:
+            old = state_of(service_request)
+            for name, value in values.items():
+                if hasattr(value, 'resolve_expression'):
+                    # Computed by the database: read from the row when needed
+                    service_request.__dict__.pop(name, None)
+                else:
+                    setattr(service_request, name, value)
+            remember_state(service_request)
+            changes.append((old, state_of(service_request)))
+    if changes:
+        request_changed.send(sender=ServiceRequest, changes=changes)
+
+
+def write_assignments(pairs, guard=UNASSIGNED):
+    """Assign (service_request, technician) pairs with one UPDATE per technician."""
+    by_technician = defaultdict(list)
+    for service_request, technician in pairs:
+        by_technician[technician.user_id].append(service_request)
+    write_changes(
+        (
+            ({'assigned_to_id': user_id, 'status': 'Assigned', **CLEARED_REJECTION}, service_requests)
+            for user_id, service_requests in by_technician.items()
+        ),
+        guard=guard,
+    )
+
+
+def auto_assign(request_ids=None):
+    """
+    Assign unassigned 'New' requests (all of them, or only `request_ids`) to the
+    least-loaded technician with matching expertise, oldest request first.
+
+    The pending requests and every candidate technician are locked for the
+    duration of the transaction, so concurrent runs cannot pick from stale
+    workloads: with select_for_update on PostgreSQL/MySQL, by the write lock
+    SQLite takes when the transaction starts (utils.db.write_lock). The
+    UPDATEs also only match rows that are still unassigned, raising
+    AssignmentConflict otherwise. Returns a list of (service_request,
+    technician) pairs; requests without a qualified technician are left
+    untouched.
+    """
+    with write_lock():
+        pending = ServiceRequest.objects.select_for_update().filter(
+            status='New', assigned_to__isnull=True
+        )
+        if request_ids is not None:
+            pending = pending.filter(pk__in=request_ids)
+        pending = list(pending.order_by('created_at', 'id'))
+        if not pending:
+            return []
+
+        assigned = pick_technicians(pending)
+        write_assignments(assigned)
+    return assigned
+
+
+# --- Bulk actions ---
+# The admin's form carries the updated_at of every selected row as it was
+# displayed (its version). Rows are locked and compared with those versions;
+# a row that another admin changed in the meantime is reported as a conflict
+# and left alone, the others are written with set-based UPDATEs.
+
+def lock_versions(versions):
+    """
+    Lock the requests of `versions` ({id: updated_at}) in id order. Returns
+    (rows, conflicts): the rows still at their version, oldest first, and
+    {id: reason} for those deleted or changed since.
+    """
+    rows = (
+        ServiceRequest.objects.select_for_update()
+        .filter(pk__in=list(versions))
+        .only(*TRACKED_FIELDS, 'updated_at', 'created_at')
+        .order_by('pk')
+    )
+    current, conflicts = [], {}
+    found = set()
+    for row in rows:
+        found.add(row.pk)
+        if row.updated_at != versions[row.pk]:
+            conflicts[row.pk] = "was changed by someone else in the meantime"
+        else:
+            current.append(row)
+    for pk in versions:
+        if pk not in found:
+            conflicts[pk] = "no longer exists"
+    current.sort(key=lambda row: (row.created_at, row.pk))
+    return current, conflicts
+
+
+def bulk_assign(versions, technician=None):
+    """
+    Assign the requests of `versions` ({id: updated_at}) to `technician` (a
+    TechnicianProfile), or with technician=None to the least-loaded expert of
+    each request's category. One transaction, one UPDATE per technician.
+    Returns (assigned, conflicts): the assigned requests and {id: reason}.
+    """
+    with write_lock():
+        rows, conflicts = lock_versions(versions)
+        assignable = []
+        for row in rows:
+            if row.status not in ASSIGNABLE_STATUSES:
+                conflicts[row.pk] = f"cannot be assigned while {row.status}"
+            elif row.status == 'New' and row.assigned_to_id is not None:
+                conflicts[row.pk] = "is already assigned"
+            else:
+                assignable.append(row)
+
+        if technician is None:
+            pairs = pick_technicians(assignable)
+            picked = {service_request.pk for service_request, _ in pairs}
+            for row in assignable:
+                if row.pk not in picked:
+                    conflicts[row.pk] = "has no technician with matching expertise"
+        else:
+            pairs = [(row, technician) for row in assignable]
+        write_assignments(pairs, guard=UNASSIGNED | Q(status='Rejected'))
+    return [service_request for service_request, _ in pairs], conflicts
+
+
+def bulk_transition(versions, status, reason=None):
+    """
+    Move the requests of `versions` ({id: updated_at}) to `status` (a key of
+    BULK_TRANSITIONS) with one UPDATE. Moving back to 'New' also unassigns
+    and clears any rejection; moving to 'Rejected' records `reason`.
+    Returns (changed, conflicts): the changed requests and {id: reason}.
+    """
+    allowed = BULK_TRANSITIONS[status]
+    if status == 'Rejected' and not reason:
+        raise ValueError("A bulk rejection needs a reason.")
+    with write_lock():
+        rows, conflicts = lock_versions(versions)
+        changed = []
+        for row in rows:
+            if row.status not in allowed:
+                conflicts[row.pk] = f"cannot move from {row.status} to {status}"
+            else:
+                changed.append(row)
+
+        values = {'status': status}
+        if status == 'New':
+            values.update(assigned_to_id=None, **CLEARED_REJECTION)
+        elif status == 'Rejected':
+            values.update(rejection_reason=reason, rejected_at=timezone.now())
+        write_changes([(values, changed)] if changed else [], guard=Q(status__in=allowed))
+    return changed, conflicts
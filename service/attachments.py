@@ -0,0 +1,192 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from utils.db import write_lock
+
+from .models import AttachmentBlob, ServiceRequest
+from .storage import attachment_storage
+
+# Attachments are shared between requests: AttachmentBlob.ref_count says how
+# many requests use each blob. The receivers below move references as
+# requests are saved and deleted, in the same transaction as the row.
+
+
+def acquire(name):
+    storage = attachment_storage()
+    digest = storage.digest_of(name)
+    if digest is None:
+        return
+    blobs = AttachmentBlob.objects.filter(digest=digest)
+    if blobs.update(ref_count=F('ref_count') + 1, released_at=None):
+        return
+    try:
+        with transaction.atomic():
+            AttachmentBlob.objects.create(digest=digest, size=storage.size(name), ref_count=1)
+    except IntegrityError:
+        # Another upload of the same content created the row first
+        blobs.update(ref_count=F('ref_count') + 1, released_at=None)
+
+
+def release(name):
+    digest = attachment_storage().digest_of(name)
+    if digest is None:
+        return
+    blobs = AttachmentBlob.objects.filter(digest=digest, ref_count__gt=0)
+    blobs.update(ref_count=F('ref_count') - 1)
+    AttachmentBlob.objects.filter(digest=digest, ref_count=0, released_at=None).update(released_at=timezone.now())
+
+
+def attachment_name_of(instance):
+    """Stored name of the attachment, or None when the field was not loaded."""
+    if 'attachment' not in instance.__dict__:
+        return None
+    value = instance.__dict__['attachment']
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=ServiceRequest)
+def remember_attachment(sender, instance, **kwargs):
+    instance._stored_attachment = attachment_name_of(instance) if instance.pk is not None else ''
+
+
+@receiver(pre_save, sender=ServiceRequest)
+def capture_upload_name(sender, instance, update_fields=None, **kwargs):
+    # Before FileField.pre_save stores the file, its name is still the uploaded one
+    if update_fields is not None and 'attachment' not in update_fields:
+        return
+    attachment = instance.attachment
+    if attachment and not attachment._committed:
+        instance.attachment_name = os.path.basename(attachment.name)[:255]
+    elif not attachment:
+        instance.attachment_name = ''
+
+
+@receiver(post_save, sender=ServiceRequest)
+def move_attachment_reference(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'attachment' not in update_fields:
+        return
+    old = instance._stored_attachment
+    if old is None:
+        # The instance was loaded without the attachment; its old value is unknown
+        return
+    new = attachment_name_of(instance)
+    if new != old:
+        acquire(new)
+        release(old)
+    instance._stored_attachment = new
+
+
+@receiver(post_delete, sender=ServiceRequest)
+def release_attachment(sender, instance, **kwargs):
+    name = attachment_name_of(instance)
+    if name is None:
+        name = instance._stored_attachment
+    if name:
+        release(name)
+
+
+def recount_blobs():
+    """
+    Recompute every ref_count from the ServiceRequest table, adding rows for
+    blobs that are referenced but not counted. Returns the number of rows fixed.
+    """
+    storage = attachment_storage()
+    counts = {}
+    for name, n in (
+        ServiceRequest.objects.exclude(attachment='').exclude(attachment__isnull=True)
+        .order_by().values_list('attachment').annotate(n=Count('id'))
+    ):
+        digest = storage.digest_of(name)
+        if digest is not None and storage.exists(name):
+            counts[digest] = n
+
+    fixed = 0
+    now = timezone.now()
+    with write_lock():
+        for blob in AttachmentBlob.objects.select_for_update().order_by('pk'):
+            count = counts.pop(blob.digest, 0)
+            if blob.ref_count != count:
+                blob.ref_count = count
+                blob.released_at = None if count else (blob.released_at or now)
+                blob.save(update_fields=['ref_count', 'released_at'])
+                fixed += 1
+        AttachmentBlob.objects.bulk_create(
+            [
+                AttachmentBlob(digest=digest, size=storage.size(storage.blob_name(digest)), ref_count=n)
+                for digest, n in counts.items()
+            ],
+            ignore_conflicts=True,
+        )
+    return fixed + len(counts)
+
+
+def collect_garbage(grace, dry_run=False):
+    """
+    Delete blobs that no request has used for `grace` (a timedelta), blob files
+    without a row and abandoned temporary files of the same age. Returns
+    (files deleted, bytes freed).
+    """
+    storage = attachment_storage()
+    cutoff = timezone.now() - grace
+    deleted, freed = 0, 0
+
+    def is_stale(path):
+        # A fresh mtime means an upload just reused (or is writing) the file
+        try:
+            return os.path.getmtime(path) < cutoff.timestamp()
+        except FileNotFoundError:
+            return False
+
+    def remove(path):
+        nonlocal deleted, freed
+        size = os.path.getsize(path)
+        if not dry_run:
+            os.unlink(path)
+        deleted += 1
+        freed += size
+
+    released = AttachmentBlob.objects.filter(ref_count=0, released_at__lte=cutoff).values_list('pk', flat=True)
+    for pk in list(released):
+        with write_lock():
+            blob = AttachmentBlob.objects.select_for_update().filter(pk=pk, ref_count=0).first()
+            if blob is None:
+                continue
+            path = storage.path(storage.blob_name(blob.digest))
+            if os.path.exists(path):
+                if not is_stale(path):
+                    continue
+                remove(path)
+            if not dry_run:
+                blob.delete()
+
+    known = set(AttachmentBlob.objects.values_list('digest', flat=True))
+    blob_root = storage.path(storage.prefix)
+    for directory, _, files in os.walk(blob_root):
+        for file_name in files:
+            path = os.path.join(directory, file_name)
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            digest = storage.digest_of(name)
+            if digest in known or not is_stale(path):
+                continue
+            # Still referenced although uncounted: left for `gc_attachments --recount`
+            if digest is not None and ServiceRequest.objects.filter(attachment=name).exists():
+                continue
+            remove(path)
+
+    if os.path.isdir(storage.temp_dir()):
+        for file_name in os.listdir(storage.temp_dir()):
+            path = os.path.join(storage.temp_dir(), file_name)
+            if is_stale(path):
+                remove(path)
+    return deleted, freed
+
+
+def default_grace():
+    return timedelta(seconds=settings.ATTACHMENT_GC_GRACE)
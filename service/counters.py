@@ -0,0 +1,82 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count
+from django.dispatch import receiver
+
+from utils.db import apply_count_deltas
+
+from .metrics import alist, build_breakdown, category_choices
+from .models import RequestCounter, ServiceRequest
+from .signals import request_changed
+
+ROLE_FIELDS = [
+    (RequestCounter.ROLE_CREATED, 'created_by_id'),
+    (RequestCounter.ROLE_ASSIGNED, 'assigned_to_id'),
+]
+
+
+def counter_keys(state):
+    """(user_id, role, status, category_id) keys a request state counts towards."""
+    keys = []
+    if state is None:
+        return keys
+    for role, attname in ROLE_FIELDS:
+        user_id = getattr(state, attname)
+        if user_id is not None:
+            keys.append((user_id, role, state.status, state.category_id))
+    return keys
+
+
+def counter_deltas(changes):
+    deltas = Counter()
+    for old, new in changes:
+        for key in counter_keys(old):
+            deltas[key] -= 1
+        for key in counter_keys(new):
+            deltas[key] += 1
+    return deltas
+
+
+def apply_deltas(deltas):
+    apply_count_deltas(RequestCounter, ['user_id', 'role', 'status', 'category_id'], deltas)
+
+
+@receiver(request_changed)
+def update_request_counters(sender, changes, **kwargs):
+    apply_deltas(counter_deltas(changes))
+
+
+def rebuild_counters():
+    """Recompute every counter from the ServiceRequest table."""
+    counters = []
+    for role, attname in ROLE_FIELDS:
+        rows = (
+            ServiceRequest.objects.filter(**{f'{attname}__isnull': False})
+            .order_by()
+            .values_list(attname, 'status', 'category_id')
+            .annotate(n=Count('id'))
+        )
+        counters.extend(
+            RequestCounter(user_id=user_id, role=role, status=status, category_id=category_id, count=n)
+            for user_id, status, category_id, n in rows
+        )
+    with transaction.atomic():
+        RequestCounter.objects.all().delete()
+        RequestCounter.objects.bulk_create(counters, batch_size=1000)
+    return len(counters)
+
+
+def counter_rows(user, role):
+    return RequestCounter.objects.filter(user=user, role=role).values_list(
+        'status', 'category_id', 'count'
+    )
+
+
+def user_breakdown(user, role):
+    """RequestBreakdown for one user, read from the counter table."""
+    return build_breakdown(counter_rows(user, role), category_choices())
+
+
+async def auser_breakdown(user, role):
+    return build_breakdown(await alist(counter_rows(user, role)), await alist(category_choices()))
@@ -1,5 +1,6 @@
 from django import forms
-from .models import ServiceRequest, Location
+from .models import ServiceRequest
+from .locations import resolve_location
 
 class ServiceRequestForm(forms.ModelForm):
     block_building = forms.CharField(max_length=100, required=True, label="Block/Building")
@@ -27,12 +28,7 @@ class ServiceRequestForm(forms.ModelForm):
         floor = self.cleaned_data['floor']
         room = self.cleaned_data['room']
 
-        location_obj, created = Location.objects.get_or_create(
-            block_building=block,
-            floor=floor,
-            room=room
-        )
-        service_request.location = location_obj
+        service_request.location_id = resolve_location(block, floor, room)
 
         if commit:
             service_request.save()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.db.models import Subquery
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from users.notifications import get_badge
+from users.roles import primary_group, user_groups
+
+from .models import ChangeVersion, Location, PriorityLevel, ServiceCategory, ServiceRequest, TechnicianProfile
+from .signals import request_changed
+from .versions import ALL, REFERENCE, bump_versions, user_key, versions
+
+# Conditional GET for the request pages. A page's ETag is a hash of the
+# versions of the data it shows (ChangeVersion counters, the request row's
+# updated_at), the notification badge, the user, their groups and the CSRF
+# cookie, so an unchanged page costs one or two small queries and a 304
+# instead of a render.
+
+
+@receiver(request_changed)
+def bump_request_versions(sender, changes, **kwargs):
+    keys = {ALL}
+    for state in (state for change in changes for state in change if state is not None):
+        keys.add(user_key(state.created_by_id))
+        if state.assigned_to_id is not None:
+            keys.add(user_key(state.assigned_to_id))
+    bump_versions(keys)
+
+
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_save, sender=PriorityLevel)
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=TechnicianProfile)
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=ServiceCategory)
+@receiver(post_delete, sender=PriorityLevel)
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=TechnicianProfile)
+@receiver(post_delete, sender=get_user_model())
+def bump_reference_version(sender, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no page shows
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_versions([REFERENCE])
+
+
+@lru_cache(maxsize=None)
+def template_stamp():
+    """Newest template modification time: a deploy that changes templates changes every ETag."""
+    newest = 0
+    for directory in settings.TEMPLATES[0]['DIRS']:
+        for root, _, files in os.walk(directory):
+            for file_name in files:
+                newest = max(newest, os.path.getmtime(os.path.join(root, file_name)))
+    return newest
+
+
+def page_etag(request, data_version):
+    """ETag of a page showing data at `data_version`, as rendered for this request."""
+    user = request.user
+    user_group = primary_group(user)
+    unread_count, latest = get_badge(user, user_group) if user_group else (0, [])
+    state = (
+        data_version,
+        template_stamp.__wrapped__() if settings.DEBUG else template_stamp(),
+        request.get_full_path(),
+        user.pk,
+        user.get_username(),
+        user.get_full_name(),
+        # The role decides the navbar and the actions shown
+        user_groups(user),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        unread_count,
+        [n.pk for n in latest],
+    )
+    return hashlib.sha1(repr(state).encode()).hexdigest()
+
+
+def conditional_page(data_version):
+    """
+    Answer GET/HEAD with 304 Not Modified when the client's ETag still
+    matches. `data_version(request, **kwargs)` returns what the page's data
+    depends on, or None when the view should run (e.g. to 404). Pages with
+    pending flash messages are always rendered. Place below the access
+    decorators so only authorized users get validators.
+    """
+    def etag(request, *args, **kwargs):
+        version = data_version(request, **kwargs)
+        return None if version is None else page_etag(request, version)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+            response = conditional_view(request, *args, **kwargs)
+            # Always revalidate: the browser must not show a stale queue from its cache
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+# --- Data versions of the pages ---
+
+def own_requests_version(request, **kwargs):
+    """Lists of the requests a user created or is assigned."""
+    return versions([user_key(request.user.pk), REFERENCE])
+
+
+def all_requests_version(request, **kwargs):
+    """Admin lists over every request."""
+    return versions([ALL, REFERENCE])
+
+
+def request_version(lookup):
+    """Detail page of the request found with `lookup(request, **kwargs)` filters, as the view finds it."""
+    def data_version(request, **kwargs):
+        reference = ChangeVersion.objects.filter(key=REFERENCE).values('version')[:1]
+        row = (
+            ServiceRequest.objects.filter(**lookup(request, **kwargs))
+            .annotate(reference_version=Subquery(reference))
+            .values_list('updated_at', 'reference_version')
+            .first()
+        )
+        if row is None:
+            return None
+        updated_at, reference_version = row
+        return updated_at.isoformat(), reference_version or 0
+    return data_version
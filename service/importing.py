@@ -0,0 +1,164 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Location, PriorityLevel, ServiceCategory, ServiceRequest
+from .seeding import explicit_timestamps
+from .signals import request_changed, state_of
+
+User = get_user_model()
+
+STATUSES = {status for status, _ in ServiceRequest.STATUS_CHOICES}
+
+REQUIRED_FIELDS = ('title', 'description', 'category', 'created_by')
+
+LOCATION_FIELDS = ('block_building', 'floor', 'room')
+
+
+class ImportRecordError(ValueError):
+    pass
+
+
+def lookup_key(value):
+    return ' '.join(str(value).split()).casefold()
+
+
+class RequestImporter:
+    """
+    Turns JSONL records into ServiceRequests and writes them in batches.
+
+    A record is a JSON object with `title`, `description`, `category` (name)
+    and `created_by` (username), and optionally `priority` (name),
+    `assigned_to` (username), `status`, `block_building`/`floor`/`room`,
+    `rejection_reason`, `created_at` and `updated_at` (ISO 8601).
+    Categories, priorities and users are resolved through maps loaded once;
+    unknown names are errors. Missing locations are created.
+    """
+
+    def __init__(self):
+        self.categories = {lookup_key(name): pk for pk, name in ServiceCategory.objects.values_list('pk', 'name')}
+        self.priorities = {}
+        self.hours_by_priority = {}
+        for pk, name, hours in PriorityLevel.objects.values_list('pk', 'name', 'resolution_time_hours'):
+            self.priorities[lookup_key(name)] = pk
+            self.hours_by_priority[pk] = hours
+        # Usernames are case-sensitive: matched exactly
+        self.users = {name: pk for pk, name in User.objects.values_list('pk', User.USERNAME_FIELD)}
+        self.locations = dict(Location.objects.values_list('key', 'pk'))
+        self.max_lengths = {
+            field.name: field.max_length
+            for field in ServiceRequest._meta.concrete_fields
+            if getattr(field, 'max_length', None)
+        }
+
+    def parse_line(self, line):
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise ImportRecordError(f"Invalid JSON: {exc}") from None
+        if not isinstance(record, dict):
+            raise ImportRecordError("A record must be a JSON object.")
+        return self.build(record)
+
+    def build(self, record):
+        """An unsaved ServiceRequest for `record`; its location may still be pending (see write)."""
+        missing = [name for name in REQUIRED_FIELDS if not record.get(name)]
+        if missing:
+            raise ImportRecordError(f"Missing {', '.join(missing)}.")
+
+        for name, max_length in self.max_lengths.items():
+            if len(str(record.get(name) or '')) > max_length:
+                raise ImportRecordError(f"{name} is longer than {max_length} characters.")
+
+        status = record.get('status') or 'New'
+        if status not in STATUSES:
+            raise ImportRecordError(f"Unknown status '{status}'.")
+
+        created_at = self.parse_time(record, 'created_at') or timezone.now()
+        updated_at = self.parse_time(record, 'updated_at') or created_at
+
+        service_request = ServiceRequest(
+            title=record['title'],
+            description=record['description'],
+            category_id=self.resolve(self.categories, record, 'category'),
+            priority_id=self.resolve(self.priorities, record, 'priority'),
+            created_by_id=self.resolve(self.users, record, 'created_by', exact=True),
+            assigned_to_id=self.resolve(self.users, record, 'assigned_to', exact=True),
+            status=status,
+            rejection_reason=record.get('rejection_reason') or None,
+            rejected_at=updated_at if status == 'Rejected' else None,
+            created_at=created_at,
+            updated_at=updated_at,
+        )
+        service_request.set_derived_fields(self.hours_by_priority)
+
+        place = [str(record.get(name) or '') for name in LOCATION_FIELDS]
+        for name, value in zip(LOCATION_FIELDS, place):
+            max_length = Location._meta.get_field(name).max_length
+            if len(value) > max_length:
+                raise ImportRecordError(f"{name} is longer than {max_length} characters.")
+        if any(place):
+            key = Location.make_key(*place)
+            service_request.location_id = self.locations.get(key)
+            if service_request.location_id is None:
+                service_request._pending_location = (key, place)
+        return service_request
+
+    def resolve(self, lookup, record, name, exact=False):
+        value = record.get(name)
+        if not value:
+            return None
+        pk = lookup.get(str(value) if exact else lookup_key(value))
+        if pk is None:
+            raise ImportRecordError(f"Unknown {name} '{value}'.")
+        return pk
+
+    def parse_time(self, record, name):
+        value = record.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_datetime(str(value))
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ImportRecordError(f"Invalid {name} '{value}'.")
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+    def create_locations(self, service_requests):
+        pending = {}
+        for service_request in service_requests:
+            key_place = getattr(service_request, '_pending_location', None)
+            if key_place is not None:
+                pending.setdefault(key_place[0], key_place[1])
+        if pending:
+            # ignore_conflicts: rows created concurrently (e.g. by the request form) are reused
+            Location.objects.bulk_create(
+                [
+                    Location(block_building=block, floor=floor, room=room, key=key)
+                    for key, (block, floor, room) in pending.items()
+                ],
+                ignore_conflicts=True,
+            )
+            self.locations.update(Location.objects.filter(key__in=list(pending)).values_list('key', 'pk'))
+        for service_request in service_requests:
+            key_place = getattr(service_request, '_pending_location', None)
+            if key_place is not None:
+                service_request.location_id = self.locations[key_place[0]]
+
+    def write(self, service_requests, batch_size=1000):
+        """
+        Insert a batch in one transaction. bulk_create() skips the model
+        signals, so request_changed is sent here to keep derived tables in sync.
+        """
+        with transaction.atomic():
+            self.create_locations(service_requests)
+            with explicit_timestamps():
+                ServiceRequest.objects.bulk_create(service_requests, batch_size=batch_size)
+            request_changed.send(
+                sender=ServiceRequest,
+                changes=[(None, state_of(service_request)) for service_request in service_requests],
+            )
@@ -0,0 +1,23 @@
+from django.db import IntegrityError, transaction
+
+from .models import Location
+
+
+def resolve_location(block_building, floor, room):
+    """
+    Id of the Location for this block/floor/room, created if needed: one
+    lookup on the unique key. Not cached in the process, where a rename or
+    delete in another worker would leave a stale id. Safe against concurrent
+    creation: the unique key makes the loser re-read the winner's row.
+    """
+    key = Location.make_key(block_building, floor, room)
+    pk = Location.objects.filter(key=key).values_list('pk', flat=True).first()
+    if pk is not None:
+        return pk
+
+    try:
+        with transaction.atomic():
+            return Location.objects.create(block_building=block_building, floor=floor, room=room).pk
+    except IntegrityError:
+        # Another request created it first
+        return Location.objects.values_list('pk', flat=True).get(key=key)
@@ -0,0 +1,176 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from service.assignment import ranked_technicians
+from service.models import ServiceRequest, RequestCounter
+from service.seeding import seed_dataset
+from service.sla import breach_candidates, due_soon_requests, overdue_requests
+from service.pagination import KeysetPaginator
+from service.views import LISTING_ORDERING
+from utils.reports import ReportFilters
+
+# Tables that must never be read with a full scan by a hot query
+WATCHED_TABLES = {ServiceRequest._meta.db_table, RequestCounter._meta.db_table}
+
+# Plan lines that read a whole table or index, per backend. `covering` is set
+# when only a covering index is read, which is fine for a query with a LIMIT.
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?P<table>\w+)(?: USING (?P<covering>COVERING )?INDEX \w+)?(?=\s|$)'),
+    'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)'),
+    'mysql': re.compile(r'(?:Table scan|(?P<covering>Covering index scan)|Index scan) on (?P<table>\w+)'),
+}
+
+# Plan lines that mean "sort the matching rows": a paginated query must read
+# its rows in order from an index instead
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+    'postgresql': re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b', re.MULTILINE),
+    'mysql': re.compile(r'-> Sort\b'),
+}
+
+# Hot queries whose best plan reads a whole index, and why that is fine
+ALLOWED_SCANS = {
+    'all_requests': "first page of every request: the index is read in order and stops at the LIMIT",
+    'adminn_dashboard_latest': "newest rows of the table: the index is read in order and stops at the LIMIT",
+    'adminn_dashboard_breakdown': "counts over every request: a covering index is the least it can read",
+}
+
+EXPLAIN_OPTIONS = {
+    'mysql': {'format': 'tree'},
+}
+
+
+def hot_queries(sample):
+    """The query shapes of the hot views, built for sample users and objects."""
+    requests = ServiceRequest.objects.all()
+    staff, technician, category = sample['staff'], sample['technician'], sample['category']
+    return {
+        # service/views.py
+        'my_requests': requests.filter(created_by=staff).order_by(*LISTING_ORDERING)[:6],
+        'all_requests': requests.order_by(*LISTING_ORDERING)[:6],
+        # A later page: the keyset condition must still seek into the index
+        'all_requests_next_page': listing_page(requests, sample['request']),
+        'pending_requests': requests.filter(status='New', assigned_to__isnull=True).order_by('created_at'),
+        'in_progress_requests': requests.filter(status='In Progress'),
+        'overdue_requests': overdue_requests()[:11],
+        'due_soon_requests': due_soon_requests(timedelta(hours=8))[:11],
+        'sweep_sla_breaches': breach_candidates(timezone.now())[:500],
+        'assign_technician': ranked_technicians(category),
+        'technician_dashboard_latest': requests.filter(assigned_to=technician).order_by('-created_at')[:5],
+        'technician_assigned_requests': requests.filter(
+            assigned_to=technician, status__in=['Assigned', 'Accepted', 'In Progress']
+        ),
+        'technician_in_progress': requests.filter(assigned_to=technician, status='In Progress'),
+        'technician_dashboard_counts': RequestCounter.objects.filter(
+            user=technician, role=RequestCounter.ROLE_ASSIGNED
+        ),
+        # users/views.py
+        'staff_dashboard_latest': requests.filter(created_by=staff).order_by('-created_at')[:5],
+        'staff_dashboard_counts': RequestCounter.objects.filter(user=staff, role=RequestCounter.ROLE_CREATED),
+        'adminn_dashboard_latest': requests.order_by('-created_at')[:5],
+        'adminn_dashboard_breakdown': requests.order_by().values_list('status', 'category_id'),
+        # utils/views.py
+        'request_reports_period': ReportFilters(period='monthly').queryset().order_by('-created_at'),
+        'request_reports_status': ReportFilters(status='Rejected').queryset().order_by('-created_at')[:5],
+        'request_reports_category': ReportFilters(category=category.pk).queryset(),
+        'request_reports_technician': ReportFilters(technician=technician.pk).queryset(),
+    }
+
+
+def listing_page(requests, after):
+    """The all_requests page after the request `after`, as KeysetPaginator queries it."""
+    paginator = KeysetPaginator(requests, 5, LISTING_ORDERING)
+    values = paginator.key_of(after)
+    return paginator.ordered(paginator.seek(values, forward=True), forward=True)[:6]
+
+
+def plan_problems(plan, vendor, paginated, allow_scan=False):
+    """
+    What is wrong with `plan`: every full scan of a watched table (a covering
+    index scan is allowed when the query has a LIMIT, any scan with
+    `allow_scan`) and, for paginated queries, any sort of the matching rows.
+    """
+    if vendor not in FULL_SCAN_PATTERNS:
+        raise CommandError(f"Plan checks are not implemented for the '{vendor}' backend.")
+    problems = set()
+    for match in FULL_SCAN_PATTERNS[vendor].finditer(plan):
+        if match['table'] in WATCHED_TABLES and not (allow_scan or match.groupdict().get('covering') and paginated):
+            problems.add(f"full scan of {match['table']}")
+    if paginated and SORT_PATTERNS[vendor].search(plan):
+        problems.add("sorts the rows instead of reading them in index order")
+    return sorted(problems)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the hot ServiceRequest queries against a seeded dataset "
+        "and fail if any of them reads a whole table, or sorts a paginated result."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000, help="Requests to seed before explaining.")
+        parser.add_argument('--no-seed', action='store_true', help="Explain against the existing data instead.")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded data (rolled back by default).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            sample = self.prepare(options)
+            failures = self.check_plans(sample, verbose=options['verbosity'] >= 2)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"Plans without a usable index in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
+
+    def prepare(self, options):
+        if options['no_seed']:
+            sample = ServiceRequest.objects.filter(assigned_to__isnull=False).select_related(
+                'created_by', 'assigned_to', 'category'
+            ).first()
+            if sample is None:
+                raise CommandError("No assigned requests to explain against; run without --no-seed.")
+            staff, technician, category = sample.created_by, sample.assigned_to, sample.category
+        else:
+            self.stdout.write(f"Seeding {options['requests']} requests...")
+            users = seed_dataset(requests=options['requests'], seed=0, prefix='explain')
+            staff, technician = users['staff'][0], users['technician'][0]
+            category = technician.technicianprofile.expertise.first()
+        self.analyze()
+        # Somewhere in the middle of the listing
+        request = ServiceRequest.objects.order_by(*LISTING_ORDERING)[ServiceRequest.objects.count() // 2]
+        return {'staff': staff, 'technician': technician, 'category': category, 'request': request}
+
+    def analyze(self):
+        """Refresh planner statistics so plans reflect the seeded volumes."""
+        statements = {
+            'sqlite': ['ANALYZE'],
+            'postgresql': [f'ANALYZE {table}' for table in WATCHED_TABLES],
+            'mysql': [f'ANALYZE TABLE {table}' for table in WATCHED_TABLES],
+        }
+        with connection.cursor() as cursor:
+            for statement in statements.get(connection.vendor, []):
+                cursor.execute(statement)
+
+    def check_plans(self, sample, verbose=False):
+        failures = []
+        options = EXPLAIN_OPTIONS.get(connection.vendor, {})
+        for name, queryset in hot_queries(sample).items():
+            plan = queryset.explain(**options)
+            # Sliced querysets are the paginated ones
+            problems = plan_problems(
+                plan, connection.vendor, paginated=queryset.query.high_mark is not None,
+                allow_scan=name in ALLOWED_SCANS,
+            )
+            if problems:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"BAD PLAN   {name} ({'; '.join(problems)})"))
+            else:
+                self.stdout.write(f"ok         {name}")
+            if problems or verbose:
+                self.stdout.write(f"    {plan}".replace('\n', '\n    '))
+        return failures
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from service.attachments import collect_garbage, default_grace, recount_blobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete attachment blobs that no request uses any more (after a grace "
+        "period), blob files without a row and abandoned partial uploads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int,
+            help="Seconds a blob must have been unused before it is deleted (default: ATTACHMENT_GC_GRACE).",
+        )
+        parser.add_argument('--recount', action='store_true', help="Recompute reference counts from the requests first.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted without deleting it.")
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            fixed = recount_blobs()
+            self.stdout.write(f"Fixed {fixed} reference count(s).")
+
+        grace = timedelta(seconds=options['grace']) if options['grace'] is not None else default_grace()
+        deleted, freed = collect_garbage(grace, dry_run=options['dry_run'])
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} file(s), {freed / (1024 * 1024):.1f} MiB."))
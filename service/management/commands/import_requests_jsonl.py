@@ -0,0 +1,101 @@
+import hashlib
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from service.importing import ImportRecordError, RequestImporter
+from service.models import ImportCheckpoint
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        while chunk := source.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        "Import service requests from a JSONL file (one JSON object per line) in "
+        "batched transactions. Bad lines go to an errors file; progress is "
+        "checkpointed in the database with each batch, so an interrupted import "
+        "of the same file resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSONL file to import.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Requests per transaction.")
+        parser.add_argument('--errors', help="Where to write rejected lines (default: <path>.errors.jsonl).")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f"No such file: {path}")
+        errors_path = Path(options['errors'] or f"{path}.errors.jsonl")
+        batch_size = options['batch_size']
+
+        source_path = str(path.resolve())
+        size, sha256 = path.stat().st_size, file_digest(path)
+        if options['restart']:
+            ImportCheckpoint.objects.filter(path=source_path).delete()
+            errors_path.unlink(missing_ok=True)
+        checkpoint, created = ImportCheckpoint.objects.get_or_create(
+            path=source_path, defaults={'size': size, 'sha256': sha256},
+        )
+        if not created:
+            if (checkpoint.size, checkpoint.sha256) != (size, sha256):
+                raise CommandError(
+                    f"{path} changed since the import that was checkpointed at line {checkpoint.line}; "
+                    "use --restart to import it from the start."
+                )
+            self.stdout.write(f"Resuming at line {checkpoint.line + 1} ({checkpoint.imported} imported so far).")
+
+        importer = RequestImporter()
+        with open(path, 'rb') as source, open(errors_path, 'a', encoding='utf-8') as errors:
+            source.seek(checkpoint.offset)
+            batch, rejected = [], []
+            offset, line_number = checkpoint.offset, checkpoint.line
+            for raw in source:
+                offset += len(raw)
+                line_number += 1
+                line = raw.decode('utf-8', errors='replace').strip()
+                if not line:
+                    continue
+                try:
+                    batch.append(importer.parse_line(line))
+                except ImportRecordError as exc:
+                    rejected.append({'line': line_number, 'error': str(exc), 'record': line})
+                if len(batch) >= batch_size:
+                    self.commit(importer, batch, rejected, offset, line_number, checkpoint, errors)
+                    batch, rejected = [], []
+            self.commit(importer, batch, rejected, offset, line_number, checkpoint, errors)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {checkpoint.imported} requests; {checkpoint.failed} lines rejected"
+            + (f" (see {errors_path})." if checkpoint.failed else ".")
+        ))
+
+    def commit(self, importer, batch, rejected, offset, line_number, checkpoint, errors):
+        """
+        Write a batch and move the checkpoint past it in one transaction.
+        Rejected lines are flushed before the commit: a crash can repeat them
+        in the errors file on resume, but never lose them.
+        """
+        with transaction.atomic():
+            if batch:
+                importer.write(batch)
+            for entry in rejected:
+                errors.write(json.dumps(entry) + '\n')
+            errors.flush()
+
+            checkpoint.offset = offset
+            checkpoint.line = line_number
+            checkpoint.imported += len(batch)
+            checkpoint.failed += len(rejected)
+            checkpoint.save(update_fields=['offset', 'line', 'imported', 'failed', 'updated_at'])
+        if batch or rejected:
+            self.stdout.write(f"  line {line_number}: {checkpoint.imported} imported, {checkpoint.failed} rejected")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from service.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user request counters from the ServiceRequest table."
+
+    def handle(self, *args, **options):
+        total = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} request counters."))
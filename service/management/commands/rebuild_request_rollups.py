@@ -0,0 +1,31 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from service.rollups import repair_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill the hourly and daily request rollups, or repair them: rows that "
+        "differ from the ServiceRequest table are fixed month by month. Run after "
+        "deleting priorities or technicians, whose rows are not updated on delete."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only check months from this date (YYYY-MM-DD) on.")
+        parser.add_argument('--dry-run', action='store_true', help="Report the rows that differ without fixing them.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            day = parse_date(options['since'])
+            if day is None:
+                raise CommandError(f"Invalid date '{options['since']}'.")
+            since = timezone.make_aware(datetime.combine(day, time.min))
+
+        fixed = repair_rollups(since=since, dry_run=options['dry_run'])
+        verb = "would be fixed" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{fixed} request rollup rows {verb}."))
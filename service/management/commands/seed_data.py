@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from service.counters import rebuild_counters
+from service.rollups import repair_rollups
+from service.seeding import seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a synthetic dataset (users in every group, technicians, locations "
+        "and service requests in every status) for benchmarks and load tests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000, help="Service requests to create.")
+        parser.add_argument('--staff', type=int, default=200, help="Staff users to create.")
+        parser.add_argument('--technicians', type=int, default=20, help="Technicians to create.")
+        parser.add_argument('--admins', type=int, default=2, help="Admins to create.")
+        parser.add_argument('--managers', type=int, default=1, help="Managers to create.")
+        parser.add_argument('--days', type=int, default=365, help="Spread creation dates over this many days.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per bulk insert.")
+        parser.add_argument('--seed', type=int, help="Random seed for a reproducible dataset.")
+        parser.add_argument('--prefix', default='seed', help="Prefix of the generated usernames and locations.")
+
+    def handle(self, *args, **options):
+        users = seed_dataset(
+            requests=options['requests'],
+            staff=options['staff'],
+            technicians=options['technicians'],
+            admins=options['admins'],
+            managers=options['managers'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            stdout=self.stdout,
+        )
+        # bulk_create skips the signals that maintain the counters and the rollups
+        counters = rebuild_counters()
+        rollups = repair_rollups()
+        created = ', '.join(f"{len(members)} {role}" for role, members in users.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} users and {options['requests']} requests; rebuilt {counters} counters and {rollups} rollups. "
+            f"Generated users log in with the password 'password'."
+        ))
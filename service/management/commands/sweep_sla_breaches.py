@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from service.sla import sweep_breaches
+
+
+class Command(BaseCommand):
+    help = "Flag open requests that are past their resolution deadline (due_at), in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Sweep once and exit.")
+        parser.add_argument('--interval', type=float, default=60.0, help="Seconds between sweeps.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Requests flagged per transaction.")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            flagged = sweep_breaches(batch_size=options['batch_size'])
+            if flagged or options['once']:
+                self.stdout.write(self.style.SUCCESS(f"Flagged {flagged} overdue request(s)."))
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,130 @@
+import json
+from dataclasses import dataclass, field
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+
+from .models import ServiceRequest, ServiceCategory
+
+# Statuses shown on the dashboard charts, in display order
+CHART_STATUSES = ['New', 'Assigned', 'Accepted', 'In Progress', 'Completed', 'Rejected']
+
+# Roles shown on the admin "Users by Role" chart: (group name, label)
+CHART_ROLES = [('admin', 'Admin'), ('staff', 'Staff'), ('technician', 'Technician')]
+
+
+@dataclass(frozen=True)
+class RequestBreakdown:
+    """
+    Request counts split by status and by category.
+    `by_category` keeps every category (including empty ones) in display order.
+    """
+    by_status: dict = field(default_factory=dict)
+    by_category: list = field(default_factory=list)
+
+    @property
+    def total(self):
+        return sum(self.by_status.values())
+
+    def status_count(self, status):
+        return self.by_status.get(status, 0)
+
+    def chart_context(self):
+        return {
+            'category_labels_json': json.dumps([name for name, _ in self.by_category]),
+            'category_counts_json': json.dumps([count for _, count in self.by_category]),
+            'status_labels_json': json.dumps(CHART_STATUSES),
+            'status_counts_json': json.dumps([self.status_count(s) for s in CHART_STATUSES]),
+        }
+
+
+@dataclass(frozen=True)
+class AdminDashboardMetrics:
+    requests: RequestBreakdown
+    total_users: int
+    users_by_role: dict
+
+    def chart_context(self):
+        context = self.requests.chart_context()
+        context.update({
+            'user_roles_labels_json': json.dumps([label for _, label in CHART_ROLES]),
+            'user_roles_counts_json': json.dumps([self.users_by_role[name] for name, _ in CHART_ROLES]),
+        })
+        return context
+
+
+def build_breakdown(rows, categories):
+    """
+    Fold (status, category_id, count) rows into a RequestBreakdown.
+    `categories` is an iterable of (id, name) in display order.
+    """
+    by_status = {}
+    by_category_id = {}
+    for status, category_id, count in rows:
+        by_status[status] = by_status.get(status, 0) + count
+        by_category_id[category_id] = by_category_id.get(category_id, 0) + count
+    by_category = [(name, by_category_id.get(pk, 0)) for pk, name in categories]
+    return RequestBreakdown(by_status=by_status, by_category=by_category)
+
+
+async def alist(queryset):
+    """Evaluate a queryset with the async ORM."""
+    return [row async for row in queryset]
+
+
+def category_choices():
+    return ServiceCategory.objects.order_by('id').values_list('id', 'name')
+
+
+def breakdown_rows(queryset=None):
+    if queryset is None:
+        queryset = ServiceRequest.objects.all()
+    return (
+        queryset.order_by()
+        .values_list('status', 'category_id')
+        .annotate(n=Count('id'))
+    )
+
+
+def request_breakdown(queryset=None):
+    """
+    Count requests per (status, category) with a single GROUP BY query.
+    The number of queries does not depend on how many categories or statuses exist.
+    """
+    return build_breakdown(breakdown_rows(queryset), category_choices())
+
+
+async def arequest_breakdown(queryset=None):
+    """request_breakdown() for async views."""
+    return build_breakdown(await alist(breakdown_rows(queryset)), await alist(category_choices()))
+
+
+def user_aggregates():
+    """Total users and users per role: one conditional aggregate for every role."""
+    role_counts = {
+        name: Count('id', filter=Q(groups__name=name), distinct=True)
+        for name, _ in CHART_ROLES
+    }
+    return {'total': Count('id', distinct=True), **role_counts}
+
+
+def admin_dashboard_metrics():
+    User = get_user_model()
+    users = User.objects.aggregate(**user_aggregates())
+
+    return AdminDashboardMetrics(
+        requests=request_breakdown(),
+        total_users=users.pop('total'),
+        users_by_role=users,
+    )
+
+
+async def aadmin_dashboard_metrics():
+    User = get_user_model()
+    users = await User.objects.aaggregate(**user_aggregates())
+    requests = await arequest_breakdown()
+    return AdminDashboardMetrics(
+        requests=requests,
+        total_users=users.pop('total'),
+        users_by_role=users,
+    )
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    ServiceRequest = apps.get_model('service', 'ServiceRequest')
+    RequestCounter = apps.get_model('service', 'RequestCounter')
+    counters = []
+    for role, attname in [('created', 'created_by_id'), ('assigned', 'assigned_to_id')]:
+        rows = (
+            ServiceRequest.objects.filter(**{f'{attname}__isnull': False})
+            .order_by()
+            .values_list(attname, 'status', 'category_id')
+            .annotate(n=Count('id'))
+        )
+        counters.extend(
+            RequestCounter(user_id=user_id, role=role, status=status, category_id=category_id, count=n)
+            for user_id, status, category_id, n in rows
+        )
+    RequestCounter.objects.bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0012_alter_servicerequest_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('created', 'Created'), ('assigned', 'Assigned')], max_length=20)),
+                ('status', models.CharField(choices=[('New', 'New'), ('Assigned', 'Assigned'), ('Accepted', 'Accepted'), ('Rejected', 'Rejected'), ('In Progress', 'In Progress'), ('Awaiting Confirmation', 'Awaiting Confirmation'), ('Completed', 'Completed')], max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service.servicecategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='request_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'role', 'status', 'category'), name='unique_request_counter')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0013_requestcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['created_by', '-created_at'], name='sr_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['assigned_to', 'status'], name='sr_assignee_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['assigned_to', '-created_at'], name='sr_assignee_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['status', 'category'], name='sr_status_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['status', '-created_at'], name='sr_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['-created_at'], name='sr_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(condition=models.Q(('status__in', ['Assigned', 'In Progress'])), fields=['assigned_to'], name='sr_active_assignee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(condition=models.Q(('assigned_to__isnull', True), ('status', 'New')), fields=['created_at'], name='sr_unassigned_new_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+# Copy of ServiceRequest.STATUS_RANKS at the time of this migration
+STATUS_RANKS = {
+    'New': 1,
+    'Assigned': 2,
+    'Accepted': 3,
+    'In Progress': 4,
+    'Awaiting Confirmation': 5,
+    'Completed': 6,
+    'Rejected': 7,
+}
+
+
+def backfill_status_rank(apps, schema_editor):
+    ServiceRequest = apps.get_model('service', 'ServiceRequest')
+    requests = ServiceRequest.objects.using(schema_editor.connection.alias)
+    for status, rank in STATUS_RANKS.items():
+        requests.filter(status=status).update(status_rank=rank)
+    requests.exclude(status__in=list(STATUS_RANKS)).update(status_rank=len(STATUS_RANKS) + 1)
+
+
+def backfill_priority_hours(apps, schema_editor):
+    PriorityLevel = apps.get_model('service', 'PriorityLevel')
+    ServiceRequest = apps.get_model('service', 'ServiceRequest')
+    db = schema_editor.connection.alias
+    for pk, hours in PriorityLevel.objects.using(db).values_list('pk', 'resolution_time_hours'):
+        ServiceRequest.objects.using(db).filter(priority_id=pk).update(priority_hours=hours)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0014_servicerequest_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='status_rank',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='priority_hours',
+            field=models.PositiveIntegerField(default=2147483647, editable=False),
+        ),
+        migrations.RunPython(backfill_status_rank, migrations.RunPython.noop),
+        migrations.RunPython(backfill_priority_hours, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['status_rank', 'priority_hours', '-created_at', '-id'], name='sr_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['created_by', 'status_rank', 'priority_hours', '-created_at', '-id'], name='sr_creator_listing_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    from service.search import install
+    install(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from service.search import uninstall
+    uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Full-text index over ServiceRequest title/description (SQLite FTS5 only; see service.search)."""
+
+    dependencies = [
+        ('service', '0015_servicerequest_status_rank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceRequestSearch',
+            fields=[
+                ('request', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='service.servicerequest')),
+                ('document', models.TextField(db_column='service_servicerequest_fts')),
+            ],
+            options={
+                'db_table': 'service_servicerequest_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
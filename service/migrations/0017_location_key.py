@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:05
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def location_key(block_building, floor, room):
+    # Copy of Location.make_key at the time of this migration
+    return '|'.join(' '.join(str(part).split()).casefold() for part in (block_building, floor, room))
+
+
+def merge_duplicate_locations(apps, schema_editor):
+    """Give every location its key; point requests at the oldest row per key and delete the rest."""
+    Location = apps.get_model('service', 'Location')
+    ServiceRequest = apps.get_model('service', 'ServiceRequest')
+    db = schema_editor.connection.alias
+
+    by_key = defaultdict(list)
+    for pk, block_building, floor, room in Location.objects.using(db).order_by('pk').values_list(
+        'pk', 'block_building', 'floor', 'room'
+    ):
+        by_key[location_key(block_building, floor, room)].append(pk)
+
+    for key, pks in by_key.items():
+        keep, duplicates = pks[0], pks[1:]
+        if duplicates:
+            ServiceRequest.objects.using(db).filter(location_id__in=duplicates).update(location_id=keep)
+            Location.objects.using(db).filter(pk__in=duplicates).delete()
+        Location.objects.using(db).filter(pk=keep).update(key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0016_servicerequest_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='key',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(merge_duplicate_locations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='location',
+            name='key',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+    ]
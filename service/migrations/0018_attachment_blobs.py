@@ -0,0 +1,77 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:59
+
+import os
+from collections import Counter
+
+import service.storage
+from django.conf import settings
+from django.core.files import File
+from django.db import migrations, models
+
+
+def adopt_legacy_attachments(apps, schema_editor):
+    """
+    Copy attachments saved under MEDIA_ROOT before this migration into the
+    content-addressed storage and count their references. The old files are
+    left where they are; missing files keep their (already broken) names.
+    """
+    ServiceRequest = apps.get_model('service', 'ServiceRequest')
+    AttachmentBlob = apps.get_model('service', 'AttachmentBlob')
+    db = schema_editor.connection.alias
+    storage = service.storage.attachment_storage()
+
+    counts = Counter()
+    requests = ServiceRequest.objects.using(db).exclude(attachment='').exclude(attachment__isnull=True)
+    for pk, name in requests.values_list('pk', 'attachment').iterator():
+        if storage.digest_of(name) is None:
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as legacy:
+                blob_name = storage.save(name, File(legacy))
+            ServiceRequest.objects.using(db).filter(pk=pk).update(
+                attachment=blob_name, attachment_name=os.path.basename(name)[:255]
+            )
+            name = blob_name
+        counts[name] += 1
+
+    AttachmentBlob.objects.using(db).bulk_create([
+        AttachmentBlob(digest=storage.digest_of(name), size=storage.size(name), ref_count=n)
+        for name, n in counts.items()
+        if storage.exists(name)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0017_location_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='attachment_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='servicerequest',
+            name='attachment',
+            field=models.FileField(blank=True, null=True, storage=service.storage.attachment_storage, upload_to=''),
+        ),
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('ref_count', 0)), fields=['released_at'], name='blob_released_idx')],
+            },
+        ),
+        migrations.RunPython(adopt_legacy_attachments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0018_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0019_changeversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('status', models.CharField(choices=[('New', 'New'), ('Assigned', 'Assigned'), ('Accepted', 'Accepted'), ('Rejected', 'Rejected'), ('In Progress', 'In Progress'), ('Awaiting Confirmation', 'Awaiting Confirmation'), ('Completed', 'Completed')], max_length=50)),
+                ('category_id', models.BigIntegerField()),
+                ('priority_id', models.BigIntegerField(default=0)),
+                ('technician_id', models.BigIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('grain', 'bucket', 'status', 'category_id', 'priority_id', 'technician_id'), name='unique_request_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:25
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+# service.models.SLA_OPEN_STATUSES when this migration was written
+SLA_OPEN_STATUSES = ['New', 'Assigned', 'Accepted', 'In Progress']
+
+
+def populate_due_at(apps, schema_editor):
+    PriorityLevel = apps.get_model('service', 'PriorityLevel')
+    ServiceRequest = apps.get_model('service', 'ServiceRequest')
+    db = schema_editor.connection.alias
+    for pk, hours in PriorityLevel.objects.using(db).values_list('pk', 'resolution_time_hours'):
+        ServiceRequest.objects.using(db).filter(priority_id=pk).update(due_at=F('created_at') + timedelta(hours=hours))
+    ServiceRequest.objects.using(db).filter(status__in=SLA_OPEN_STATUSES).update(open_due_at=F('due_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0020_request_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='due_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='open_due_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='sla_breached_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_due_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['open_due_at', 'id'], name='sr_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['sla_breached_at', 'open_due_at'], name='sr_unflagged_open_due_idx'),
+        ),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
+
+from .storage import attachment_storage
 
 class ServiceCategory(models.Model):
     name = models.CharField(max_length=100)
@@ -32,14 +37,21 @@ class TechnicianProfile(models.Model):
     def __str__(self):
         return f"{self.user.username} - Technician"
 
+    # Statuses that count towards a technician's workload
+    ACTIVE_STATUSES = ['Assigned', 'In Progress']
+
     @property
     def active_request_count(self):
         """
         Count active requests assigned to this technician.
         Active means: 'Assigned' or 'In Progress'
+        Uses the `active_count` annotation when the profile was loaded
+        through service.assignment.ranked_technicians().
         """
+        if hasattr(self, 'active_count'):
+            return self.active_count
         return self.user.requests_assigned.filter(
-            status__in=['Assigned', 'In Progress']
+            status__in=self.ACTIVE_STATUSES
         ).count()
 
 
@@ -47,10 +59,26 @@ class Location(models.Model):
     block_building = models.CharField(max_length=100)
     floor = models.CharField(max_length=50)
     room = models.CharField(max_length=50)
+    # Normalized block/floor/room (see make_key); one row per place
+    key = models.CharField(max_length=255, unique=True, editable=False)
 
     def __str__(self):
         return f"{self.block_building} - Floor {self.floor} - Room {self.room}"
 
+    @staticmethod
+    def make_key(block_building, floor, room):
+        """Case- and whitespace-insensitive identity of a place."""
+        return '|'.join(' '.join(str(part).split()).casefold() for part in (block_building, floor, room))
+
+    def save(self, *args, **kwargs):
+        self.key = self.make_key(self.block_building, self.floor, self.room)
+        super().save(*args, **kwargs)
+
+
+# Statuses whose resolution deadline (due_at) is still running
+SLA_OPEN_STATUSES = ['New', 'Assigned', 'Accepted', 'In Progress']
+
+
 class ServiceRequest(models.Model):
     STATUS_CHOICES = [
         ('New', 'New'),                 
@@ -62,6 +90,22 @@ class ServiceRequest(models.Model):
         ('Completed', 'Completed'),   
     ]
 
+    SLA_OPEN_STATUSES = SLA_OPEN_STATUSES
+
+    # priority_hours of requests without a priority: they sort after every priority level
+    NO_PRIORITY_HOURS = 2 ** 31 - 1
+
+    # Workflow order of the statuses, stored in status_rank for sorting
+    STATUS_RANKS = {
+        'New': 1,
+        'Assigned': 2,
+        'Accepted': 3,
+        'In Progress': 4,
+        'Awaiting Confirmation': 5,
+        'Completed': 6,
+        'Rejected': 7,
+    }
+
     title = models.CharField(max_length=200)
     description = models.TextField()
     location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True)
@@ -70,7 +114,10 @@ class ServiceRequest(models.Model):
 
     category = models.ForeignKey(ServiceCategory, on_delete=models.CASCADE)
     priority = models.ForeignKey(PriorityLevel, on_delete=models.SET_NULL, null=True)
-    attachment = models.FileField(upload_to='service_attachments/', null=True, blank=True)
+    # Content-addressed: identical files are stored once (see service.storage)
+    attachment = models.FileField(storage=attachment_storage, null=True, blank=True)
+    # File name as uploaded, used when downloading
+    attachment_name = models.CharField(max_length=255, blank=True, editable=False)
 
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -90,6 +137,8 @@ class ServiceRequest(models.Model):
         choices=STATUS_CHOICES,
         default='New'
     )
+    # Derived from status on save (see set_derived_fields)
+    status_rank = models.PositiveSmallIntegerField(default=1, editable=False)
 
     rejection_reason = models.TextField(blank=True, null=True)
     rejected_at = models.DateTimeField(blank=True, null=True)
@@ -97,7 +146,260 @@ class ServiceRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Copy of priority.resolution_time_hours, so the listings sort from an index (see set_derived_fields)
+    priority_hours = models.PositiveIntegerField(default=NO_PRIORITY_HOURS, editable=False)
+    # Resolution deadline: created_at + priority.resolution_time_hours (see set_derived_fields, service.sla)
+    due_at = models.DateTimeField(blank=True, null=True, editable=False)
+    # due_at while the request is in SLA_OPEN_STATUSES, else NULL: the SLA queues
+    # read the open deadlines in order from its index (see set_derived_fields, service.sla)
+    open_due_at = models.DateTimeField(blank=True, null=True, editable=False)
+    # Set by `manage.py sweep_sla_breaches` once an open request is past due_at
+    sla_breached_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    class Meta:
+        # Access paths of the hot views; checked by `manage.py explain_hot_queries`
+        indexes = [
+            # Staff: my_requests, staff dashboard latest requests
+            models.Index(fields=['created_by', '-created_at'], name='sr_creator_created_idx'),
+            # Technician queues filtered by status
+            models.Index(fields=['assigned_to', 'status'], name='sr_assignee_status_idx'),
+            # Technician dashboard latest requests
+            models.Index(fields=['assigned_to', '-created_at'], name='sr_assignee_created_idx'),
+            # Listings in LISTING_ORDERING (service.views), the whole keyset key: all_requests, my_requests
+            models.Index(fields=['status_rank', 'priority_hours', '-created_at', '-id'], name='sr_listing_idx'),
+            models.Index(
+                fields=['created_by', 'status_rank', 'priority_hours', '-created_at', '-id'],
+                name='sr_creator_listing_idx',
+            ),
+            # Admin status lists, report status filter, dashboard status/category counts
+            models.Index(fields=['status', 'category'], name='sr_status_category_idx'),
+            # Report status filter, newest first
+            models.Index(fields=['status', '-created_at'], name='sr_status_created_idx'),
+            # Reports by period and latest requests
+            models.Index(fields=['-created_at'], name='sr_created_idx'),
+            # SLA queues (overdue, due soon), in their ORDER BY open_due_at, id. Not a partial
+            # index on due_at: SQLite cannot match a bound `status IN (?, ...)` to its condition
+            models.Index(fields=['open_due_at', 'id'], name='sr_open_due_idx'),
+            # The breach sweeper: open deadlines not flagged yet, oldest first
+            models.Index(fields=['sla_breached_at', 'open_due_at'], name='sr_unflagged_open_due_idx'),
+            # Partial indexes (skipped on backends without support)
+            models.Index(
+                fields=['assigned_to'],
+                name='sr_active_assignee_idx',
+                condition=models.Q(status__in=['Assigned', 'In Progress']),
+            ),
+            models.Index(
+                fields=['created_at'],
+                name='sr_unassigned_new_idx',
+                condition=models.Q(status='New', assigned_to__isnull=True),
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
+    def set_derived_fields(self, hours_by_priority=None):
+        """
+        Recompute the columns derived from other fields; bulk writers must call
+        this. `hours_by_priority` maps priority ids to resolution_time_hours and
+        saves a query per request when the priority is not loaded.
+        """
+        self.status_rank = self.STATUS_RANKS.get(self.status, len(self.STATUS_RANKS) + 1)
+        self.set_priority_fields(hours_by_priority)
+        self.open_due_at = self.due_at if self.status in self.SLA_OPEN_STATUSES else None
+
+    def set_priority_fields(self, hours_by_priority=None):
+        """priority_hours and due_at, recomputed when the priority or created_at changed."""
+        # Read __dict__: deferred columns are not loaded just to find out nothing changed
+        values = self.__dict__
+        if 'priority_id' not in values or 'created_at' not in values:
+            return
+        stored = getattr(self, '_stored_state', None)
+        if (
+            not self._state.adding and stored is not None
+            and (stored.priority_id, stored.created_at) == (self.priority_id, self.created_at)
+        ):
+            return
+        hours = None
+        if self.priority_id is not None:
+            if hours_by_priority is not None:
+                hours = hours_by_priority[self.priority_id]
+            elif ServiceRequest.priority.is_cached(self) and self.priority is not None:
+                hours = self.priority.resolution_time_hours
+            else:
+                hours = PriorityLevel.objects.filter(pk=self.priority_id).values_list(
+                    'resolution_time_hours', flat=True
+                ).first()
+        self.priority_hours = self.NO_PRIORITY_HOURS if hours is None else hours
+        due_at = None
+        if hours is not None:
+            # New rows: the insert stamps created_at a moment after this
+            due_at = (self.created_at or timezone.now()) + timedelta(hours=hours)
+        self.due_at = due_at
+        if due_at is None or due_at > timezone.now():
+            self.sla_breached_at = None
+
+    def save(self, *args, **kwargs):
+        self.set_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = {
+                'status': ['status_rank', 'open_due_at'],
+                'priority': ['priority_hours', 'due_at', 'open_due_at', 'sla_breached_at'],
+            }
+            extra = [name for field, names in derived.items() if field in update_fields for name in names]
+            kwargs['update_fields'] = [*update_fields, *(name for name in extra if name not in update_fields)]
+        # Keep derived tables (see service.signals) in the same transaction as the row
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        from .signals import remember_state
+        remember_state(self)
+
+
+class AttachmentBlob(models.Model):
+    """
+    A file of the attachment storage and the number of requests using it.
+    Kept up to date by service.attachments; blobs nobody uses are deleted
+    by `python manage.py gc_attachments`.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When ref_count last dropped to 0
+    released_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['released_at'], name='blob_released_idx', condition=models.Q(ref_count=0)),
+        ]
+
+    def __str__(self):
+        return f"{self.digest} ({self.ref_count} refs)"
+
+
+class RequestCounter(models.Model):
+    """
+    Per-user request counts, kept up to date on every ServiceRequest write.
+    Rebuild with `python manage.py rebuild_request_counters`.
+    """
+    ROLE_CREATED = 'created'
+    ROLE_ASSIGNED = 'assigned'
+    ROLE_CHOICES = [
+        (ROLE_CREATED, 'Created'),
+        (ROLE_ASSIGNED, 'Assigned'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='request_counters'
+    )
+    role = models.CharField(max_length=20, choices=ROLE_CHOICES)
+    status = models.CharField(max_length=50, choices=ServiceRequest.STATUS_CHOICES)
+    category = models.ForeignKey(ServiceCategory, on_delete=models.CASCADE)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'role', 'status', 'category'],
+                name='unique_request_counter'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} ({self.role}) - {self.status} / {self.category}: {self.count}"
+
+
+class RequestRollup(models.Model):
+    """
+    Number of requests created in an hour or a day (`bucket`, its start in the
+    current time zone) per status, category, priority and technician, kept up
+    to date on every ServiceRequest write by service.rollups. Missing
+    priorities and technicians are stored as 0 so the key stays unique.
+    Rebuild or repair with `python manage.py rebuild_request_rollups`.
+    """
+    GRAIN_HOUR = 'hour'
+    GRAIN_DAY = 'day'
+    GRAIN_CHOICES = [
+        (GRAIN_HOUR, 'Hour'),
+        (GRAIN_DAY, 'Day'),
+    ]
+
+    grain = models.CharField(max_length=4, choices=GRAIN_CHOICES)
+    bucket = models.DateTimeField()
+    status = models.CharField(max_length=50, choices=ServiceRequest.STATUS_CHOICES)
+    category_id = models.BigIntegerField()
+    priority_id = models.BigIntegerField(default=0)
+    technician_id = models.BigIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index of the report queries: a bucket range of one grain
+            models.UniqueConstraint(
+                fields=['grain', 'bucket', 'status', 'category_id', 'priority_id', 'technician_id'],
+                name='unique_request_rollup'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.grain} {self.bucket:%Y-%m-%d %H:%M} {self.status}: {self.count}"
+
+
+class ChangeVersion(models.Model):
+    """
+    A counter bumped whenever the data behind a set of pages changes; the
+    conditional GET validators of service.freshness are built from it.
+    `key` is 'all' (every request), 'user:<id>' (requests a user created or
+    is assigned) or 'reference' (categories, priorities, users...).
+    """
+    key = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key}: {self.version}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of `manage.py import_requests_jsonl` through one file, updated in
+    the transaction of every batch it covers. `size` and `sha256` identify the
+    file, so an import never resumes at an offset of a different one.
+    """
+    path = models.CharField(max_length=500, unique=True)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    offset = models.BigIntegerField(default=0)
+    line = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.path}: line {self.line}"
+
+
+class ServiceRequestSearch(models.Model):
+    """
+    The SQLite FTS5 index over ServiceRequest title/description, so searches
+    can join it. Created and kept in sync by service.search, not by Django;
+    on other databases the table does not exist and search falls back to LIKE.
+    """
+    request = models.OneToOneField(
+        ServiceRequest,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_entry'
+    )
+    # FTS5's hidden column named after the table: "<table> MATCH ..." searches every column
+    document = models.TextField(db_column='service_servicerequest_fts')
 
+    class Meta:
+        managed = False
+        db_table = 'service_servicerequest_fts'
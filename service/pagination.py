@@ -0,0 +1,155 @@
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+
+from django.db import models
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, direction):
+    payload = [
+        {'t': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    data = json.dumps({'k': payload, 'd': direction}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(token, types):
+    """
+    (values, direction) of a cursor token for a sort key whose values have the
+    Python `types` (datetime, int, float or str, one per key). Cursors come from
+    the query string: anything else raises InvalidCursor, so no tampered value
+    reaches a query.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        payload, direction = data['k'], data['d']
+        values = [cursor_value(value, kind) for value, kind in zip(payload, types, strict=True)]
+    except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+    if direction not in ('n', 'p'):
+        raise InvalidCursor("Cursor does not match this listing.")
+    return values, direction
+
+
+def cursor_value(value, kind):
+    if kind is datetime:
+        moment = datetime.fromisoformat(value['t'])
+        if moment.tzinfo is None:
+            raise ValueError("Naive datetime in cursor.")
+        return moment
+    # bool is an int to Python, not to the database
+    if kind is float and type(value) in (int, float) and math.isfinite(value):
+        return float(value)
+    if kind is int and type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value
+    if kind is str and type(value) is str:
+        return value
+    raise TypeError(f"Expected {kind.__name__} in cursor, got {value!r}.")
+
+
+def key_type(queryset, name):
+    """Python type of the values of field or annotation `name` of `queryset`."""
+    annotation = queryset.query.annotations.get(name)
+    field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+    if isinstance(field, models.DateTimeField):
+        return datetime
+    if isinstance(field, models.FloatField):
+        return float
+    if isinstance(field, models.IntegerField):
+        return int
+    return str
+
+
+class KeysetPage:
+    """
+    One page of a KeysetPaginator. Iterable like a Django Page; navigation uses
+    opaque `next_cursor` / `previous_cursor` tokens instead of page numbers.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a fixed sort key. `ordering` is a list of field or
+    annotation names, '-' prefixed for descending; it must end in a unique
+    column (e.g. '-id') and none of the values may be NULL. Every page costs
+    one indexed range query: there is no COUNT(*) and no OFFSET.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.types = [key_type(queryset, name) for name, _ in self.keys]
+
+    def seek(self, values, forward):
+        """Rows after (forward) or before the row with sort key `values`."""
+        condition = Q()
+        for i, (name, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[i]})
+            for j, (previous, _) in enumerate(self.keys[:i]):
+                step &= Q(**{previous: values[j]})
+            condition |= step
+        # Implied by `condition`, but a plain range on the first key lets the
+        # database start reading the index at the cursor
+        first, descending = self.keys[0]
+        bound = Q(**{f"{first}__{'lte' if descending == forward else 'gte'}": values[0]})
+        return self.queryset.filter(bound & condition)
+
+    def ordered(self, queryset, forward):
+        return queryset.order_by(*(
+            f"{'-' if descending == forward else ''}{name}" for name, descending in self.keys
+        ))
+
+    def key_of(self, obj):
+        return [getattr(obj, name) for name, _ in self.keys]
+
+    def get_page(self, cursor=None):
+        values, direction = None, 'n'
+        if cursor:
+            try:
+                values, direction = decode_cursor(cursor, self.types)
+            except InvalidCursor:
+                values, direction = None, 'n'
+        forward = direction == 'n'
+
+        queryset = self.seek(values, forward) if values is not None else self.queryset
+        rows = list(self.ordered(queryset, forward)[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        has_next = more if forward else values is not None
+        has_previous = values is not None if forward else more
+        next_cursor = encode_cursor(self.key_of(rows[-1]), 'n') if rows and has_next else None
+        previous_cursor = encode_cursor(self.key_of(rows[0]), 'p') if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
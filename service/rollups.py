@@ -0,0 +1,365 @@
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth
+from django.dispatch import receiver
+from django.utils import timezone
+
+from utils.db import apply_count_deltas, write_lock
+
+from .metrics import CHART_STATUSES
+from .models import PriorityLevel, RequestRollup, ServiceCategory, ServiceRequest
+from .signals import request_changed
+
+HOUR = RequestRollup.GRAIN_HOUR
+DAY = RequestRollup.GRAIN_DAY
+
+# Report dimensions: rollup column and the matching ServiceRequest column
+DIMENSIONS = [
+    ('status', 'status'),
+    ('category_id', 'category_id'),
+    ('priority_id', 'priority_id'),
+    ('technician_id', 'assigned_to_id'),
+]
+
+
+# --- Buckets (in the current time zone, like the report periods) ---
+
+def hour_bucket(moment):
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(moment):
+    return timezone.make_aware(datetime.combine(timezone.localtime(moment).date(), time.min))
+
+
+def next_hour(bucket):
+    return hour_bucket(bucket + timedelta(hours=1))
+
+
+def next_day(bucket):
+    return day_bucket(bucket + timedelta(days=1, hours=1))
+
+
+def next_month(bucket):
+    local = timezone.localtime(bucket)
+    index = local.year * 12 + local.month
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1))
+
+
+def month_bucket(moment):
+    local = timezone.localtime(moment)
+    return timezone.make_aware(datetime(local.year, local.month, 1))
+
+
+def ceil_to(moment, floor, step):
+    bucket = floor(moment)
+    return bucket if bucket == moment else step(bucket)
+
+
+# --- Maintenance ---
+
+def rollup_keys(state):
+    """(grain, bucket, status, category_id, priority_id, technician_id) keys a request state counts towards."""
+    if state is None:
+        return []
+    dims = (state.status, state.category_id, state.priority_id or 0, state.assigned_to_id or 0)
+    return [(HOUR, hour_bucket(state.created_at), *dims), (DAY, day_bucket(state.created_at), *dims)]
+
+
+def rollup_deltas(changes):
+    deltas = Counter()
+    for old, new in changes:
+        for key in rollup_keys(old):
+            deltas[key] -= 1
+        for key in rollup_keys(new):
+            deltas[key] += 1
+    return deltas
+
+
+def apply_deltas(deltas):
+    apply_count_deltas(
+        RequestRollup, ['grain', 'bucket', 'status', 'category_id', 'priority_id', 'technician_id'], deltas
+    )
+
+
+@receiver(request_changed)
+def update_request_rollups(sender, changes, **kwargs):
+    apply_deltas(rollup_deltas(changes))
+
+
+def expected_rollups(grain, start, end):
+    """{key: count} of `grain` for requests created in [start, end), computed from ServiceRequest."""
+    trunc = TruncHour if grain == HOUR else TruncDay
+    rows = (
+        ServiceRequest.objects.filter(created_at__gte=start, created_at__lt=end)
+        .order_by()
+        .annotate(bucket=trunc('created_at', tzinfo=timezone.get_current_timezone()))
+        .values_list('bucket', *(column for _, column in DIMENSIONS))
+        .annotate(n=Count('id'))
+    )
+    return {
+        (grain, bucket, status, category_id, priority_id or 0, technician_id or 0): n
+        for bucket, status, category_id, priority_id, technician_id, n in rows
+    }
+
+
+def repair_rollups(since=None, dry_run=False):
+    """
+    Compare the rollups with the ServiceRequest table one month at a time
+    (from `since`, a datetime, or the first request) and fix the rows that
+    differ. Also the backfill of an empty table. Returns the number of rows
+    that were wrong (created, changed or deleted).
+    """
+    if since is None:
+        first = ServiceRequest.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        start = month_bucket(first or timezone.now())
+        # Rows older than every request
+        stale = RequestRollup.objects.filter(bucket__lt=start)
+        fixed = stale.count()
+        if not dry_run:
+            stale.delete()
+    else:
+        start = month_bucket(since)
+        fixed = 0
+
+    now = timezone.now()
+    while start <= now:
+        end = next_month(start)
+        with write_lock():
+            for grain in (HOUR, DAY):
+                expected = expected_rollups(grain, start, end)
+                stored = RequestRollup.objects.select_for_update().filter(grain=grain, bucket__gte=start, bucket__lt=end)
+                changed, deleted = [], []
+                for rollup in stored:
+                    key = (grain, rollup.bucket, rollup.status, rollup.category_id, rollup.priority_id, rollup.technician_id)
+                    count = expected.pop(key, 0)
+                    if not count:
+                        # Rows counted down to 0 by the deltas are dropped too, but are not errors
+                        deleted.append(rollup.pk)
+                        fixed += rollup.count != 0
+                    elif rollup.count != count:
+                        rollup.count = count
+                        changed.append(rollup)
+                created = [
+                    RequestRollup(
+                        grain=grain, bucket=bucket, status=status, category_id=category_id,
+                        priority_id=priority_id, technician_id=technician_id, count=count,
+                    )
+                    for (grain, bucket, status, category_id, priority_id, technician_id), count in expected.items()
+                ]
+                fixed += len(changed) + len(created)
+                if not dry_run:
+                    RequestRollup.objects.filter(pk__in=deleted).delete()
+                    RequestRollup.objects.bulk_update(changed, ['count'], batch_size=1000)
+                    RequestRollup.objects.bulk_create(created, batch_size=1000)
+        start = end
+    # Rows of future buckets only come from clock skew or bad imports
+    future = RequestRollup.objects.filter(bucket__gte=start)
+    fixed += future.count()
+    if not dry_run:
+        future.delete()
+    return fixed
+
+
+# --- Report summaries ---
+
+# Chart resolution of each report period ('' is every request)
+SERIES_GRAINS = {
+    'hourly': 'hour',
+    'daily': 'hour',
+    'weekly': 'day',
+    'monthly': 'day',
+    '3months': 'month',
+    '6months': 'month',
+    'annual': 'month',
+    '': 'month',
+}
+
+SERIES_STEPS = {
+    'hour': (hour_bucket, next_hour, '%Y-%m-%d %H:00'),
+    'day': (day_bucket, next_day, '%Y-%m-%d'),
+    'month': (month_bucket, next_month, '%Y-%m'),
+}
+
+
+@dataclass(frozen=True)
+class RequestSummary:
+    """Request counts of a report, split by each dimension and over time."""
+    by_status: dict = field(default_factory=dict)
+    by_category: list = field(default_factory=list)
+    by_priority: list = field(default_factory=list)
+    by_technician: list = field(default_factory=list)
+    series: list = field(default_factory=list)
+
+    @property
+    def total(self):
+        return sum(self.by_status.values())
+
+    def status_rows(self):
+        """(status, count) in the dashboards' order, then any other status."""
+        statuses = CHART_STATUSES + sorted(set(self.by_status) - set(CHART_STATUSES))
+        return [(status, self.by_status.get(status, 0)) for status in statuses]
+
+    def chart_context(self):
+        return {
+            'series_labels_json': json.dumps([label for label, _ in self.series]),
+            'series_counts_json': json.dumps([count for _, count in self.series]),
+            'category_labels_json': json.dumps([name for name, _ in self.by_category]),
+            'category_counts_json': json.dumps([count for _, count in self.by_category]),
+        }
+
+
+def split_range(start, end, use_days=True):
+    """
+    Cover [start, end) with day buckets, hour buckets at the sides and raw
+    ranges for the partial hours at the edges: {'day': [...], 'hour': [...],
+    'raw': [...]} lists of (start, end). `start` None means the beginning.
+    """
+    pieces = {DAY: [], HOUR: [], 'raw': []}
+    first_hour = ceil_to(start, hour_bucket, next_hour) if start is not None else None
+    last_hour = hour_bucket(end)
+    if first_hour is not None and first_hour >= last_hour:
+        pieces['raw'].append((start, end))
+        return pieces
+    if start is not None and start < first_hour:
+        pieces['raw'].append((start, first_hour))
+    if last_hour < end:
+        pieces['raw'].append((last_hour, end))
+
+    if not use_days:
+        pieces[HOUR].append((first_hour, last_hour))
+        return pieces
+    first_day = ceil_to(first_hour, day_bucket, next_day) if first_hour is not None else None
+    last_day = day_bucket(last_hour)
+    if first_day is not None and first_day >= last_day:
+        pieces[HOUR].append((first_hour, last_hour))
+        return pieces
+    if first_hour is not None and first_hour < first_day:
+        pieces[HOUR].append((first_hour, first_day))
+    pieces[DAY].append((first_day, last_day))
+    if last_day < last_hour:
+        pieces[HOUR].append((last_day, last_hour))
+    return pieces
+
+
+def range_q(field_name, ranges):
+    q = Q()
+    for low, high in ranges:
+        bounds = {f'{field_name}__lt': high}
+        if low is not None:
+            bounds[f'{field_name}__gte'] = low
+        q |= Q(**bounds)
+    return q
+
+
+def request_summary(start=None, end=None, status='', category=None, technician=None, period='', now=None):
+    """
+    RequestSummary of the requests created in [start, end) (`end` None: now)
+    matching the filters, read from the rollups: a handful of grouped queries
+    whatever the length of the range, plus the raw rows of the partial hours
+    at its edges.
+    """
+    end = end or now or timezone.now()
+    series_grain = SERIES_GRAINS.get(period, 'month')
+    pieces = split_range(start, end, use_days=series_grain != 'hour')
+
+    rollup_filters = {'status': status, 'category_id': category, 'technician_id': technician}
+    rollup_filters = {name: value for name, value in rollup_filters.items() if value}
+    request_filters = {'status': status, 'category_id': category, 'assigned_to_id': technician}
+    request_filters = {name: value for name, value in request_filters.items() if value}
+
+    dims = Counter()
+    buckets = Counter()
+    grains = Q()
+    for grain in (DAY, HOUR):
+        if pieces[grain]:
+            grains |= Q(range_q('bucket', pieces[grain]), grain=grain)
+    if grains:
+        rollups = RequestRollup.objects.filter(grains, **rollup_filters).order_by()
+        for row in rollups.values_list(*(name for name, _ in DIMENSIONS)).annotate(n=Sum('count')):
+            dims[row[:-1]] += row[-1]
+        for bucket, n in rollups.values_list('bucket').annotate(n=Sum('count')):
+            buckets[bucket] += n
+    if pieces['raw']:
+        rows = ServiceRequest.objects.filter(range_q('created_at', pieces['raw']), **request_filters)
+        for created_at, *row in rows.values_list('created_at', *(column for _, column in DIMENSIONS)):
+            status_, category_id, priority_id, technician_id = row
+            dims[(status_, category_id, priority_id or 0, technician_id or 0)] += 1
+            buckets[hour_bucket(created_at)] += 1
+
+    return build_summary(dims, buckets, series_grain, start, end)
+
+
+def queryset_summary(queryset, start=None, end=None, period='', now=None):
+    """
+    RequestSummary of an already filtered ServiceRequest queryset, for the
+    filters the rollups do not cover (text search): grouped by the database.
+    """
+    end = end or now or timezone.now()
+    series_grain = SERIES_GRAINS.get(period, 'month')
+    trunc = {'hour': TruncHour, 'day': TruncDay, 'month': TruncMonth}[series_grain]
+    queryset = queryset.order_by()
+    dims = Counter()
+    for *row, n in queryset.values_list(*(column for _, column in DIMENSIONS)).annotate(n=Count('id')):
+        status, category_id, priority_id, technician_id = row
+        dims[(status, category_id, priority_id or 0, technician_id or 0)] += n
+    buckets = dict(
+        queryset.annotate(bucket=trunc('created_at', tzinfo=timezone.get_current_timezone()))
+        .values_list('bucket').annotate(n=Count('id'))
+    )
+    return build_summary(dims, buckets, series_grain, start, end)
+
+
+def build_summary(dims, buckets, series_grain, start, end):
+    """Fold {(status, category_id, priority_id, technician_id): n} and {bucket: n} into a RequestSummary."""
+    by_status, by_category_id, by_priority_id, by_technician_id = Counter(), Counter(), Counter(), Counter()
+    for (status, category_id, priority_id, technician_id), n in dims.items():
+        by_status[status] += n
+        by_category_id[category_id] += n
+        by_priority_id[priority_id] += n
+        by_technician_id[technician_id] += n
+
+    categories = ServiceCategory.objects.order_by('id').values_list('id', 'name')
+    priorities = PriorityLevel.objects.order_by('id').values_list('id', 'name')
+    technician_ids = [pk for pk in by_technician_id if pk]
+    technicians = {
+        user.pk: user.get_full_name() or user.get_username()
+        for user in get_user_model().objects.filter(pk__in=technician_ids)
+    }
+
+    by_priority = [(name, by_priority_id.pop(pk, 0)) for pk, name in priorities]
+    unknown_priority = sum(by_priority_id.values())
+    if unknown_priority:
+        by_priority.append(('None', unknown_priority))
+    by_technician = sorted(
+        ((technicians.get(pk, 'Unassigned' if not pk else f'#{pk}'), n) for pk, n in by_technician_id.items()),
+        key=lambda row: -row[1],
+    )
+    return RequestSummary(
+        by_status=dict(by_status),
+        by_category=[(name, by_category_id.get(pk, 0)) for pk, name in categories],
+        by_priority=by_priority,
+        by_technician=by_technician,
+        series=build_series(buckets, series_grain, start, end),
+    )
+
+
+def build_series(buckets, series_grain, start, end):
+    """(label, count) for every `series_grain` step from `start` (or the first bucket) to `end`."""
+    floor, step, label_format = SERIES_STEPS[series_grain]
+    counts = Counter()
+    for bucket, n in buckets.items():
+        counts[floor(bucket)] += n
+    if start is None and not counts:
+        return []
+    current = floor(start) if start is not None else min(counts)
+    series = []
+    while current < end:
+        series.append((timezone.localtime(current).strftime(label_format), counts.get(current, 0)))
+        current = step(current)
+    return series
@@ -0,0 +1,139 @@
+import re
+
+from django.db import connections
+from django.db.models import Lookup, Q, Value, FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import ServiceRequest, ServiceRequestSearch
+
+# SQLite FTS5 index over ServiceRequest.title/description. It is an
+# external-content table (the text lives only in ServiceRequest) kept in sync
+# by triggers, so bulk_create(), update() and raw SQL writes are indexed too.
+FTS_TABLE = ServiceRequestSearch._meta.db_table
+REQUEST_TABLE = ServiceRequest._meta.db_table
+
+TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {REQUEST_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {REQUEST_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON {REQUEST_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    """,
+}
+
+# Title matches weigh more than description matches in the bm25 rank
+COLUMN_WEIGHTS = (10.0, 1.0)
+
+# Words of a search; everything else (FTS5 operators, quotes) is dropped
+WORD = re.compile(r'\w+')
+
+# Aliases with an installed index, checked once per process
+_available = {}
+
+
+class FullTextMatch(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+ServiceRequestSearch._meta.get_field('document').register_lookup(FullTextMatch)
+
+
+def search_words(text):
+    return WORD.findall(text or '')[:10]
+
+
+def fts_match(words):
+    """FTS5 query matching rows that contain every word (as a prefix)."""
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def install(connection):
+    """
+    Create the FTS5 table and its triggers if they are missing. Django rebuilds
+    SQLite tables for some schema changes, which drops their triggers, so this
+    also runs after every migrate; the index is rebuilt when triggers were lost.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s", [f'{FTS_TABLE}%'])
+        existing = {row[0] for row in cursor.fetchall()}
+        if FTS_TABLE not in existing:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"title, description, content='{REQUEST_TABLE}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+        if FTS_TABLE not in existing or not set(TRIGGERS) <= existing:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _available.pop(connection.alias, None)
+    return True
+
+
+def ensure_search_index(sender, using='default', **kwargs):
+    """post_migrate receiver: restore triggers dropped by table rebuilds."""
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and REQUEST_TABLE in connection.introspection.table_names():
+        install(connection)
+
+
+def uninstall(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _available.pop(connection.alias, None)
+
+
+def fts_available(alias='default'):
+    if alias not in _available:
+        connection = connections[alias]
+        _available[alias] = (
+            connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _available[alias]
+
+
+def search_requests(queryset, text):
+    """
+    Filter ServiceRequests to those matching every word of `text` in the title
+    or description, annotated with `search_rank` (lower is better). Uses the
+    FTS5 index on SQLite and falls back to icontains lookups elsewhere (with a
+    constant rank). An empty search returns the queryset unchanged.
+    """
+    words = search_words(text)
+    if not words:
+        return queryset
+
+    if fts_available(queryset.db):
+        # Joined on rowid: SQLite reads the matches from the index, then the rows by primary key
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        return queryset.filter(search_entry__document__match=fts_match(words)).annotate(
+            search_rank=RawSQL(f"bm25({FTS_TABLE}, {weights})", [], output_field=FloatField())
+        )
+
+    condition = Q()
+    for word in words:
+        condition &= Q(title__icontains=word) | Q(description__icontains=word)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
@@ -0,0 +1,163 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.utils import timezone
+
+from .models import ServiceCategory, PriorityLevel, Location, TechnicianProfile, ServiceRequest
+
+User = get_user_model()
+
+ROLES = ['admin', 'staff', 'technician', 'manager']
+
+CATEGORY_NAMES = ['Network', 'Hardware', 'Software', 'Email', 'Printing', 'Accounts', 'Telephony', 'Audio/Visual']
+
+PRIORITIES = [('Critical', 'red', 2), ('High', 'orange', 8), ('Medium', 'blue', 24), ('Low', 'green', 72)]
+
+# Relative frequency of each status in generated requests
+STATUS_WEIGHTS = {
+    'New': 10,
+    'Assigned': 10,
+    'Accepted': 8,
+    'In Progress': 12,
+    'Awaiting Confirmation': 5,
+    'Completed': 45,
+    'Rejected': 10,
+}
+
+TITLES = [
+    'Printer not responding', 'Cannot connect to Wi-Fi', 'Email not syncing', 'Laptop will not boot',
+    'Projector has no signal', 'Password reset needed', 'Software installation request',
+    'Slow network in office', 'Phone line is dead', 'Monitor flickering', 'VPN connection drops',
+    'Shared drive not accessible',
+]
+
+
+def seed_dataset(requests=1000, staff=50, technicians=10, admins=2, managers=1, days=365,
+                 batch_size=5000, seed=None, prefix='seed', stdout=None):
+    """
+    Create a synthetic but realistic dataset: users in every group, technicians
+    with expertise, locations, and `requests` ServiceRequests spread over the
+    last `days` days in every status. Rows are written with bulk_create, so
+    derived tables (e.g. request counters) must be rebuilt afterwards.
+    Returns a dict with the created users by role.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    groups = {name: Group.objects.get_or_create(name=name)[0] for name in ROLES}
+
+    categories = [ServiceCategory.objects.get_or_create(name=name)[0] for name in CATEGORY_NAMES]
+    priorities = [
+        PriorityLevel.objects.get_or_create(
+            name=name, defaults={'color': color, 'resolution_time_hours': hours}
+        )[0]
+        for name, color, hours in PRIORITIES
+    ]
+    places = [
+        (f"{prefix} Block {block}", str(floor), f"{floor}{room:02d}")
+        for block in 'ABCDE' for floor in range(1, 5) for room in range(1, 6)
+    ]
+    # Locations are unique by key: reuse those of an earlier run with the same prefix
+    Location.objects.bulk_create(
+        [
+            Location(block_building=block, floor=floor, room=room, key=Location.make_key(block, floor, room))
+            for block, floor, room in places
+        ],
+        ignore_conflicts=True,
+    )
+    locations = list(Location.objects.filter(key__in=[Location.make_key(*place) for place in places]))
+
+    # All generated users share one password hash: hashing is the slow part
+    password = make_password('password')
+    start = User.objects.count()
+    users = {}
+    for role, count in [('admin', admins), ('staff', staff), ('technician', technicians), ('manager', managers)]:
+        created = User.objects.bulk_create([
+            User(
+                username=f"{prefix}_{role}_{start + i}",
+                first_name=role.title(),
+                last_name=str(start + i),
+                email=f"{prefix}_{role}_{start + i}@example.com",
+                password=password,
+            )
+            for i in range(count)
+        ])
+        created = saved(created, User.objects.filter(username__in=[u.username for u in created]))
+        membership = User.groups.through
+        user_column = User.groups.field.m2m_column_name()
+        membership.objects.bulk_create([
+            membership(**{user_column: user.pk, 'group_id': groups[role].pk}) for user in created
+        ])
+        users[role] = created
+
+    profiles = saved(
+        TechnicianProfile.objects.bulk_create([TechnicianProfile(user=user) for user in users['technician']]),
+        TechnicianProfile.objects.filter(user__in=users['technician']),
+    )
+    expertise = TechnicianProfile.expertise.through
+    expertise.objects.bulk_create([
+        expertise(technicianprofile_id=profile.pk, servicecategory_id=category.pk)
+        for profile in profiles
+        for category in rng.sample(categories, k=min(len(categories), rng.randint(1, 3)))
+    ])
+
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    requesters = users['staff'] or users['admin']
+    assignees = users['technician']
+    created_total = 0
+    while created_total < requests:
+        batch = []
+        for _ in range(min(batch_size, requests - created_total)):
+            status = rng.choices(statuses, weights)[0] if assignees else 'New'
+            created_at = now - timedelta(minutes=rng.randrange(days * 24 * 60))
+            service_request = ServiceRequest(
+                title=rng.choice(TITLES),
+                description=f"{rng.choice(TITLES)}. Reported from {rng.choice(locations)}.",
+                location=rng.choice(locations),
+                category=rng.choice(categories),
+                priority=rng.choice(priorities),
+                created_by=rng.choice(requesters),
+                assigned_to=None if status == 'New' else rng.choice(assignees),
+                status=status,
+                created_at=created_at,
+                updated_at=created_at,
+            )
+            if status == 'Rejected':
+                service_request.rejection_reason = 'Out of scope'
+                service_request.rejected_at = created_at
+            service_request.set_derived_fields()
+            batch.append(service_request)
+        with explicit_timestamps():
+            ServiceRequest.objects.bulk_create(batch)
+        created_total += len(batch)
+        if stdout:
+            stdout.write(f"  {created_total}/{requests} requests")
+    return users
+
+
+def saved(objs, queryset):
+    """bulk_create() results, re-read when the backend does not return primary keys."""
+    if objs and objs[0].pk is None:
+        return list(queryset)
+    return objs
+
+
+@contextmanager
+def explicit_timestamps():
+    """
+    Let bulk_create() keep the created_at/updated_at values set on the
+    instances instead of stamping the current time (not thread-safe).
+    """
+    fields = [ServiceRequest._meta.get_field(name) for name in ('created_at', 'updated_at')]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
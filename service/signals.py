@@ -0,0 +1,103 @@
+from collections import namedtuple
+
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import Signal, receiver
+
+from utils.events import publish, user_channel
+
+from .models import ServiceRequest
+
+# Sent after ServiceRequest rows are created, changed or deleted, inside the
+# writing transaction. `changes` is a list of (old, new) RequestState pairs;
+# `old` is None for inserts and `new` is None for deletes. Code that writes
+# with bulk_create()/update() sends it itself so derived tables stay in sync.
+request_changed = Signal()
+
+TRACKED_FIELDS = ('id', 'created_by_id', 'assigned_to_id', 'status', 'category_id', 'priority_id', 'created_at')
+
+RequestState = namedtuple('RequestState', TRACKED_FIELDS)
+
+
+def state_of(instance, fallback=None, only=None):
+    """
+    Snapshot of the tracked columns of `instance`.
+    Columns that are deferred (or not in `only`) are taken from `fallback`;
+    without a fallback None is returned. Reads __dict__ so nothing is loaded.
+    """
+    values = instance.__dict__
+    state = []
+    for name in TRACKED_FIELDS:
+        if name in values and (only is None or name in only):
+            state.append(values[name])
+        elif fallback is not None:
+            state.append(getattr(fallback, name))
+        else:
+            return None
+    return RequestState(*state)
+
+
+def load_state(pk):
+    row = ServiceRequest.objects.filter(pk=pk).values_list(*TRACKED_FIELDS).first()
+    return RequestState(*row) if row else None
+
+
+def remember_state(instance):
+    instance._stored_state = state_of(instance) if instance.pk is not None else None
+
+
+def _stored_state(instance):
+    """Last known database state of `instance`, read from the row if unknown."""
+    state = getattr(instance, '_stored_state', None)
+    if state is None and instance.pk is not None:
+        state = load_state(instance.pk)
+    return state
+
+
+@receiver(post_init, sender=ServiceRequest)
+def track_loaded_request(sender, instance, **kwargs):
+    remember_state(instance)
+
+
+@receiver(pre_save, sender=ServiceRequest)
+def capture_previous_state(sender, instance, **kwargs):
+    instance._previous_state = None if instance._state.adding else _stored_state(instance)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def request_saved(sender, instance, created, update_fields=None, **kwargs):
+    old = None if created else instance._previous_state
+    only = None
+    if update_fields is not None:
+        only = {'id'} | {sender._meta.get_field(name).attname for name in update_fields}
+    new = state_of(instance, fallback=old, only=only)
+    instance._stored_state = new
+    if old != new and new is not None:
+        request_changed.send(sender=sender, changes=[(old, new)])
+
+
+@receiver(pre_delete, sender=ServiceRequest)
+def capture_deleted_state(sender, instance, **kwargs):
+    instance._previous_state = _stored_state(instance)
+
+
+@receiver(post_delete, sender=ServiceRequest)
+def request_deleted(sender, instance, **kwargs):
+    old = getattr(instance, '_previous_state', None)
+    instance._stored_state = None
+    if old is not None:
+        request_changed.send(sender=sender, changes=[(old, None)])
+
+
+@receiver(request_changed)
+def publish_request_events(sender, changes, **kwargs):
+    """Push status changes and new assignments to the requester and the technicians involved."""
+    events = []
+    for old, new in changes:
+        if old is None or new is None:
+            continue
+        if old.status == new.status and old.assigned_to_id == new.assigned_to_id:
+            continue
+        data = {'id': new.id, 'status': new.status, 'previous_status': old.status}
+        user_ids = {new.created_by_id, new.assigned_to_id, old.assigned_to_id} - {None}
+        events.extend((user_channel(user_id), 'request', data) for user_id in sorted(user_ids))
+    publish(events)
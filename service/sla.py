@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import Notification
+
+from .models import PriorityLevel, ServiceRequest
+from .versions import ALL, REFERENCE, bump_versions, user_key, versions
+
+# Resolution deadlines. ServiceRequest.due_at is created_at plus the hours of
+# the request's priority: set on save (ServiceRequest.set_derived_fields) and
+# recomputed in bulk below, with priority_hours, when a priority's hours change.
+# open_due_at repeats due_at while the request is open and is NULL once it is
+# not, so the queues and `manage.py sweep_sla_breaches` read the open
+# deadlines in order from its indexes (sr_open_due_idx, sr_unflagged_open_due_idx).
+
+
+@receiver(post_init, sender=PriorityLevel)
+def remember_hours(sender, instance, **kwargs):
+    instance._stored_hours = instance.__dict__.get('resolution_time_hours') if instance.pk is not None else None
+
+
+@receiver(post_save, sender=PriorityLevel)
+def reschedule_requests(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'resolution_time_hours' not in update_fields):
+        return
+    hours = instance.resolution_time_hours
+    if hours == instance._stored_hours:
+        return
+    instance._stored_hours = hours
+    requests = ServiceRequest.objects.filter(priority=instance)
+    requests.update(priority_hours=hours, due_at=F('created_at') + timedelta(hours=hours))
+    requests.filter(status__in=ServiceRequest.SLA_OPEN_STATUSES).update(open_due_at=F('due_at'))
+    # Longer deadlines can end breaches that have not happened after all
+    requests.filter(sla_breached_at__isnull=False, due_at__gt=timezone.now()).update(sla_breached_at=None)
+
+
+@receiver(post_delete, sender=PriorityLevel)
+def clear_orphaned_deadlines(sender, instance, **kwargs):
+    # The requests' priority was set to NULL by the delete: no deadline any more
+    ServiceRequest.objects.filter(priority__isnull=True).exclude(
+        priority_hours=ServiceRequest.NO_PRIORITY_HOURS, due_at__isnull=True
+    ).update(priority_hours=ServiceRequest.NO_PRIORITY_HOURS, due_at=None, open_due_at=None, sla_breached_at=None)
+
+
+def sweep_breaches(batch_size=500, now=None):
+    """
+    Flag open requests past their due_at, oldest deadline first, one batch
+    per transaction. Admins get one notification per sweep. Returns the
+    number of requests flagged.
+    """
+    now = now or timezone.now()
+    flagged = 0
+    while True:
+        with transaction.atomic():
+            batch = list(breach_candidates(now).values_list('pk', 'created_by_id', 'assigned_to_id')[:batch_size])
+            if not batch:
+                break
+            # Requests closed since the select are left alone
+            flagged += ServiceRequest.objects.filter(
+                pk__in=[pk for pk, _, _ in batch], sla_breached_at__isnull=True, open_due_at__isnull=False
+            ).update(sla_breached_at=now)
+            users = {user_id for _, created_by, assigned_to in batch for user_id in (created_by, assigned_to)}
+            bump_versions([ALL, *(user_key(user_id) for user_id in users if user_id is not None)])
+        if len(batch) < batch_size:
+            break
+    if flagged:
+        Notification.objects.create(
+            target_group='admin',
+            message=f"{flagged} request(s) passed their resolution deadline.",
+        )
+    return flagged
+
+
+def breach_candidates(now):
+    """Open requests past their deadline and not flagged yet, oldest deadline first."""
+    return ServiceRequest.objects.filter(sla_breached_at__isnull=True, open_due_at__lte=now).order_by('open_due_at')
+
+
+def overdue_requests(now=None):
+    """Open requests past their deadline, most overdue first."""
+    return ServiceRequest.objects.filter(open_due_at__lte=now or timezone.now()).order_by('open_due_at', 'id')
+
+
+def due_soon_requests(window, now=None):
+    """Open requests whose deadline falls within `window` (a timedelta) from now."""
+    now = now or timezone.now()
+    return ServiceRequest.objects.filter(open_due_at__gt=now, open_due_at__lte=now + window).order_by(
+        'open_due_at', 'id'
+    )
+
+
+def next_deadline(after):
+    """The first open deadline after `after`: when a queue's membership changes next."""
+    return (
+        ServiceRequest.objects.filter(open_due_at__gt=after)
+        .order_by('open_due_at').values_list('open_due_at', flat=True).first()
+    )
+
+
+def default_window():
+    return timedelta(hours=settings.SLA_DUE_SOON_HOURS)
+
+
+def queue_version(window=None):
+    """
+    Data version of an SLA queue: besides the request data, its rows change
+    as deadlines pass, so the next deadline at each edge of the queue is part
+    of it. `window` is None for the overdue queue.
+    """
+    def data_version(request, **kwargs):
+        now = timezone.now()
+        edges = [now] if window is None else [now, now + window]
+        return versions([ALL, REFERENCE]), [next_deadline(edge) for edge in edges]
+    return data_version
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that names every file after the SHA-256 of its content
+    (blobs/<2 hex>/<digest>), so identical uploads share one file.
+
+    Uploads are streamed to a temporary file in chunks while being hashed,
+    then moved into place; when the blob already exists the copy is dropped.
+    The name given by the caller is ignored. Which requests use a blob is
+    tracked by service.attachments (AttachmentBlob.ref_count) and unused
+    blobs are deleted by `manage.py gc_attachments`, never by this class.
+    """
+
+    prefix = 'blobs'
+
+    def __init__(self, location=None, chunk_size=None, **kwargs):
+        super().__init__(location=location, **kwargs)
+        self._chunk_size = chunk_size
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.ATTACHMENT_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'ATTACHMENT_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+    @cached_property
+    def chunk_size(self):
+        return self._chunk_size or getattr(settings, 'ATTACHMENT_CHUNK_SIZE', 1024 * 1024)
+
+    def blob_name(self, digest):
+        return f"{self.prefix}/{digest[:2]}/{digest}"
+
+    def digest_of(self, name):
+        """The digest of a blob name, or None for names this storage did not create."""
+        digest = os.path.basename(name or '')
+        return digest if DIGEST.match(digest) and name == self.blob_name(digest) else None
+
+    def temp_dir(self):
+        return self.path('tmp')
+
+    def get_available_name(self, name, max_length=None):
+        # The real name is chosen from the content in _save()
+        return name
+
+    def _save(self, name, content):
+        os.makedirs(self.temp_dir(), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_dir(), suffix='.part')
+        try:
+            hasher = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in content.chunks(self.chunk_size):
+                    hasher.update(chunk)
+                    out.write(chunk)
+
+            name = self.blob_name(hasher.hexdigest())
+            path = self.path(name)
+            if os.path.exists(path):
+                # Fresh mtime: gc_attachments leaves recently used blobs alone
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, path)
+                temp_path = None
+        finally:
+            if temp_path is not None:
+                os.unlink(temp_path)
+        return name
+
+    def url(self, name):
+        digest = self.digest_of(name)
+        if digest is None:
+            return super().url(name)
+        return reverse('request_attachment', args=[digest])
+
+
+attachment_storage_instance = ContentAddressedStorage()
+
+
+def attachment_storage():
+    """Storage of ServiceRequest.attachment (a callable keeps it out of migrations)."""
+    return attachment_storage_instance
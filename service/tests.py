@@ -1,3 +1,867 @@
-from django.test import TestCase
+import base64
+import json
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from users.models import Notification
+from users.notifications import mark_read
+
+from .assignment import auto_assign, bulk_assign, bulk_transition
+from .counters import rebuild_counters
+from .importing import RequestImporter
+from .locations import resolve_location
+from .models import (
+    ImportCheckpoint, Location, PriorityLevel, RequestCounter, RequestRollup, ServiceCategory, ServiceRequest, TechnicianProfile,
+)
+from .pagination import InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor
+from .rollups import DAY, HOUR, day_bucket, hour_bucket, queryset_summary, repair_rollups, request_summary, split_range
+from .search import TRIGGERS, search_requests
+from .seeding import explicit_timestamps
+from .sla import due_soon_requests, overdue_requests, sweep_breaches
+from .versions import bump_versions, user_key
+from .views import LISTING_ORDERING, SEARCH_ORDERING
+
+User = get_user_model()
+
+
+class ServiceTestData:
+    """Users of every role, a category and three priority levels."""
+
+    @classmethod
+    def setUpTestData(cls):
+        groups = {name: Group.objects.create(name=name) for name in ('admin', 'staff', 'technician', 'manager')}
+        cls.admin = cls.make_user('admin1', groups['admin'])
+        cls.staff = cls.make_user('staff1', groups['staff'])
+        cls.technician = cls.make_user('tech1', groups['technician'])
+        cls.category = ServiceCategory.objects.create(name='Network')
+        cls.high = PriorityLevel.objects.create(name='High', resolution_time_hours=4)
+        cls.medium = PriorityLevel.objects.create(name='Medium', resolution_time_hours=24)
+        cls.low = PriorityLevel.objects.create(name='Low', resolution_time_hours=72)
+
+    @staticmethod
+    def make_user(username, group):
+        user = User.objects.create_user(username, password='pw', first_name=username.title(), last_name='User')
+        user.groups.add(group)
+        return user
+
+    @classmethod
+    def make_request(cls, **kwargs):
+        values = {
+            'title': 'Printer offline',
+            'description': 'The printer does not answer.',
+            'category': cls.category,
+            'priority': cls.medium,
+            'created_by': cls.staff,
+            **kwargs,
+        }
+        return ServiceRequest.objects.create(**values)
+
+
+# --- Request counters ---
+
+class RequestCounterTests(ServiceTestData, TestCase):
+    """After every kind of write the counters match a rebuild from the requests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_category = ServiceCategory.objects.create(name='Hardware')
+        cls.other_technician = cls.make_user('tech2', Group.objects.get(name='technician'))
+        for user, categories in [(cls.technician, [cls.category]), (cls.other_technician, [cls.other_category])]:
+            TechnicianProfile.objects.create(user=user).expertise.add(*categories)
+
+    def assertCountersFresh(self):
+        fields = ('user_id', 'role', 'status', 'category_id', 'count')
+        # Counts that drop to zero keep their row; a rebuild has none
+        maintained = set(RequestCounter.objects.exclude(count=0).values_list(*fields))
+        rebuild_counters()
+        self.assertEqual(maintained, set(RequestCounter.objects.values_list(*fields)))
+        return maintained
+
+    def test_create(self):
+        self.make_request()
+        self.make_request(category=self.other_category, status='Assigned', assigned_to=self.technician)
+        counters = self.assertCountersFresh()
+        self.assertIn((self.staff.pk, RequestCounter.ROLE_CREATED, 'New', self.category.pk, 1), counters)
+
+    def test_status_change(self):
+        service_request = self.make_request(status='Assigned', assigned_to=self.technician)
+        service_request.status = 'In Progress'
+        service_request.save(update_fields=['status'])
+        self.assertCountersFresh()
+
+    def test_reassignment_and_category_change(self):
+        service_request = self.make_request(status='Assigned', assigned_to=self.technician)
+        service_request.assigned_to = self.other_technician
+        service_request.category = self.other_category
+        service_request.save()
+        counters = self.assertCountersFresh()
+        self.assertNotIn(self.technician.pk, {user_id for user_id, *_ in counters})
+
+    def test_delete(self):
+        kept, deleted = self.make_request(), self.make_request(status='Assigned', assigned_to=self.technician)
+        deleted.delete()
+        ServiceRequest.objects.exclude(pk=kept.pk).delete()
+        self.assertEqual(len(self.assertCountersFresh()), 1)
+
+    def test_bulk_writes(self):
+        backlog = [self.make_request(category=category) for category in [self.category, self.other_category] * 2]
+        versions = {r.pk: ServiceRequest.objects.get(pk=r.pk).updated_at for r in backlog}
+        assigned, conflicts = bulk_assign(versions)
+        self.assertEqual((len(assigned), conflicts), (4, {}))
+        self.assertCountersFresh()
+
+        versions = {r.pk: r.updated_at for r in ServiceRequest.objects.filter(pk__in=versions)[:2]}
+        bulk_transition(versions, 'New')
+        auto_assign()
+        self.assertCountersFresh()
+
+
+# --- Listing order ---
+
+class PriorityHoursTests(ServiceTestData, TestCase):
+
+    def test_copied_from_the_priority(self):
+        service_request = self.make_request(priority=self.high)
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.priority_hours, 4)
+
+    def test_requests_without_priority_sort_last(self):
+        service_request = self.make_request(priority=None)
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.priority_hours, ServiceRequest.NO_PRIORITY_HOURS)
+
+    def test_follows_a_priority_change(self):
+        service_request = self.make_request(priority=self.high)
+        service_request.priority = self.low
+        service_request.save(update_fields=['priority'])
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.priority_hours, 72)
+
+    def test_follows_the_priority_level_hours(self):
+        service_request = self.make_request(priority=self.low)
+        self.low.resolution_time_hours = 48
+        self.low.save()
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.priority_hours, 48)
+
+    def test_reset_when_the_priority_is_deleted(self):
+        service_request = self.make_request(priority=self.low)
+        PriorityLevel.objects.get(pk=self.low.pk).delete()
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.priority_hours, ServiceRequest.NO_PRIORITY_HOURS)
+
+
+class ListingOrderTests(ServiceTestData, TestCase):
+
+    def test_all_requests_sorted_by_stage_priority_then_newest(self):
+        now = timezone.now()
+        expected = [
+            self.make_request(status='New', priority=self.high),
+            self.make_request(status='New', priority=self.low),
+            self.make_request(status='New', priority=None),
+            self.make_request(status='Assigned', priority=self.high, assigned_to=self.technician),
+        ]
+        older = self.make_request(status='Assigned', priority=self.high, assigned_to=self.technician)
+        ServiceRequest.objects.filter(pk=older.pk).update(created_at=now - timedelta(days=1))
+        expected.append(older)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('all_requests'))
+        self.assertEqual([r.pk for r in response.context['requests']], [r.pk for r in expected])
+        self.assertEqual(
+            list(ServiceRequest.objects.order_by(*LISTING_ORDERING).values_list('pk', flat=True)),
+            [r.pk for r in expected],
+        )
+
+
+# --- Keyset pagination ---
+
+class KeysetPaginatorTests(ServiceTestData, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        start = timezone.now() - timedelta(days=1)
+        requests = []
+        for i in range(13):
+            # Shared timestamps: only the id tells these rows apart
+            created_at = start + timedelta(minutes=i // 4)
+            requests.append(ServiceRequest(
+                title=f'Request {i}', description='-', category=cls.category, created_by=cls.staff,
+                priority=[cls.high, cls.low][i % 2], status=['New', 'Assigned'][i % 3 == 0],
+                created_at=created_at, updated_at=created_at,
+            ))
+        for service_request in requests:
+            service_request.set_derived_fields()
+        with explicit_timestamps():
+            ServiceRequest.objects.bulk_create(requests)
+        cls.expected = list(ServiceRequest.objects.order_by(*LISTING_ORDERING).values_list('pk', flat=True))
+
+    def paginator(self):
+        return KeysetPaginator(ServiceRequest.objects.all(), 5, LISTING_ORDERING)
+
+    def test_forward_pages_cover_every_row_once_in_order(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = self.paginator().get_page(cursor)
+            seen.extend(r.pk for r in page)
+            pages += 1
+            self.assertEqual(page.has_previous(), pages > 1)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, 3)
+
+    def test_backward_pages_match_forward_pages(self):
+        forward, cursor = [], None
+        while True:
+            page = self.paginator().get_page(cursor)
+            forward.append([r.pk for r in page])
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+
+        backward, cursor = [], page.previous_cursor
+        while cursor:
+            page = self.paginator().get_page(cursor)
+            backward.insert(0, [r.pk for r in page])
+            cursor = page.previous_cursor
+        self.assertEqual(backward, forward[:-1])
+
+    def test_rows_added_before_the_cursor_do_not_shift_the_next_page(self):
+        first = self.paginator().get_page()
+        second = [r.pk for r in self.paginator().get_page(first.next_cursor)]
+        self.make_request(priority=self.high, status='New')
+        self.assertEqual([r.pk for r in self.paginator().get_page(first.next_cursor)], second)
+
+    def test_invalid_cursor_shows_the_first_page(self):
+        for cursor in ['garbage', encode_cursor([1], 'n'), encode_cursor([1, 2, 3, 4], 'x')]:
+            with self.subTest(cursor=cursor):
+                self.assertEqual([r.pk for r in self.paginator().get_page(cursor)], self.expected[:5])
+
+    def test_cursor_round_trips_datetimes(self):
+        moment = timezone.now()
+        values, direction = decode_cursor(encode_cursor([1, moment, 'x'], 'p'), [int, datetime, str])
+        self.assertEqual((values, direction), ([1, moment, 'x'], 'p'))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(encode_cursor([1], 'n'), [int, datetime, str])
+
+    def test_tampered_cursors_show_the_first_page(self):
+        moment = timezone.now()
+        raw = lambda data: base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+        cursors = {
+            'not json': base64.urlsafe_b64encode(b'{"k": [').decode(),
+            'not an object': raw([1, 2]),
+            'keys not a list': raw({'k': 5, 'd': 'n'}),
+            'string rank': encode_cursor(['1', 24, moment, 1], 'n'),
+            'bool rank': encode_cursor([True, 24, moment, 1], 'n'),
+            'float id': encode_cursor([1, 24, moment, 1.5], 'n'),
+            'huge id': encode_cursor([1, 24, moment, 2 ** 70], 'n'),
+            'plain string datetime': encode_cursor([1, 24, moment.isoformat(), 1], 'n'),
+            'bad datetime': raw({'k': [1, 24, {'t': 'yesterday'}, 1], 'd': 'n'}),
+            'naive datetime': raw({'k': [1, 24, {'t': '2026-01-01T00:00:00'}, 1], 'd': 'n'}),
+            'datetime not a string': raw({'k': [1, 24, {'t': 5}, 1], 'd': 'n'}),
+            'null id': encode_cursor([1, 24, moment, None], 'n'),
+        }
+        self.client.force_login(self.admin)
+        for name, cursor in cursors.items():
+            with self.subTest(cursor=name):
+                with self.assertRaises(InvalidCursor):
+                    decode_cursor(cursor, self.paginator().types)
+                response = self.client.get(reverse('all_requests'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([r.pk for r in response.context['requests']], self.expected[:5])
+
+    def test_search_cursor_takes_a_float_rank(self):
+        paginator = KeysetPaginator(search_requests(ServiceRequest.objects.all(), 'Request'), 5, SEARCH_ORDERING)
+        self.assertEqual(paginator.types, [float, int])
+        self.assertEqual(decode_cursor(encode_cursor([-1, 3], 'n'), paginator.types), ([-1.0, 3], 'n'))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(encode_cursor(['NaN', 3], 'n'), paginator.types)
+
+    def test_my_requests_pages_through_the_view(self):
+        self.client.force_login(self.staff)
+        seen, url = [], reverse('my_requests')
+        while url:
+            response = self.client.get(url)
+            page = response.context['requests']
+            seen.extend(r.pk for r in page)
+            url = f"{reverse('my_requests')}?cursor={page.next_cursor}" if page.has_next() else None
+        self.assertEqual(seen, self.expected)
+
+
+# --- Full-text search ---
+
+class SearchIndexTests(ServiceTestData, TestCase):
+
+    def found(self, text):
+        return set(search_requests(ServiceRequest.objects.all(), text).values_list('pk', flat=True))
+
+    def test_edits_reindex_the_request(self):
+        service_request = self.make_request()
+        service_request.title = 'Projector flickers'
+        service_request.save()
+        self.assertEqual(self.found('projector'), {service_request.pk})
+        self.assertEqual(self.found('printer offline'), set())
+        # Writes that skip save() go through the triggers too
+        ServiceRequest.objects.filter(pk=service_request.pk).update(description='The lamp is dim.')
+        self.assertEqual(self.found('lamp'), {service_request.pk})
+        self.assertEqual(self.found('answer'), set())
+
+    def test_deleted_requests_leave_the_index(self):
+        kept, deleted = self.make_request(), self.make_request()
+        deleted.delete()
+        self.assertEqual(self.found('printer'), {kept.pk})
+
+    def test_migrate_reinstalls_dropped_triggers(self):
+        # A table rebuild during a migration drops the triggers with the table
+        with connection.cursor() as cursor:
+            for name in TRIGGERS:
+                cursor.execute(f"DROP TRIGGER {name}")
+        missed = self.make_request(title='Scanner jammed')
+        self.assertEqual(self.found('scanner'), set())
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        self.assertEqual(self.found('scanner'), {missed.pk})
+        # The reinstalled triggers index later writes
+        missed.delete()
+        self.assertEqual(self.found('scanner'), set())
+
+    def test_best_match_comes_first(self):
+        in_title = self.make_request(title='Router reboots', description='Since Monday.')
+        in_description = self.make_request(title='Slow network', description='The router reboots at night.')
+        self.make_request()
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('all_requests'), {'q': 'router reboots'})
+        self.assertEqual([r.pk for r in response.context['requests']], [in_title.pk, in_description.pk])
+        ranks = [r.search_rank for r in response.context['requests']]
+        self.assertLess(ranks[0], ranks[1])
+
+
+# --- Conditional GET ---
+
+class ConditionalPageTests(ServiceTestData, TestCase):
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        # The first page sets the CSRF cookie, which is part of the ETag
+        self.client.get(reverse('my_requests'))
+
+    def etag(self, name='my_requests'):
+        response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_page_is_not_modified(self):
+        etag = self.etag()
+        response = self.client.get(reverse('my_requests'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_data_changes_change_the_etag(self):
+        etag = self.etag()
+        service_request = self.make_request()
+        self.assertNotEqual(self.etag(), etag)
+        etag = self.etag()
+        ServiceRequest.objects.filter(pk=service_request.pk).delete()
+        self.assertNotEqual(self.etag(), etag)
+        etag = self.etag()
+        # Reference data (here, a priority's name) shows on the page too
+        self.medium.name = 'Normal'
+        self.medium.save()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_other_users_requests_leave_the_etag(self):
+        etag = self.etag()
+        bump_versions([user_key(self.technician.pk)])
+        self.assertEqual(self.etag(), etag)
+
+    def test_badge_changes_change_the_etag(self):
+        etag = self.etag()
+        notification = Notification.objects.create(message='Maintenance tonight', target_group='staff')
+        self.assertNotEqual(self.etag(), etag)
+        etag = self.etag()
+        mark_read(self.staff, notification)
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_role_changes_change_the_etag(self):
+        etag = self.etag()
+        self.staff.groups.add(Group.objects.get(name='manager'))
+        self.assertNotEqual(self.etag(), etag)
+
+
+# --- Rollups ---
+
+class RollupMaintenanceTests(ServiceTestData, TestCase):
+
+    def assertRollupsMatch(self):
+        self.assertEqual(repair_rollups(dry_run=True), 0)
+
+    def test_request_writes_keep_the_rollups_exact(self):
+        service_request = self.make_request()
+        other = self.make_request(priority=None)
+        self.assertRollupsMatch()
+
+        service_request.status = 'Assigned'
+        service_request.assigned_to = self.technician
+        service_request.save()
+        service_request.priority = self.high
+        service_request.save(update_fields=['priority'])
+        self.assertRollupsMatch()
+
+        other.delete()
+        self.assertRollupsMatch()
+        self.assertEqual(sum(RequestRollup.objects.filter(grain=DAY).values_list('count', flat=True)), 1)
+
+    def test_bulk_writes_keep_the_rollups_exact(self):
+        profile = TechnicianProfile.objects.create(user=self.technician)
+        profile.expertise.add(self.category)
+        requests = [self.make_request() for _ in range(3)]
+        ServiceRequest.objects.filter(pk=requests[0].pk).update(created_at=timezone.now() - timedelta(days=40))
+        call_command('rebuild_request_rollups', stdout=StringIO())
+        self.client.force_login(self.admin)
+        self.client.post(reverse('auto_assign_requests'))
+        self.assertEqual(ServiceRequest.objects.filter(status='Assigned').count(), 3)
+        self.assertRollupsMatch()
+
+    def test_repair_fixes_wrong_missing_and_stale_rows(self):
+        for _ in range(3):
+            self.make_request()
+        self.make_request(status='Completed', assigned_to=self.technician)
+        RequestRollup.objects.filter(grain=HOUR, status='New').update(count=7)
+        RequestRollup.objects.filter(grain=DAY, status='Completed').delete()
+        stale = day_bucket(timezone.now() - timedelta(days=400))
+        RequestRollup.objects.create(grain=DAY, bucket=stale, status='New', category_id=self.category.pk, count=2)
+
+        self.assertEqual(repair_rollups(dry_run=True), 3)
+        self.assertEqual(repair_rollups(), 3)
+        self.assertRollupsMatch()
+        self.assertEqual(RequestRollup.objects.get(grain=HOUR, status='New').count, 3)
+
+    def test_summary_from_rollups_matches_the_rows(self):
+        now = timezone.now()
+        for minutes in [5, 70, 61 * 24, 60 * 24 * 3 + 17, 60 * 24 * 9]:
+            service_request = self.make_request(priority=[self.high, None][minutes % 2])
+            ServiceRequest.objects.filter(pk=service_request.pk).update(created_at=now - timedelta(minutes=minutes))
+        call_command('rebuild_request_rollups', stdout=StringIO())
+
+        for start in [None, now - timedelta(days=7, minutes=13), now - timedelta(hours=2, minutes=1)]:
+            with self.subTest(start=start):
+                rows = ServiceRequest.objects.filter(created_at__lt=now)
+                if start is not None:
+                    rows = rows.filter(created_at__gte=start)
+                expected = queryset_summary(rows, start, now, period='weekly')
+                summary = request_summary(start, now, period='weekly')
+                self.assertEqual(summary.by_status, expected.by_status)
+                self.assertEqual(summary.by_priority, expected.by_priority)
+                self.assertEqual(summary.series, expected.series)
+
+
+class SplitRangeTests(TestCase):
+
+    def assertCovers(self, pieces, start, end):
+        """The pieces tile [start, end) exactly, each on the boundaries of its grain."""
+        # Sorted by their ends: a start can be None
+        intervals = sorted(
+            ((low, high, kind) for kind, ranges in pieces.items() for low, high in ranges),
+            key=lambda interval: interval[1],
+        )
+        self.assertEqual(intervals[0][0], start)
+        self.assertEqual(intervals[-1][1], end)
+        for (_, high, _), (low, _, _) in zip(intervals, intervals[1:]):
+            self.assertEqual(high, low)
+        for low, high, kind in intervals:
+            if low is not None:
+                self.assertLess(low, high)
+            if kind in (DAY, HOUR):
+                floor = day_bucket if kind == DAY else hour_bucket
+                self.assertEqual(floor(high), high)
+                self.assertTrue(low is None or floor(low) == low)
+            else:
+                self.assertLessEqual(high - low, timedelta(hours=1))
+
+    def test_ranges_are_tiled_exactly(self):
+        moment = timezone.make_aware(datetime(2026, 3, 10, 13, 45, 12))
+        cases = [
+            (moment, moment + timedelta(minutes=5)),
+            (moment, moment + timedelta(minutes=30)),
+            (moment, moment + timedelta(hours=5)),
+            (moment, moment + timedelta(days=3, hours=2)),
+            (moment.replace(minute=0, second=0), moment + timedelta(days=1)),
+            (day_bucket(moment), day_bucket(moment) + timedelta(days=2)),
+            (None, moment),
+        ]
+        for start, end in cases:
+            for use_days in (True, False):
+                with self.subTest(start=start, end=end, use_days=use_days):
+                    pieces = split_range(start, end, use_days=use_days)
+                    self.assertCovers(pieces, start, end)
+                    if not use_days:
+                        self.assertEqual(pieces[DAY], [])
+
+    def test_whole_days_come_from_day_buckets(self):
+        start = timezone.make_aware(datetime(2026, 3, 10, 13, 45))
+        pieces = split_range(start, start + timedelta(days=3))
+        self.assertEqual(pieces[DAY], [(day_bucket(start) + timedelta(days=1), day_bucket(start) + timedelta(days=3))])
+        self.assertEqual(len(pieces['raw']), 2)
+
+    def test_days_across_a_daylight_saving_change(self):
+        with timezone.override('Europe/Berlin'):
+            start = timezone.make_aware(datetime(2026, 3, 27, 22, 30))
+            end = timezone.make_aware(datetime(2026, 3, 31, 1, 15))
+            pieces = split_range(start, end)
+            self.assertCovers(pieces, start, end)
+            # The 23-hour day of the change is a single day bucket
+            self.assertEqual(pieces[DAY], [(day_bucket(start + timedelta(days=1)), day_bucket(end))])
+
+
+# --- Locations ---
+
+class ResolveLocationTests(ServiceTestData, TestCase):
+
+    def test_spellings_of_a_place_share_one_row(self):
+        pk = resolve_location('Block A', '2', '201')
+        self.assertEqual(resolve_location('  block a ', '2', '201'), pk)
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_renamed_and_deleted_locations_are_not_served(self):
+        pk = resolve_location('Block A', '2', '201')
+        # As another worker would: no process-local state sees these writes
+        location = Location.objects.get(pk=pk)
+        location.room = '202'
+        location.save()
+        moved = resolve_location('Block A', '2', '201')
+        self.assertNotEqual(moved, pk)
+        self.assertEqual(resolve_location('Block A', '2', '202'), pk)
+        Location.objects.filter(pk=moved).delete()
+        recreated = resolve_location('Block A', '2', '201')
+        self.assertNotEqual(recreated, moved)
+        self.assertTrue(Location.objects.filter(pk=recreated).exists())
+
+
+class MergeDuplicateLocationsMigrationTests(TransactionTestCase):
+    before = [('service', '0016_servicerequest_search')]
+    after = [('service', '0017_location_key')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicates_merge_into_the_oldest_row(self):
+        apps = self.migrate(self.before)
+        OldLocation = apps.get_model('service', 'Location')
+        OldRequest = apps.get_model('service', 'ServiceRequest')
+        # The users tables stay migrated, only service goes back; no signals,
+        # their receivers write service tables that 0016 does not have yet
+        [user] = User.objects.bulk_create([User(username='staff1')])
+        category = apps.get_model('service', 'ServiceCategory').objects.create(name='Network')
+
+        first = OldLocation.objects.create(block_building='Block A', floor='2', room='201')
+        same = OldLocation.objects.create(block_building=' block  a', floor='2', room='201')
+        other = OldLocation.objects.create(block_building='Block B', floor='1', room='101')
+        requests = {
+            location.pk: OldRequest.objects.create(
+                title='Printer offline', description='-', category=category, location=location, created_by_id=user.pk
+            ).pk
+            for location in (first, same, other)
+        }
+
+        self.migrate(self.after)
+        self.assertEqual(
+            dict(Location.objects.values_list('pk', 'key')), {first.pk: 'block a|2|201', other.pk: 'block b|1|101'}
+        )
+        self.assertEqual(
+            dict(ServiceRequest.objects.values_list('pk', 'location')),
+            {requests[first.pk]: first.pk, requests[same.pk]: first.pk, requests[other.pk]: other.pk},
+        )
+
+
+# --- Attachments ---
+
+class AttachmentDownloadTests(ServiceTestData, TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(ATTACHMENT_ROOT=Path(directory.name))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.staff)
+
+    def download(self, name, content):
+        service_request = self.make_request(attachment=SimpleUploadedFile(name, content))
+        return self.client.get(service_request.attachment.url)
+
+    def test_html_is_downloaded_as_opaque_bytes(self):
+        response = self.download('page.html', b'<script>alert(1)</script>')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment;'))
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_images_are_shown_inline(self):
+        response = self.download('photo.png', b'\x89PNG\r\n')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response['Content-Disposition'].startswith('inline;'))
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+
+# --- Bulk actions ---
+
+class BulkActionTests(ServiceTestData, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.profile = TechnicianProfile.objects.create(user=cls.technician)
+        cls.profile.expertise.add(cls.category)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def bulk_post(self, service_requests, **data):
+        for service_request in service_requests:
+            service_request.refresh_from_db()
+        data['selected'] = [str(r.pk) for r in service_requests]
+        data.update({f'version_{r.pk}': r.updated_at.isoformat() for r in service_requests})
+        return self.client.post(reverse('bulk_update_requests'), data, follow=True)
+
+    def published(self, action):
+        """The request events `action` publishes, without the request ids."""
+        with mock.patch('service.signals.publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            action()
+        return [
+            (channel, kind, {**data, 'id': None})
+            for call in publish.call_args_list for channel, kind, data in call.args[0]
+        ]
+
+    def test_bulk_assign_publishes_what_the_single_assignment_does(self):
+        single, bulk = self.make_request(), self.make_request()
+        single_events = self.published(lambda: self.client.post(
+            reverse('assign_technician', args=[single.pk]), {'technician': self.profile.pk}
+        ))
+        bulk_events = self.published(lambda: self.bulk_post([bulk], action='assign', technician=self.profile.pk))
+        self.assertTrue(single_events)
+        self.assertEqual(bulk_events, single_events)
+
+    def test_reassigning_a_rejected_request_clears_the_rejection(self):
+        service_request = self.make_request(
+            status='Rejected', assigned_to=self.technician,
+            rejection_reason='Not my area', rejected_at=timezone.now(),
+        )
+        self.bulk_post([service_request], action='assign', technician='auto')
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.status, 'Assigned')
+        self.assertIsNone(service_request.rejection_reason)
+        self.assertIsNone(service_request.rejected_at)
+
+    def test_skipped_requests_are_summed_up_in_one_warning(self):
+        movable = self.make_request(status='Assigned', assigned_to=self.technician)
+        done = [self.make_request(status='Completed', assigned_to=self.technician) for _ in range(3)]
+        response = self.bulk_post([movable, *done], action='transition', status='New')
+        texts = [str(message) for message in response.context['messages']]
+        self.assertEqual(len(texts), 2)
+        self.assertEqual(texts[0], "1 request(s) moved to New.")
+        self.assertIn("3 request(s) skipped", texts[1])
+        self.assertIn("cannot move from Completed to New", texts[1])
+
+    def test_bulk_rejection_needs_a_reason(self):
+        service_request = self.make_request(status='Assigned', assigned_to=self.technician)
+        response = self.bulk_post([service_request], action='transition', status='Rejected', reason='  ')
+        self.assertEqual([str(m) for m in response.context['messages']], ["Please provide a reason for rejection."])
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.status, 'Assigned')
+
+        self.bulk_post([service_request], action='transition', status='Rejected', reason='Duplicate of #1')
+        service_request.refresh_from_db()
+        self.assertEqual((service_request.status, service_request.rejection_reason), ('Rejected', 'Duplicate of #1'))
+        self.assertIsNotNone(service_request.rejected_at)
+
+    def test_completion_is_not_a_bulk_action(self):
+        # Only the requester confirms that a request is done
+        service_request = self.make_request(status='Awaiting Confirmation', assigned_to=self.technician)
+        response = self.bulk_post([service_request], action='transition', status='Completed')
+        self.assertEqual([str(m) for m in response.context['messages']], ["Choose an action."])
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.status, 'Awaiting Confirmation')
+
+
+# --- SLA deadlines ---
+
+class DueAtTests(ServiceTestData, TestCase):
+
+    def test_created_at_plus_the_priority_hours(self):
+        service_request = self.make_request(priority=self.high)
+        service_request.refresh_from_db()
+        # Computed just before the insert stamps created_at
+        self.assertAlmostEqual(
+            service_request.due_at, service_request.created_at + timedelta(hours=4), delta=timedelta(seconds=1)
+        )
+        self.assertEqual(service_request.open_due_at, service_request.due_at)
+
+    def test_no_deadline_without_a_priority(self):
+        service_request = self.make_request(priority=None)
+        service_request.refresh_from_db()
+        self.assertIsNone(service_request.due_at)
+        self.assertIsNone(service_request.open_due_at)
+
+    def test_follows_the_priority_level_hours(self):
+        service_request = self.make_request(priority=self.low)
+        closed = self.make_request(priority=self.low, status='Completed', assigned_to=self.technician)
+        self.low.resolution_time_hours = 48
+        self.low.save()
+        service_request.refresh_from_db()
+        closed.refresh_from_db()
+        self.assertEqual(service_request.due_at, service_request.created_at + timedelta(hours=48))
+        self.assertEqual(service_request.open_due_at, service_request.due_at)
+        self.assertEqual(closed.due_at, closed.created_at + timedelta(hours=48))
+        self.assertIsNone(closed.open_due_at)
+
+    def test_open_deadline_cleared_on_close_and_restored_on_reopen(self):
+        service_request = self.make_request(status='In Progress', assigned_to=self.technician)
+        service_request.status = 'Completed'
+        service_request.save(update_fields=['status'])
+        service_request.refresh_from_db()
+        self.assertIsNotNone(service_request.due_at)
+        self.assertIsNone(service_request.open_due_at)
+
+        service_request.status = 'In Progress'
+        service_request.save(update_fields=['status'])
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.open_due_at, service_request.due_at)
+
+    def test_bulk_transitions_keep_the_open_deadline(self):
+        rejected = self.make_request(status='Assigned', assigned_to=self.technician)
+        reopened = self.make_request(status='Rejected', assigned_to=self.technician)
+        self.client.force_login(self.admin)
+        for service_request, status in [(rejected, 'Rejected'), (reopened, 'New')]:
+            service_request.refresh_from_db()
+            self.client.post(reverse('bulk_update_requests'), {
+                'action': 'transition', 'status': status, 'reason': 'Duplicate', 'selected': [str(service_request.pk)],
+                f'version_{service_request.pk}': service_request.updated_at.isoformat(),
+            })
+        rejected.refresh_from_db()
+        reopened.refresh_from_db()
+        self.assertEqual((rejected.status, rejected.open_due_at), ('Rejected', None))
+        self.assertEqual((reopened.status, reopened.open_due_at), ('New', reopened.due_at))
+
+
+class SlaQueueTests(ServiceTestData, TestCase):
+
+    def make_due(self, hours_from_now, **kwargs):
+        """A request whose deadline is `hours_from_now` (negative when overdue)."""
+        service_request = self.make_request(priority=self.high, **kwargs)
+        created_at = timezone.now() + timedelta(hours=hours_from_now - 4)
+        ServiceRequest.objects.filter(pk=service_request.pk).update(
+            created_at=created_at, due_at=created_at + timedelta(hours=4),
+            open_due_at=created_at + timedelta(hours=4) if service_request.open_due_at else None,
+        )
+        return service_request
+
+    def test_sweep_flags_open_overdue_requests_once(self):
+        overdue = [self.make_due(-3), self.make_due(-1, status='Assigned', assigned_to=self.technician)]
+        self.make_due(-2, status='Completed', assigned_to=self.technician)
+        self.make_due(2)
+        self.make_request(priority=None)
+
+        self.assertEqual(sweep_breaches(batch_size=1), 2)
+        self.assertEqual(
+            sorted(ServiceRequest.objects.filter(sla_breached_at__isnull=False).values_list('pk', flat=True)),
+            [r.pk for r in overdue],
+        )
+        notifications = Notification.objects.filter(target_group='admin')
+        self.assertEqual([n.message for n in notifications], ["2 request(s) passed their resolution deadline."])
+
+        self.assertEqual(sweep_breaches(), 0)
+        self.assertEqual(notifications.count(), 1)
+
+    def test_overdue_queue_most_overdue_first(self):
+        late, later = self.make_due(-1), self.make_due(-5)
+        tied = [self.make_due(-3) for _ in range(2)]
+        ServiceRequest.objects.filter(pk=tied[1].pk).update(
+            open_due_at=ServiceRequest.objects.get(pk=tied[0].pk).open_due_at
+        )
+        self.make_due(-2, status='Completed', assigned_to=self.technician)
+        self.make_due(1)
+        self.assertEqual(list(overdue_requests()), [later, *tied, late])
+
+    def test_due_soon_queue_within_the_window(self):
+        soon, sooner = self.make_due(3), self.make_due(1)
+        self.make_due(-1)
+        self.make_due(10)
+        self.make_due(2, status='Rejected', assigned_to=self.technician)
+        self.assertEqual(list(due_soon_requests(timedelta(hours=8))), [sooner, soon])
+
+
+# --- JSONL import ---
+
+class ImportCheckpointTests(ServiceTestData, TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'requests.jsonl'
+        self.write_records(5)
+
+    def write_records(self, count):
+        records = [{'title': f'Imported {i}', 'description': '-', 'category': 'Network', 'created_by': 'staff1'}
+                   for i in range(count)]
+        self.path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+
+    def run_import(self, *args):
+        call_command('import_requests_jsonl', str(self.path), '--batch-size', '2', *args, stdout=StringIO())
+
+    def test_a_second_run_imports_nothing_again(self):
+        self.run_import()
+        self.run_import()
+        self.assertEqual(ServiceRequest.objects.count(), 5)
+        self.assertEqual(ImportCheckpoint.objects.get().imported, 5)
+
+    def test_checkpoint_commits_with_its_batch(self):
+        write = RequestImporter.write
+        calls = []
+
+        def failing_write(importer, batch):
+            # Interrupted after the second batch is written, before its checkpoint
+            write(importer, batch)
+            calls.append(len(batch))
+            if len(calls) == 2:
+                raise RuntimeError("interrupted")
+
+        with mock.patch.object(RequestImporter, 'write', failing_write), self.assertRaises(RuntimeError):
+            self.run_import()
+        self.assertEqual(ServiceRequest.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get().line, 2)
+
+        self.run_import()
+        self.assertEqual(
+            sorted(ServiceRequest.objects.values_list('title', flat=True)),
+            [f'Imported {i}' for i in range(5)],
+        )
+
+    def test_refuses_to_resume_against_another_file(self):
+        self.run_import()
+        self.write_records(6)
+        with self.assertRaisesMessage(CommandError, '--restart'):
+            self.run_import()
+        self.run_import('--restart')
+        self.assertEqual(ImportCheckpoint.objects.get().imported, 6)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -9,19 +10,25 @@ urlpatterns = [
     path('requests/<int:pk>/edit/', views.edit_request, name='edit_request'),
     path('requests/<int:pk>/delete/', views.delete_request, name='delete_request'),
     path('requests/<int:pk>/confirm/', views.confirm_completion, name='confirm_completion'),
+    # Not attachments/<digest>/: browsers may keep inline responses of that path cached for a year
+    path('attachments/<str:digest>/download/', views.request_attachment, name='request_attachment'),
 
     # Admin URLs
     path('all-requests/', views.all_requests, name='all_requests'),
     path('adminn/request/<int:request_id>/', views.admin_request_details, name='admin_request_details'),
     path('assign_technician/<int:request_id>/', views.assign_technician, name='assign_technician'),
+    path('auto_assign/', views.auto_assign_requests, name='auto_assign_requests'),
+    path('bulk/', views.bulk_update_requests, name='bulk_update_requests'),
     path('completed_requests/', views.completed_requests, name='completed_requests'),
     path('in_progress_requests/', views.in_progress_requests, name='in_progress_requests'),
     path('pending_requests/', views.pending_requests, name='pending_requests'),
+    path('overdue_requests/', views.overdue_requests_view, name='overdue_requests'),
+    path('due_soon_requests/', views.due_soon_requests_view, name='due_soon_requests'),
     path('technicians/', views.technician_list, name='technician_list'),
     path('technician/<int:pk>/', views.technician_detail, name='technician_detail'),
 
     # Technician URLs
-    path('technician/dashboard/', views.technician_dashboard, name='technician_dashboard'),
+    path('technician/dashboard/', views.technician_dashboard_async if settings.ASYNC_VIEWS else views.technician_dashboard, name='technician_dashboard'),
     path('technician/assigned-requests/', views.technician_assigned_requests, name='technician_assigned_requests'),
     path('technician/request/<int:request_id>/', views.technician_request_detail, name='technician_request_detail'),
     path('requests/<int:request_id>/start/', views.technician_start_request, name='technician_start_request'),
@@ -43,3 +50,9 @@ urlpatterns = [
     # Manager URLs
     path('manager/dashboard/', views.manager_dashboard, name='manager_dashboard'),
 ]
+
+# The async dashboard under its own name too, only where it is served
+if settings.ASYNC_VIEWS:
+    urlpatterns += [
+        path('technician/dashboard/async/', views.technician_dashboard_async, name='technician_dashboard_async'),
+    ]
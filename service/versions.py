@@ -0,0 +1,26 @@
+from django.db.models import F
+
+from .models import ChangeVersion
+
+# Data versions: ChangeVersion counters, bumped in the writing transaction and
+# read by every process, so whatever is derived from them (ETags, cache keys)
+# changes on every worker at once.
+
+ALL = 'all'
+REFERENCE = 'reference'
+
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+def bump_versions(keys):
+    keys = sorted(set(keys))
+    updated = ChangeVersion.objects.filter(key__in=keys).update(version=F('version') + 1)
+    if updated < len(keys):
+        ChangeVersion.objects.bulk_create([ChangeVersion(key=key, version=1) for key in keys], ignore_conflicts=True)
+
+
+def versions(keys):
+    found = dict(ChangeVersion.objects.filter(key__in=keys).values_list('key', 'version'))
+    return tuple(found.get(key, 0) for key in keys)
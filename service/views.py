@@ -1,15 +1,42 @@
+import mimetypes
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .forms import ServiceRequestForm
 from users.forms import EditProfileForm
-from .models import ServiceRequest, PriorityLevel, TechnicianProfile, ServiceCategory
+from .models import ServiceRequest, PriorityLevel, TechnicianProfile, ServiceCategory, RequestCounter
+from .counters import auser_breakdown, user_breakdown
+from .metrics import alist
+from .pagination import KeysetPaginator
+from .search import search_requests
+from .sla import default_window, due_soon_requests, overdue_requests, queue_version
+from .storage import attachment_storage
+from .freshness import all_requests_version, conditional_page, own_requests_version, request_version
+from .assignment import (
+    BULK_TRANSITIONS, AssignmentConflict, assign_request, auto_assign, bulk_assign, bulk_transition,
+    ranked_technicians,
+)
 from users.decorators import group_required  
+from users.roles import has_group
 from django.contrib.auth import get_user_model
-from django.db.models import Case, When, Value, IntegerField
+from django.db.models import Q
+from django.http import FileResponse, Http404
 from django.core.paginator import Paginator
 from django.utils import timezone
-import json
+from django.utils.dateparse import parse_datetime
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
+
+# Sort key of the listings: Status (workflow rank) → Priority (expected resolution
+# time) → Newest. '-id' makes it unique so it can drive keyset pagination. Every
+# column is stored on the row and indexed in this order (sr_listing_idx,
+# sr_creator_listing_idx), so a page is read from the index without sorting.
+LISTING_ORDERING = ['status_rank', 'priority_hours', '-created_at', '-id']
+
+# Sort key when searching: best bm25 match first (see service.search)
+SEARCH_ORDERING = ['search_rank', '-id']
 
 @login_required
 @group_required('staff')
@@ -30,41 +57,61 @@ def submit_request_view(request):
 
 @login_required
 @group_required('staff')
+@conditional_page(own_requests_version)
 def my_requests(request):
-    # Define the status order
-    status_order = Case(
-        When(status='New', then=1),
-        When(status='Assigned', then=2),
-        When(status='Accepted', then=3),
-        When(status='In Progress', then=4),
-        When(status='Completed', then=5),
-        When(status='Rejected', then=6),
-        default=7,
-        output_field=IntegerField()
-    )
+    requests_qs = ServiceRequest.objects.filter(created_by=request.user).select_related('priority')
+    query = request.GET.get('q', '').strip()
+    ordering = LISTING_ORDERING
+    if query:
+        requests_qs = search_requests(requests_qs, query)
+        ordering = SEARCH_ORDERING
 
-    requests_qs = ServiceRequest.objects.filter(created_by=request.user).annotate(
-        status_order=status_order
-    ).order_by(
-        'status_order',            # Custom status order ascending
-        'priority__resolution_time_hours',  # Priority by expected resolution time ascending
-        '-created_at'              # Latest requests first
-    )
-
-    paginator = Paginator(requests_qs, 5) 
-    page_number = request.GET.get('page')
-    requests_page = paginator.get_page(page_number)
+    paginator = KeysetPaginator(requests_qs, 5, ordering)
+    requests_page = paginator.get_page(request.GET.get('cursor'))
 
     return render(request, 'staff/my_requests.html', {
-        'requests': requests_page
+        'requests': requests_page,
+        'query': query,
     })
 
 @login_required
 @group_required('staff')
+@conditional_page(request_version(lambda request, pk: {'pk': pk, 'created_by': request.user}))
 def request_details(request, pk):
     req = get_object_or_404(ServiceRequest, pk=pk, created_by=request.user)
     return render(request, 'staff/request_details.html', {'request_obj': req})
 
+# Attachment types shown in the browser; anything else (HTML, SVG, scripts...)
+# would run in the site's origin, so it is downloaded as opaque bytes
+INLINE_ATTACHMENT_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'application/pdf'}
+
+@login_required
+def request_attachment(request, digest):
+    """Download an attachment of a request the user may see. Blobs never change, so it is cached for good."""
+    storage = attachment_storage()
+    if storage.digest_of(storage.blob_name(digest)) is None:
+        raise Http404("No such attachment.")
+    requests_qs = ServiceRequest.objects.filter(attachment=storage.blob_name(digest))
+    if not (has_group(request.user, 'admin') or has_group(request.user, 'manager')):
+        requests_qs = requests_qs.filter(Q(created_by=request.user) | Q(assigned_to=request.user))
+    service_request = requests_qs.only('attachment', 'attachment_name').first()
+    if service_request is None or not storage.exists(service_request.attachment.name):
+        raise Http404("No such attachment.")
+
+    file_name = service_request.attachment_name or digest
+    content_type = mimetypes.guess_type(file_name)[0]
+    inline = content_type in INLINE_ATTACHMENT_TYPES
+    response = FileResponse(
+        storage.open(service_request.attachment.name),
+        as_attachment=not inline,
+        content_type=content_type if inline else 'application/octet-stream',
+        filename=file_name,
+    )
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['ETag'] = f'"{digest}"'
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
 @login_required
 @group_required('staff')
 def edit_request(request, pk):
@@ -97,6 +144,7 @@ def delete_request(request, pk):
 # ADMIN VIEWS
 @login_required
 @group_required('admin') 
+@conditional_page(all_requests_version)
 def all_requests(request):
     requests_qs = ServiceRequest.objects.all()
     status = request.GET.get('status')    
@@ -107,37 +155,30 @@ def all_requests(request):
     if priority:
         requests_qs = requests_qs.filter(priority_id=priority)
 
-    # --- Add sorting logic: Status → Priority → Newest ---
-    requests_qs = requests_qs.annotate(
-        status_order=Case(
-            When(status='New', then=Value(1)),           # Highest priority: New
-            When(status='Assigned', then=Value(2)),      # Then assigned
-            When(status='Accepted', then=Value(3)),      # Technician accepted
-            When(status='In Progress', then=Value(4)),   # Technician started work
-            When(status='Completed', then=Value(5)),     # Work finished
-            When(status='Rejected', then=Value(6)),      # Rejected tasks
-            default=Value(7),
-            output_field=IntegerField()
-        )
-    ).order_by(
-        'status_order',
-        'priority__resolution_time_hours',
-        '-created_at'
-    )
+    # --- Sorting: Status → Priority → Newest (or best match), paginated by cursor ---
+    requests_qs = requests_qs.select_related('priority')
+    query = request.GET.get('q', '').strip()
+    ordering = LISTING_ORDERING
+    if query:
+        requests_qs = search_requests(requests_qs, query)
+        ordering = SEARCH_ORDERING
 
-    paginator = Paginator(requests_qs, 5)
-    page_number = request.GET.get('page')
-    requests_page = paginator.get_page(page_number)
+    paginator = KeysetPaginator(requests_qs, 5, ordering)
+    requests_page = paginator.get_page(request.GET.get('cursor'))
 
     priorities = PriorityLevel.objects.all()
 
     return render(request, 'adminn/all_requests.html', {
         'requests': requests_page,
-        'priorities': priorities
+        'priorities': priorities,
+        'query': query,
+        'technicians': TechnicianProfile.objects.select_related('user').order_by('user__first_name', 'id'),
+        'bulk_statuses': list(BULK_TRANSITIONS),
     })
 
 @login_required
 @group_required('admin')
+@conditional_page(request_version(lambda request, request_id: {'pk': request_id}))
 def admin_request_details(request, request_id):
 
     request_obj = get_object_or_404(ServiceRequest, id=request_id)
@@ -149,37 +190,122 @@ def admin_request_details(request, request_id):
 @login_required
 @group_required('admin')
 def assign_technician(request, request_id):
-    service_request = get_object_or_404(ServiceRequest, id=request_id)
+    service_request = get_object_or_404(
+        ServiceRequest.objects.select_related('category', 'created_by'), id=request_id
+    )
 
-    if service_request.assigned_to:
+    if service_request.assigned_to_id:
         messages.warning(request, "This request is already assigned to a technician.")
         return redirect('all_requests')
 
-    # Get technicians with expertise in this request's category
-    category = service_request.category
-    technicians = TechnicianProfile.objects.filter(
-        expertise=category
-    ).select_related('user')
-
-    # Sort by fewest active requests first
-    sorted_techs = sorted(technicians, key=lambda t: t.active_request_count)
-
     if request.method == 'POST':
         technician_id = request.POST.get('technician')
-        technician = get_object_or_404(TechnicianProfile, id=technician_id)
-
-        service_request.assigned_to = technician.user
-        service_request.status = 'Assigned'
-        service_request.save()
+        try:
+            if technician_id == 'auto':
+                assigned = auto_assign([service_request.id])
+                if not assigned:
+                    messages.error(request, "No technician with matching expertise is available.")
+                    return redirect('assign_technician', request_id=service_request.id)
+                technician = assigned[0][1]
+            else:
+                technician = get_object_or_404(TechnicianProfile.objects.select_related('user'), id=technician_id)
+                assign_request(service_request.id, technician)
+        except AssignmentConflict:
+            messages.warning(request, "This request is already assigned to a technician.")
+            return redirect('all_requests')
 
         messages.success(request, f"Technician {technician.user.get_full_name()} assigned successfully.")
         return redirect('all_requests')
 
+    # Technicians with expertise in this request's category, fewest active requests first
+    technicians = ranked_technicians(service_request.category_id)
+
     return render(request, 'adminn/assign_technician.html', {
         'service_request': service_request,
-        'technicians': sorted_techs,
+        'technicians': technicians,
     })
 
+@login_required
+@group_required('admin')
+def auto_assign_requests(request):
+    if request.method == 'POST':
+        try:
+            assigned = auto_assign()
+        except AssignmentConflict:
+            messages.warning(request, "The pending requests changed while they were being assigned; try again.")
+            return redirect('pending_requests')
+        if assigned:
+            messages.success(request, f"{len(assigned)} request(s) assigned automatically.")
+        else:
+            messages.info(request, "No pending requests could be assigned.")
+    return redirect('pending_requests')
+
+def posted_versions(post):
+    """{id: updated_at} of the requests ticked in a bulk form (see service.assignment)."""
+    versions = {}
+    for value in post.getlist('selected'):
+        if not value.isdigit():
+            continue
+        version = parse_datetime(post.get(f'version_{value}', ''))
+        if version is not None:
+            versions[int(value)] = version
+    return versions
+
+@login_required
+@group_required('admin')
+@require_POST
+def bulk_update_requests(request):
+    next_url = request.POST.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = 'all_requests'
+
+    versions = posted_versions(request.POST)
+    if not versions:
+        messages.warning(request, "Select at least one request.")
+        return redirect(next_url)
+
+    action = request.POST.get('action')
+    if action == 'assign':
+        technician_id = request.POST.get('technician')
+        technician = None
+        if technician_id != 'auto':
+            technician = get_object_or_404(TechnicianProfile.objects.select_related('user'), id=technician_id)
+    elif not (action == 'transition' and request.POST.get('status') in BULK_TRANSITIONS):
+        messages.error(request, "Choose an action.")
+        return redirect(next_url)
+    elif request.POST['status'] == 'Rejected' and not request.POST.get('reason', '').strip():
+        messages.error(request, "Please provide a reason for rejection.")
+        return redirect(next_url)
+
+    try:
+        if action == 'assign':
+            changed, conflicts = bulk_assign(versions, technician)
+            done = "assigned"
+        else:
+            status = request.POST['status']
+            changed, conflicts = bulk_transition(versions, status, request.POST.get('reason', '').strip())
+            done = f"moved to {status}"
+    except AssignmentConflict:
+        messages.warning(request, "The selected requests changed while they were being updated; nothing was changed.")
+        return redirect(next_url)
+
+    if changed:
+        messages.success(request, f"{len(changed)} request(s) {done}.")
+    if conflicts:
+        messages.warning(request, skipped_summary(conflicts))
+    return redirect(next_url)
+
+def skipped_summary(conflicts, shown=10):
+    """One message for the {id: reason} conflicts of a bulk action, grouped by reason."""
+    by_reason = {}
+    for request_id, reason in sorted(conflicts.items()):
+        by_reason.setdefault(reason, []).append(f"#{request_id}")
+    parts = []
+    for reason, ids in by_reason.items():
+        more = f" and {len(ids) - shown} more" if len(ids) > shown else ""
+        parts.append(f"{', '.join(ids[:shown])}{more} {reason}")
+    return f"{len(conflicts)} request(s) skipped: {'; '.join(parts)}."
+
 User = get_user_model()
 
 @login_required
@@ -192,21 +318,60 @@ def technician_detail(request, pk):
 
 @login_required
 @group_required('admin')
+@conditional_page(all_requests_version)
 def completed_requests(request):
     requests_qs = ServiceRequest.objects.filter(status='Completed')
     return render(request, 'adminn/completed_requests.html', {'requests': requests_qs})
 
 @login_required
 @group_required('admin')
+@conditional_page(all_requests_version)
 def in_progress_requests(request):
     requests_qs = ServiceRequest.objects.filter(status='In Progress')
     return render(request, 'adminn/in_progress_requests.html', {'requests': requests_qs})
 
 @login_required
 @group_required('admin')
+@conditional_page(all_requests_version)
 def pending_requests(request):
-    requests_qs = ServiceRequest.objects.filter(status='New')
-    return render(request, 'adminn/pending_requests.html', {'requests': requests_qs})
+    requests_qs = ServiceRequest.objects.filter(
+        status='New', assigned_to__isnull=True
+    ).select_related('category', 'priority', 'created_by').order_by('created_at')
+    return render(request, 'adminn/pending_requests.html', {
+        'requests': requests_qs,
+        'technicians': TechnicianProfile.objects.select_related('user').order_by('user__first_name', 'id'),
+        'bulk_statuses': list(BULK_TRANSITIONS),
+    })
+
+# --- SLA queues ---
+
+SLA_QUEUE_ORDERING = ['open_due_at', 'id']
+
+def sla_queue(request, requests_qs, title, empty_message):
+    paginator = KeysetPaginator(
+        requests_qs.select_related('category', 'priority', 'assigned_to'), 10, SLA_QUEUE_ORDERING
+    )
+    return render(request, 'adminn/sla_queue.html', {
+        'requests': paginator.get_page(request.GET.get('cursor')),
+        'title': title,
+        'empty_message': empty_message,
+    })
+
+@login_required
+@group_required('admin')
+@conditional_page(queue_version())
+def overdue_requests_view(request):
+    return sla_queue(request, overdue_requests(), 'Overdue Requests', 'No open request is past its deadline.')
+
+@login_required
+@group_required('admin')
+@conditional_page(queue_version(default_window()))
+def due_soon_requests_view(request):
+    window = default_window()
+    return sla_queue(
+        request, due_soon_requests(window), 'Due Soon',
+        f'No open request is due in the next {window.total_seconds() / 3600:g} hours.',
+    )
 
 @login_required
 @group_required('admin')
@@ -222,57 +387,61 @@ def technician_list(request):
     })
 
 # TECHNICIAN VIEWS
+def technician_latest_requests(user):
+    return ServiceRequest.objects.filter(
+        assigned_to=user
+    ).select_related('category').order_by('-created_at')[:5]
+
+def technician_dashboard_context(request_counts, latest_requests):
+    return {
+        'page_title': 'Technician Dashboard',
+        'total_assigned': request_counts.total,
+        'accepted': request_counts.status_count('Accepted'),
+        'in_progress': request_counts.status_count('In Progress'),
+        'completed': request_counts.status_count('Completed'),
+        'rejected': request_counts.status_count('Rejected'),
+        'awaiting_confirmation': request_counts.status_count('Awaiting Confirmation'),
+        'latest_requests': latest_requests,
+        **request_counts.chart_context(),
+    }
+
 @login_required
 @group_required('technician')
 def technician_dashboard(request):
-    # Requests assigned to this technician
-    user_requests = ServiceRequest.objects.filter(assigned_to=request.user)
-
-    # --- Quick stats cards ---
-    total_assigned = user_requests.count()
-    accepted = user_requests.filter(status='Accepted').count()
-    in_progress = user_requests.filter(status='In Progress').count()
-    completed = user_requests.filter(status='Completed').count()
-    rejected = user_requests.filter(status='Rejected').count()
-    awaiting_confirmation = user_requests.filter(status='Awaiting Confirmation').count()  # updated to use user_requests
-
-    # --- Categories for charts ---
-    category_labels = list(ServiceCategory.objects.values_list('name', flat=True))
-    category_counts = [user_requests.filter(category=c).count() for c in ServiceCategory.objects.all()]
-
-    # --- Statuses for charts ---
-    status_labels = ['New', 'Assigned', 'Accepted', 'In Progress', 'Completed', 'Rejected']
-    status_counts = [user_requests.filter(status=s).count() for s in status_labels]
+    # --- Counts come from the per-user counter table ---
+    request_counts = user_breakdown(request.user, RequestCounter.ROLE_ASSIGNED)
 
     # --- Latest requests table ---
-    latest_requests = user_requests.order_by('-created_at')[:5]
+    latest_requests = technician_latest_requests(request.user)
 
-    context = {
-        'page_title': 'Technician Dashboard',
-        'category_labels_json': json.dumps(category_labels),
-        'category_counts_json': json.dumps(category_counts),
-        'status_labels_json': json.dumps(status_labels),
-        'status_counts_json': json.dumps(status_counts),
-        'total_assigned': total_assigned,
-        'accepted': accepted,
-        'in_progress': in_progress,
-        'completed': completed,
-        'rejected': rejected,
-        'awaiting_confirmation': awaiting_confirmation,  
-        'latest_requests': latest_requests,
-    }
+    context = technician_dashboard_context(request_counts, latest_requests)
     return render(request, 'technician/technician_dashboard.html', context)
 
 @login_required
 @group_required('technician')
+async def technician_dashboard_async(request):
+    """technician_dashboard for ASGI (settings.ASYNC_VIEWS)."""
+    # The user login_required loaded, shared with the templates' request.user
+    request.user = user = await request.auser()
+    request_counts = await auser_breakdown(user, RequestCounter.ROLE_ASSIGNED)
+    latest_requests = await alist(technician_latest_requests(user))
+    context = technician_dashboard_context(request_counts, latest_requests)
+    return await sync_to_async(render)(request, 'technician/technician_dashboard.html', context)
+
+@login_required
+@group_required('technician')
+@conditional_page(own_requests_version)
 def technician_assigned_requests(request):
-    assigned_requests = ServiceRequest.objects.filter(assigned_to=request.user, status__in=['Assigned', 'Accepted', 'In Progress'])
+    assigned_requests = ServiceRequest.objects.filter(
+        assigned_to=request.user, status__in=['Assigned', 'Accepted', 'In Progress']
+    ).select_related('priority')
     return render(request, 'technician/technician_assigned_requests.html', {
         'assigned_requests': assigned_requests
     })
 
 @login_required
 @group_required('technician')
+@conditional_page(request_version(lambda request, request_id: {'pk': request_id, 'assigned_to': request.user}))
 def technician_request_detail(request, request_id):
     service_request = get_object_or_404(ServiceRequest, id=request_id, assigned_to=request.user)
     return render(request, 'technician/technician_request_detail.html', {
@@ -297,17 +466,19 @@ def technician_start_request(request, request_id):
 
 @login_required
 @group_required('technician')
+@conditional_page(own_requests_version)
 def technician_in_progress(request):
     in_progress = ServiceRequest.objects.filter(assigned_to=request.user, status='In Progress')
     return render(request, 'technician/technician_in_progress.html', {'in_progress': in_progress})
 
 @login_required
 @group_required('technician')
+@conditional_page(own_requests_version)
 def technician_completed_requests(request):
     completed_requests = ServiceRequest.objects.filter(
         assigned_to=request.user,
         status='Completed'
-    )
+    ).select_related('category', 'priority', 'created_by')
     return render(request, 'technician/technician_completed_requests.html', {'completed_requests': completed_requests})
 
 @login_required
@@ -336,22 +507,24 @@ def technician_notifications(request):
 
 @login_required
 @group_required('technician')
+@conditional_page(own_requests_version)
 def technician_accepted_requests(request):
     accepted_requests = ServiceRequest.objects.filter(
         assigned_to=request.user,
         status='Accepted'
-    )
+    ).select_related('category', 'priority', 'location')
     return render(request, 'technician/technician_accepted_requests.html', {
         'accepted_requests': accepted_requests
     })
 
 @login_required
 @group_required('technician')
+@conditional_page(own_requests_version)
 def technician_rejected_requests(request):
     rejected_requests = ServiceRequest.objects.filter(
         assigned_to=request.user,
         status='Rejected'
-    )
+    ).select_related('category', 'priority')
     return render(request, 'technician/technician_rejected_requests.html', {
         'rejected_requests': rejected_requests
     })
@@ -429,12 +602,13 @@ def mark_request_complete(request, pk):
 
 @login_required
 @group_required('technician')
+@conditional_page(own_requests_version)
 def technician_awaiting_confirmation(request):
     # Filter requests for the logged-in user that are awaiting confirmation
     requests = ServiceRequest.objects.filter(
         assigned_to=request.user, 
         status="Awaiting Confirmation"
-    )
+    ).select_related('category', 'priority', 'created_by')
     context = {
         'requests': requests
     }
@@ -1,24 +1,26 @@
-from users.models import Notification
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from users.notifications import get_badge
+from users.roles import primary_group
+
 
 def notifications_processor(request):
-    user_group = None
-    if request.user.is_authenticated:
-        groups = request.user.groups.values_list('name', flat=True)
-        if groups.exists():
-            user_group = groups[0]  # assuming 1 group per user
+    """
+    Navbar notification badge. Nothing is loaded until a template actually
+    uses `notifications` or `unread_count`, and then it comes from the cache.
+    """
+    badge = {}
 
-    if user_group:
-        # First, get all notifications for the group
-        all_notifications = Notification.objects.filter(target_group=user_group).order_by('-created_at')
-        # Count unread before slicing
-        unread_count = all_notifications.filter(is_read=False).count()
-        # Then slice for display
-        notifications = all_notifications[:5]
-    else:
-        notifications = Notification.objects.none()
-        unread_count = 0
+    def load():
+        if 'value' not in badge:
+            user_group = primary_group(request.user)
+            badge['value'] = get_badge(request.user, user_group) if user_group else (0, [])
+        return badge['value']
 
     return {
-        'notifications': notifications,
-        'unread_count': unread_count,
+        'notifications': SimpleLazyObject(lambda: load()[1]),
+        'unread_count': SimpleLazyObject(lambda: load()[0]),
+        # Live updates through utils.events
+        'event_stream': settings.EVENT_STREAM,
     }
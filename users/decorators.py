@@ -1,9 +1,11 @@
 from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import PermissionDenied
 
+from .roles import has_group
+
 def group_required(group_name):
     def in_group(u):
-        if u.is_authenticated and u.groups.filter(name=group_name).exists():
+        if u.is_authenticated and has_group(u, group_name):
             return True
         raise PermissionDenied  # blocks access if group doesn't match
     return user_passes_test(in_group)
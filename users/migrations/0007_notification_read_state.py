@@ -0,0 +1,97 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_read_flags(apps, schema_editor):
+    """
+    The shared is_read flags become every group member's own read state: the
+    watermark stops below the group's oldest unread notification and the read
+    ones above it become NotificationRead rows.
+    """
+    Notification = apps.get_model('users', 'Notification')
+    NotificationReadState = apps.get_model('users', 'NotificationReadState')
+    NotificationRead = apps.get_model('users', 'NotificationRead')
+    User = apps.get_model('users', 'CustomUser')
+    db = schema_editor.connection.alias
+
+    # Users are notified through their first group, as in users.roles.primary_group
+    members = {}
+    memberships = (
+        User.objects.using(db).filter(groups__isnull=False)
+        .order_by('pk', 'groups__id').values_list('pk', 'groups__name')
+    )
+    for user_id, group_name in memberships:
+        members.setdefault(user_id, group_name)
+
+    for group_name in set(members.values()):
+        notifications = Notification.objects.using(db).filter(target_group=group_name)
+        first_unread = notifications.filter(is_read=False).order_by('pk').values_list('pk', flat=True).first()
+        if first_unread is None:
+            read_through = notifications.order_by('-pk').values_list('pk', flat=True).first() or 0
+        else:
+            read_through = first_unread - 1
+        read_above = list(notifications.filter(is_read=True, pk__gt=read_through).values_list('pk', flat=True))
+        user_ids = [user_id for user_id, name in members.items() if name == group_name]
+        NotificationReadState.objects.using(db).bulk_create(
+            [NotificationReadState(user_id=user_id, read_through=read_through) for user_id in user_ids]
+        )
+        NotificationRead.objects.using(db).bulk_create(
+            [NotificationRead(user_id=user_id, notification_id=pk) for user_id in user_ids for pk in read_above],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_remove_notification_groups_remove_notification_user_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationRead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NotificationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_through', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['target_group', 'id'], name='notification_group_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationread',
+            name='notification',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reads', to='users.notification'),
+        ),
+        migrations.AddField(
+            model_name='notificationread',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_reads', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='notificationreadstate',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_read_state', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationread',
+            constraint=models.UniqueConstraint(fields=('user', 'notification'), name='notificationread_unique'),
+        ),
+        migrations.RunPython(copy_read_flags, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='notification',
+            name='is_read',
+        ),
+    ]
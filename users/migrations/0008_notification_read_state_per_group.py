@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def scope_watermarks(apps, schema_editor):
+    """
+    Each watermark was set from the notifications of its user's first group
+    (users.roles.primary_group at the time): it becomes that group's. Users
+    without a group have no notifications, so their watermark goes.
+    """
+    NotificationReadState = apps.get_model('users', 'NotificationReadState')
+    User = apps.get_model('users', 'CustomUser')
+    db = schema_editor.connection.alias
+
+    first_groups = {}
+    memberships = (
+        User.objects.using(db).filter(groups__isnull=False)
+        .order_by('pk', 'groups__id').values_list('pk', 'groups__name')
+    )
+    for user_id, group_name in memberships:
+        first_groups.setdefault(user_id, group_name)
+
+    for state in NotificationReadState.objects.using(db).all():
+        group_name = first_groups.get(state.user_id)
+        if group_name is None:
+            state.delete()
+        else:
+            NotificationReadState.objects.using(db).filter(pk=state.pk).update(target_group=group_name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_notification_read_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationreadstate',
+            name='target_group',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.RunPython(scope_watermarks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='notificationreadstate',
+            name='target_group',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='notificationreadstate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_read_states', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationreadstate',
+            constraint=models.UniqueConstraint(fields=('user', 'target_group'), name='notificationreadstate_unique'),
+        ),
+    ]
@@ -29,7 +29,50 @@ class Notification(models.Model):
         ],
         blank=True, null=True
     )
-    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Unread counts: the ids of a group above a user's read_through
+            models.Index(fields=['target_group', 'id'], name='notification_group_idx'),
+        ]
 
     def __str__(self):
         return f"{self.target_group} - {self.message}"
+
+
+class NotificationReadState(models.Model):
+    """
+    Which notifications of `target_group` a user has read: every one with an
+    id up to `read_through`, plus the NotificationRead rows above it. Marking
+    all as read moves the watermark instead of touching the notifications.
+    Ids are shared by every group, so each group has its own watermark.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notification_read_states'
+    )
+    target_group = models.CharField(max_length=50)
+    read_through = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'target_group'], name='notificationreadstate_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} read {self.target_group} through #{self.read_through}"
+
+
+class NotificationRead(models.Model):
+    """A notification read individually, above its reader's read_through."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notification_reads')
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='reads')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'notification'], name='notificationread_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} read #{self.notification_id}"
@@ -0,0 +1,140 @@
+from django.core.cache import cache
+from django.db.models import Case, Exists, OuterRef, Q, Value, When
+from django.db.models.functions import Coalesce
+
+from service.versions import bump_versions, versions
+
+from .models import Notification, NotificationRead, NotificationReadState
+
+# Number of notifications shown in the navbar dropdown
+BADGE_SIZE = 5
+# Cached badges are keyed by data versions, so a stale entry is never read;
+# the timeout only frees entries that a newer version replaced
+BADGE_CACHE_TIMEOUT = 300
+
+
+def notifications_key(group_name):
+    """Version of a group's notifications: bumped when one is written or deleted."""
+    return f'notifications:{group_name}'
+
+
+def reads_key(user_id):
+    """Version of a user's read state: bumped when they mark notifications read."""
+    return f'reads:{user_id}'
+
+
+def get_badge(user, group_name):
+    """
+    (unread_count, latest notifications) of `user` in `group_name`. One query
+    reads the data versions (ChangeVersion, shared by every process); the badge
+    is served from the cache while they are unchanged. Memoized on the user
+    object, which lives for one request: the ETag and the navbar share it.
+    """
+    badges = getattr(user, '_badges', None)
+    if badges is None:
+        badges = user._badges = {}
+    if group_name not in badges:
+        badges[group_name] = load_badge(user, group_name)
+    return badges[group_name]
+
+
+def load_badge(user, group_name):
+    group_version, read_version = versions([notifications_key(group_name), reads_key(user.pk)])
+    key = f'notifications:badge:{group_name}:{group_version}'
+    latest = cache.get(key)
+    if latest is None:
+        latest = list(Notification.objects.filter(target_group=group_name).order_by('-created_at')[:BADGE_SIZE])
+        cache.set(key, latest, BADGE_CACHE_TIMEOUT)
+    key = f'notifications:unread:{user.pk}:{group_name}:{group_version}:{read_version}'
+    count = cache.get(key)
+    if count is None:
+        count = unread_count(user, group_name)
+        cache.set(key, count, BADGE_CACHE_TIMEOUT)
+    return count, latest
+
+
+def invalidate_badge(group_name):
+    bump_versions([notifications_key(group_name)])
+
+
+# --- Per-user read state ---
+
+def read_through_of(user, group_name):
+    """
+    Subquery of the user's watermark in `group_name` (a name or an OuterRef):
+    every notification of the group up to this id is read.
+    """
+    watermark = NotificationReadState.objects.filter(user=user, target_group=group_name).values('read_through')[:1]
+    return Coalesce(watermark, Value(0))
+
+
+def unread_count(user, group_name):
+    """
+    One query: the group's ids above the user's watermark (a range of the
+    (target_group, id) index) less the ones read individually.
+    """
+    return (
+        Notification.objects.filter(target_group=group_name, pk__gt=read_through_of(user, group_name))
+        .exclude(Exists(NotificationRead.objects.filter(user=user, notification=OuterRef('pk'))))
+        .count()
+    )
+
+
+def with_read_state(notifications, user):
+    """`notifications` annotated with `is_read` for `user`, each against its group's watermark."""
+    return notifications.annotate(
+        is_read=Case(
+            When(
+                Q(pk__lte=read_through_of(user, OuterRef('target_group')))
+                | Q(Exists(NotificationRead.objects.filter(user=user, notification=OuterRef('pk')))),
+                then=Value(True),
+            ),
+            default=Value(False),
+        )
+    )
+
+
+def mark_all_read(user, group_name, up_to=None):
+    """
+    Mark every notification of the group up to `up_to` (default: the newest)
+    as read for `user`: one upsert of the watermark. NotificationRead rows at
+    or below it no longer count and are removed by the next mark_read().
+    """
+    if up_to is None:
+        up_to = Notification.objects.filter(target_group=group_name).order_by('-pk').values_list('pk', flat=True).first()
+    if not up_to:
+        return
+    state, created = NotificationReadState.objects.get_or_create(
+        user=user, target_group=group_name, defaults={'read_through': up_to}
+    )
+    if not created and state.read_through < up_to:
+        # Never move the watermark back, even when an older page posts
+        NotificationReadState.objects.filter(pk=state.pk, read_through__lt=up_to).update(read_through=up_to)
+    bump_versions([reads_key(user.pk)])
+    user._badges = None
+
+
+def mark_read(user, notification):
+    """
+    Mark one notification as read for `user`. When that leaves no unread
+    notification directly above the watermark, the watermark moves up and the
+    exceptions it now covers are deleted, so they stay few.
+    """
+    state, _ = NotificationReadState.objects.get_or_create(user=user, target_group=notification.target_group)
+    if notification.pk <= state.read_through:
+        return
+    NotificationRead.objects.bulk_create([NotificationRead(user=user, notification=notification)], ignore_conflicts=True)
+
+    group = Notification.objects.filter(target_group=notification.target_group, pk__gt=state.read_through)
+    first_unread = (
+        group.exclude(Exists(NotificationRead.objects.filter(user=user, notification=OuterRef('pk'))))
+        .order_by('pk').values_list('pk', flat=True).first()
+    )
+    read_through = first_unread - 1 if first_unread is not None else group.order_by('-pk').values_list('pk', flat=True).first()
+    if read_through and read_through > state.read_through:
+        NotificationReadState.objects.filter(pk=state.pk, read_through__lt=read_through).update(read_through=read_through)
+        NotificationRead.objects.filter(
+            user=user, notification__target_group=notification.target_group, notification_id__lte=read_through
+        ).delete()
+    bump_versions([reads_key(user.pk)])
+    user._badges = None
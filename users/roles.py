@@ -0,0 +1,24 @@
+def user_groups(user):
+    """
+    Names of the groups `user` belongs to, ordered by group id.
+    Loaded at most once per request (memoized on the user object, which
+    lives for one request). Never cached across requests: authorization
+    must see a changed membership on the next request, on every worker.
+    """
+    if not user.is_authenticated:
+        return ()
+    groups = getattr(user, '_group_names', None)
+    if groups is None:
+        groups = tuple(user.groups.order_by('id').values_list('name', flat=True))
+        user._group_names = groups
+    return groups
+
+
+def has_group(user, group_name):
+    return group_name in user_groups(user)
+
+
+def primary_group(user):
+    """The user's first group (users normally belong to exactly one)."""
+    groups = user_groups(user)
+    return groups[0] if groups else None
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from utils.events import group_channel, publish
+
+from .models import Notification
+from .notifications import invalidate_badge
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notification_changed(sender, instance, **kwargs):
+    invalidate_badge(instance.target_group)
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, created, **kwargs):
+    if created and instance.target_group:
+        publish([(group_channel(instance.target_group), 'notification', {
+            'id': instance.pk,
+            'message': instance.message,
+            'created_at': instance.created_at.isoformat(),
+        })])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def group_membership_changed(sender, instance, action, reverse, **kwargs):
+    # The memoized group names of this user object are stale now
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        instance.__dict__.pop('_group_names', None)
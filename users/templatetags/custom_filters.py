@@ -2,6 +2,8 @@
 from django import template
 from django.utils.html import format_html
 
+from users import roles
+
 register = template.Library()
 
 @register.filter(name='add_class')
@@ -24,4 +26,4 @@ def has_group(user, group_name):
     Returns True if the user is in the given group.
     Usage: {% if request.user|has_group:"staff" %}
     """
-    return user.groups.filter(name=group_name).exists()
\ No newline at end of file
+    return roles.has_group(user, group_name)
\ No newline at end of file
@@ -1,3 +1,220 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .models import Notification, NotificationRead, NotificationReadState
+from .notifications import get_badge, mark_all_read, mark_read, unread_count, with_read_state
+
+User = get_user_model()
+
+
+# --- Read state ---
+
+class NotificationReadStateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tech1', password='pw')
+        cls.other = User.objects.create_user('tech2', password='pw')
+        cls.notifications = [
+            Notification.objects.create(message=f'Notice {i}', target_group='technician') for i in range(5)
+        ]
+        Notification.objects.create(message='For admins', target_group='admin')
+
+    def read_through(self, user=None):
+        return NotificationReadState.objects.get(user=user or self.user, target_group='technician').read_through
+
+    def test_everything_is_unread_at_first(self):
+        self.assertEqual(unread_count(self.user, 'technician'), 5)
+
+    def test_reading_in_order_moves_the_watermark(self):
+        first, second = self.notifications[:2]
+        mark_read(self.user, first)
+        mark_read(self.user, second)
+        self.assertEqual(self.read_through(), second.pk)
+        self.assertFalse(NotificationRead.objects.exists())
+        self.assertEqual(unread_count(self.user, 'technician'), 3)
+
+    def test_reading_out_of_order_keeps_an_exception_until_the_gap_closes(self):
+        first, second, third = self.notifications[:3]
+        mark_read(self.user, third)
+        self.assertEqual(self.read_through(), 0)
+        self.assertEqual(list(NotificationRead.objects.values_list('notification', flat=True)), [third.pk])
+        self.assertEqual(unread_count(self.user, 'technician'), 4)
+
+        mark_read(self.user, first)
+        mark_read(self.user, second)
+        self.assertEqual(self.read_through(), third.pk)
+        self.assertFalse(NotificationRead.objects.exists())
+        self.assertEqual(unread_count(self.user, 'technician'), 2)
+
+    def test_reading_is_per_user(self):
+        mark_all_read(self.user, 'technician')
+        self.assertEqual(unread_count(self.user, 'technician'), 0)
+        self.assertEqual(unread_count(self.other, 'technician'), 5)
+
+    def test_mark_all_read_never_moves_the_watermark_back(self):
+        mark_all_read(self.user, 'technician')
+        mark_all_read(self.user, 'technician', up_to=self.notifications[1].pk)
+        self.assertEqual(self.read_through(), self.notifications[-1].pk)
+
+    def test_mark_all_read_covers_only_what_was_there(self):
+        mark_all_read(self.user, 'technician')
+        Notification.objects.create(message='Later', target_group='technician')
+        self.assertEqual(unread_count(self.user, 'technician'), 1)
+
+    def test_read_flags_of_a_page(self):
+        mark_read(self.user, self.notifications[3])
+        mark_read(self.user, self.notifications[0])
+        flags = dict(
+            with_read_state(Notification.objects.filter(target_group='technician'), self.user)
+            .values_list('pk', 'is_read')
+        )
+        self.assertEqual([flags[n.pk] for n in self.notifications], [True, False, False, True, False])
+
+    def test_each_group_has_its_own_watermark(self):
+        # The admin notice has the highest id: a shared watermark would cover every technician notice
+        mark_all_read(self.user, 'admin')
+        self.assertEqual(unread_count(self.user, 'admin'), 0)
+        self.assertEqual(unread_count(self.user, 'technician'), 5)
+        mark_read(self.user, self.notifications[0])
+        self.assertEqual(self.read_through(), self.notifications[0].pk)
+        flags = dict(with_read_state(Notification.objects.all(), self.user).values_list('message', 'is_read'))
+        self.assertEqual(flags, {'For admins': True, 'Notice 0': True, **{f'Notice {i}': False for i in range(1, 5)}})
+
+
+# --- Mark-read views ---
+
+class MarkReadViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin1', password='pw')
+        cls.admin.groups.add(Group.objects.create(name='admin'))
+        cls.technician = User.objects.create_user('tech1', password='pw')
+        cls.technician.groups.add(Group.objects.create(name='technician'))
+        cls.for_admins = Notification.objects.create(message='Report ready', target_group='admin')
+        cls.for_technicians = [
+            Notification.objects.create(message=f'Notice {i}', target_group='technician') for i in range(2)
+        ]
+
+    def test_admin_marks_their_notification_read(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse('mark_notification_read', args=[self.for_admins.pk]), {'next': reverse('adminn_dashboard')}
+        )
+        self.assertRedirects(response, reverse('adminn_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(unread_count(self.admin, 'admin'), 0)
+
+    def test_technician_marks_their_notifications_read(self):
+        self.client.force_login(self.technician)
+        self.client.post(reverse('mark_notification_read', args=[self.for_technicians[0].pk]))
+        self.assertEqual(unread_count(self.technician, 'technician'), 1)
+        self.client.post(reverse('mark_all_notifications_read'), {'up_to': self.for_technicians[1].pk})
+        self.assertEqual(unread_count(self.technician, 'technician'), 0)
+
+    def test_other_groups_notifications_are_out_of_reach(self):
+        self.client.force_login(self.technician)
+        response = self.client.post(reverse('mark_notification_read', args=[self.for_admins.pk]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(reverse('mark_all_notifications_read'), {'group': 'admin'})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(NotificationReadState.objects.filter(user=self.technician).exists())
+
+
+# --- Badge ---
+
+class BadgeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tech1', password='pw')
+        Notification.objects.create(message='First', target_group='technician')
+
+    def in_another_process(self):
+        """Writes made here reach the database but not this process's cache."""
+        return mock.patch('users.notifications.cache', LocMemCache('another-process', {}))
+
+    def setUp(self):
+        # A fresh user object per "request": get_badge() memoizes on it
+        self.user = User.objects.get(pk=self.user.pk)
+
+    def get_badge(self):
+        return get_badge(User.objects.get(pk=self.user.pk), 'technician')
+
+    def test_served_from_the_cache_while_nothing_changes(self):
+        self.get_badge()
+        with self.assertNumQueries(1):
+            count, latest = get_badge(self.user, 'technician')
+        with self.assertNumQueries(0):
+            get_badge(self.user, 'technician')
+        self.assertEqual((count, [n.message for n in latest]), (1, ['First']))
+
+    def test_sees_a_notification_written_by_another_process(self):
+        self.get_badge()
+        with self.in_another_process():
+            Notification.objects.create(message='Second', target_group='technician')
+        count, latest = self.get_badge()
+        self.assertEqual((count, [n.message for n in latest]), (2, ['Second', 'First']))
+
+    def test_sees_reads_marked_in_another_process(self):
+        self.get_badge()
+        with self.in_another_process():
+            mark_all_read(self.user, 'technician')
+        self.assertEqual(self.get_badge()[0], 0)
+
+
+# --- Migration 0007 ---
+
+class CopyReadFlagsMigrationTests(TransactionTestCase):
+    before = [('users', '0006_remove_notification_groups_remove_notification_user_and_more')]
+    after = [('users', '0008_notification_read_state_per_group')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_shared_flags_become_each_members_read_state(self):
+        apps = self.migrate(self.before)
+        OldUser = apps.get_model('users', 'CustomUser')
+        OldGroup = apps.get_model('auth', 'Group')
+        OldNotification = apps.get_model('users', 'Notification')
+
+        technicians = OldGroup.objects.create(name='technician')
+        admins = OldGroup.objects.create(name='admin')
+        tech1 = OldUser.objects.create(username='tech1')
+        tech2 = OldUser.objects.create(username='tech2')
+        admin = OldUser.objects.create(username='admin1')
+        tech1.groups.add(technicians)
+        tech2.groups.add(technicians)
+        admin.groups.add(admins)
+        # read, read, unread, read: the watermark stops below the unread one
+        ids = [
+            OldNotification.objects.create(message=str(i), target_group='technician', is_read=is_read).pk
+            for i, is_read in enumerate([True, True, False, True])
+        ]
+        admin_ids = [OldNotification.objects.create(message='a', target_group='admin', is_read=True).pk]
+
+        self.migrate(self.after)
+        for username in ('tech1', 'tech2'):
+            with self.subTest(user=username):
+                user = User.objects.get(username=username)
+                self.assertEqual(NotificationReadState.objects.get(user=user, target_group='technician').read_through, ids[1])
+                self.assertEqual(
+                    list(NotificationRead.objects.filter(user=user).values_list('notification', flat=True)), [ids[3]]
+                )
+                self.assertEqual(unread_count(user, 'technician'), 1)
+        admin = User.objects.get(username='admin1')
+        self.assertEqual(NotificationReadState.objects.get(user=admin, target_group='admin').read_through, admin_ids[0])
+        self.assertEqual(unread_count(admin, 'admin'), 0)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from django.views.generic import RedirectView
 from django.contrib.auth.views import LogoutView
@@ -39,7 +40,7 @@ urlpatterns = [
     # ----------------------
     # Admin URLs
     # ----------------------
-    path('adminn/dashboard/', views.adminn_dashboard, name='adminn_dashboard'),
+    path('adminn/dashboard/', views.adminn_dashboard_async if settings.ASYNC_VIEWS else views.adminn_dashboard, name='adminn_dashboard'),
     path('adminn/add-user/', views.add_user, name='add_user'),
     path('adminn/view-users/', views.view_users, name='view_users'),
     path('adminn/user-details/<int:user_id>/', views.user_details, name='user_details'),
@@ -56,12 +57,22 @@ urlpatterns = [
     # ----------------------
     # Staff URLs
     # ----------------------
-    path('staff/dashboard/', views.staff_dashboard, name='staff_dashboard'),
+    path('staff/dashboard/', views.staff_dashboard_async if settings.ASYNC_VIEWS else views.staff_dashboard, name='staff_dashboard'),
     path('profile/', views.view_profile, name='view_profile'),
     path('edit-profile/', views.edit_profile, name='edit_profile'),
     path('submit-request/', views.submit_request, name='submit_request'),
     path('my-requests/', views.my_requests, name='my_requests'),
     path('notifications/', views.notifications, name='notifications'),
+    path('notifications/read/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
+    path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark_notification_read'),
+    path('events/', views.event_stream, name='event_stream'),
     path('feedback/', views.submit_feedback, name='submit_feedback'),
     path('faqs/', views.faqs, name='faqs'),
 ]
+
+# The async dashboards under their own names too, only where they are served
+if settings.ASYNC_VIEWS:
+    urlpatterns += [
+        path('adminn/dashboard/async/', views.adminn_dashboard_async, name='adminn_dashboard_async'),
+        path('staff/dashboard/async/', views.staff_dashboard_async, name='staff_dashboard_async'),
+    ]
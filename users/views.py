@@ -1,18 +1,29 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.views import LoginView, LogoutView, PasswordChangeView, PasswordChangeDoneView,PasswordResetConfirmView
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse_lazy
+from django.utils.http import url_has_allowed_host_and_scheme
 from .forms import CustomLoginForm, EditProfileForm, CustomUserCreationForm, TechnicianCreationForm
 from service.models import TechnicianProfile
 from users.decorators import group_required 
+from users.roles import has_group, primary_group
 from service.models import ServiceCategory, ServiceRequest, PriorityLevel, SupportDepartment, TechnicianProfile
 from .models import Notification
-import json
+from .notifications import mark_all_read, mark_read, with_read_state
+from utils.events import group_channel, stream, user_channel
+from service.metrics import aadmin_dashboard_metrics, admin_dashboard_metrics, alist
+from service.counters import auser_breakdown, user_breakdown
+from service.models import RequestCounter
 from django.contrib.auth import get_user_model
 from django.contrib import messages
 from django.contrib.auth.models import Group
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_POST
 
 
 User = get_user_model()
@@ -25,13 +36,13 @@ class UserLoginView(LoginView):
         user = self.request.user
         if not user.is_authenticated:
             return reverse_lazy('login')
-        if user.groups.filter(name='admin').exists():
+        if has_group(user, 'admin'):
             return reverse_lazy('adminn_dashboard')
-        elif user.groups.filter(name='staff').exists():
+        elif has_group(user, 'staff'):
             return reverse_lazy('staff_dashboard')
-        elif user.groups.filter(name='technician').exists():
+        elif has_group(user, 'technician'):
             return reverse_lazy('technician_dashboard')
-        elif user.groups.filter(name='manager').exists():
+        elif has_group(user, 'manager'):
             return reverse_lazy('manager_dashboard')
         else:
             return reverse_lazy('login')
@@ -40,39 +51,44 @@ class UserLogoutView(LogoutView):
     template_name = 'login.html'
     authentication_form = CustomLoginForm
 
+def staff_latest_requests(user):
+    return ServiceRequest.objects.filter(
+        created_by=user
+    ).select_related('category').order_by('-created_at')[:5]
+
+def staff_dashboard_context(request_counts, latest_requests):
+    return {
+        'page_title': 'Staff Dashboard',
+        'total_requests': request_counts.total,
+        'pending_requests': request_counts.status_count('New'),
+        'completed_requests': request_counts.status_count('Completed'),
+        'rejected_requests': request_counts.status_count('Rejected'),
+        'latest_requests': latest_requests,
+        **request_counts.chart_context(),
+    }
+
 @login_required
 @group_required('staff')
 def staff_dashboard(request):
-    # --- Categories ---
-    category_labels = list(ServiceCategory.objects.values_list('name', flat=True))
-    category_counts = [ServiceRequest.objects.filter(category=c, created_by=request.user).count() for c in ServiceCategory.objects.all()]
-
-    # --- Statuses ---
-    status_labels = ['New', 'Assigned', 'Accepted', 'In Progress', 'Completed', 'Rejected']
-    status_counts = [ServiceRequest.objects.filter(created_by=request.user, status=s).count() for s in status_labels]
-
-    # --- Quick stats cards ---
-    total_requests = ServiceRequest.objects.filter(created_by=request.user).count()
-    pending_requests = ServiceRequest.objects.filter(created_by=request.user, status='New').count()
-    completed_requests = ServiceRequest.objects.filter(created_by=request.user, status='Completed').count()
-    rejected_requests = ServiceRequest.objects.filter(created_by=request.user, status='Rejected').count()
+    # --- Counts come from the per-user counter table ---
+    request_counts = user_breakdown(request.user, RequestCounter.ROLE_CREATED)
 
     # --- Latest requests table ---
-    latest_requests = ServiceRequest.objects.filter(created_by=request.user).order_by('-created_at')[:5]
+    latest_requests = staff_latest_requests(request.user)
 
-    context = {
-        'page_title': 'Staff Dashboard',
-        'category_labels_json': json.dumps(category_labels),
-        'category_counts_json': json.dumps(category_counts),
-        'status_labels_json': json.dumps(status_labels),
-        'status_counts_json': json.dumps(status_counts),
-        'total_requests': total_requests,
-        'pending_requests': pending_requests,
-        'completed_requests': completed_requests,
-        'rejected_requests': rejected_requests,
-        'latest_requests': latest_requests,
-    }
+    context = staff_dashboard_context(request_counts, latest_requests)
     return render(request, 'staff/staff_dashboard.html', context)
+
+@login_required
+@group_required('staff')
+async def staff_dashboard_async(request):
+    """staff_dashboard for ASGI (settings.ASYNC_VIEWS)."""
+    # The user login_required loaded, shared with the templates' request.user
+    request.user = user = await request.auser()
+    request_counts = await auser_breakdown(user, RequestCounter.ROLE_CREATED)
+    latest_requests = await alist(staff_latest_requests(user))
+    context = staff_dashboard_context(request_counts, latest_requests)
+    return await sync_to_async(render)(request, 'staff/staff_dashboard.html', context)
     
 @login_required
 def view_profile(request):
@@ -101,12 +117,12 @@ def my_requests(request):
 @login_required
 @group_required('staff')
 def notifications(request):
-    user_group = request.user.groups.first().name if request.user.groups.exists() else None
+    user_group = primary_group(request.user)
 
     if user_group:
-        notifications = Notification.objects.filter(
+        notifications = with_read_state(Notification.objects.filter(
             target_group=user_group
-        ).order_by('-created_at')
+        ), request.user).order_by('-created_at')
     else:
         notifications = Notification.objects.none()
 
@@ -115,6 +131,55 @@ def notifications(request):
     }
     return render(request, 'staff/notifications.html', context)
 
+@login_required
+@require_POST
+def mark_all_notifications_read(request):
+    # Up to the newest notification the page showed, not ones that arrived since
+    up_to = request.POST.get('up_to', '')
+    user_group = request.POST.get('group') or primary_group(request.user)
+    if user_group:
+        if not has_group(request.user, user_group):
+            raise Http404
+        mark_all_read(request.user, user_group, int(up_to) if up_to.isdigit() else None)
+    return redirect(notifications_next(request))
+
+@login_required
+@require_POST
+def mark_notification_read(request, notification_id):
+    notification = get_object_or_404(Notification, pk=notification_id)
+    if not has_group(request.user, notification.target_group):
+        raise Http404
+    mark_read(request.user, notification)
+    return redirect(notifications_next(request))
+
+def notifications_next(request):
+    """The page that posted (`next`), back to the staff notifications page by default."""
+    next_url = request.POST.get('next')
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return next_url
+    return 'notifications'
+
+@login_required
+async def event_stream(request):
+    """Server-Sent Events: the user's group notifications and changes to their requests."""
+    if not settings.EVENT_STREAM or not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for the whole stream; 204 stops EventSource reconnecting
+        return HttpResponse(status=204)
+    user = await request.auser()
+    user_group = await sync_to_async(primary_group)(user)
+    channels = {user_channel(user.pk)}
+    if user_group:
+        channels.add(group_channel(user_group))
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_id = int(last_event_id) if last_event_id.isdigit() else None
+
+    response = StreamingHttpResponse(stream(channels, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep proxies such as nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def submit_feedback(request):
     return render(request, 'staff/feedback.html')
@@ -134,60 +199,51 @@ class UserPasswordChangeDoneView(PasswordChangeDoneView):
 
 # ADMIN VIEWS
 def is_admin(user):
-    return user.is_superuser or user.groups.filter(name='admin').exists()
+    return user.is_superuser or has_group(user, 'admin')
+
+def admin_latest_requests():
+    return ServiceRequest.objects.select_related(
+        'category', 'created_by'
+    ).order_by('-created_at')[:5]
+
+def admin_dashboard_context(metrics, latest_requests):
+    request_counts = metrics.requests
+    return {
+        'total_users': metrics.total_users,
+        'total_technicians': metrics.users_by_role['technician'],
+        'total_staff': metrics.users_by_role['staff'],
+        'total_admins': metrics.users_by_role['admin'],
+        'total_requests': request_counts.total,
+        'pending_requests': request_counts.status_count('New'),
+        'in_progress_requests': request_counts.status_count('In Progress'),
+        'completed_requests': request_counts.status_count('Completed'),
+        'rejected_requests': request_counts.status_count('Rejected'),
+        'latest_requests': latest_requests,
+        **metrics.chart_context(),
+    }
 
 @login_required
 @group_required('admin')
 def adminn_dashboard(request):
-    # --- Users ---
-    total_users = User.objects.count()
-    total_technicians = User.objects.filter(groups__name='technician').count()
-    total_staff = User.objects.filter(groups__name='staff').count()
-    total_admins = User.objects.filter(groups__name='admin').count()
-
-    # --- Service Requests ---
-    total_requests = ServiceRequest.objects.count()
-    pending_requests = ServiceRequest.objects.filter(status='New').count()
-    in_progress_requests = ServiceRequest.objects.filter(status='In Progress').count()
-    completed_requests = ServiceRequest.objects.filter(status='Completed').count()
-    rejected_requests = ServiceRequest.objects.filter(status='Rejected').count()
-
-    # --- Charts ---
-    # Users by Role
-    user_roles_labels = ['Admin', 'Staff', 'Technician']
-    user_roles_counts = [total_admins, total_staff, total_technicians]
-
-    # Requests by Category
-    category_labels = list(ServiceCategory.objects.values_list('name', flat=True))
-    category_counts = [ServiceRequest.objects.filter(category=c).count() for c in ServiceCategory.objects.all()]
-
-    # Requests by Status
-    status_labels = ['New', 'Assigned', 'Accepted', 'In Progress', 'Completed', 'Rejected']
-    status_counts = [ServiceRequest.objects.filter(status=s).count() for s in status_labels]
+    metrics = admin_dashboard_metrics()
 
     # Latest Requests
-    latest_requests = ServiceRequest.objects.all().order_by('-created_at')[:5]
+    latest_requests = admin_latest_requests()
 
-    context = {
-        'total_users': total_users,
-        'total_technicians': total_technicians,
-        'total_staff': total_staff,
-        'total_admins': total_admins,
-        'total_requests': total_requests,
-        'pending_requests': pending_requests,
-        'in_progress_requests': in_progress_requests,
-        'completed_requests': completed_requests,
-        'rejected_requests': rejected_requests,
-        'user_roles_labels_json': json.dumps(user_roles_labels),
-        'user_roles_counts_json': json.dumps(user_roles_counts),
-        'category_labels_json': json.dumps(category_labels),
-        'category_counts_json': json.dumps(category_counts),
-        'status_labels_json': json.dumps(status_labels),
-        'status_counts_json': json.dumps(status_counts),
-        'latest_requests': latest_requests,
-    }
+    context = admin_dashboard_context(metrics, latest_requests)
     return render(request, 'adminn/adminn_dashboard.html', context)
 
+@login_required
+@group_required('admin')
+async def adminn_dashboard_async(request):
+    """adminn_dashboard for ASGI (settings.ASYNC_VIEWS)."""
+    # The user login_required loaded, shared with the templates' request.user
+    request.user = await request.auser()
+    metrics = await aadmin_dashboard_metrics()
+    latest_requests = await alist(admin_latest_requests())
+    context = admin_dashboard_context(metrics, latest_requests)
+    return await sync_to_async(render)(request, 'adminn/adminn_dashboard.html', context)
+
 
 @login_required
 @group_required('admin')
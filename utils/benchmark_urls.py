@@ -0,0 +1,9 @@
+from django.urls import include, path
+
+from .benchmarks import twin_patterns
+
+# Used by `manage.py benchmark_asgi` (see utils.benchmarks.BENCHMARK_URLCONF)
+urlpatterns = [
+    *twin_patterns(),
+    path('', include('config.urls')),
+]
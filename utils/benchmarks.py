@@ -0,0 +1,329 @@
+import asyncio
+import re
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, path, reverse
+from django.utils.module_loading import import_string
+
+from service.models import ServiceRequest
+from utils.models import ReportJob
+
+User = get_user_model()
+
+# URL configurations whose views are benchmarked
+BENCHMARKED_URLCONFS = ('service.urls', 'users.urls', 'utils.urls')
+
+ROLES = ('admin', 'staff', 'technician', 'manager')
+
+# Views that change data on GET (or need a one-time token); never called
+SKIPPED_VIEWS = {
+    'logout',
+    'delete_user',
+    'confirm_completion',
+    'technician_start_request',
+    'technician_accept_request',
+    'mark_request_complete',
+    'auto_assign_requests',
+    'password_reset_confirm',
+}
+
+# Views that render every matching request without pagination: their time and
+# memory grow with the table, so they are skipped on large datasets
+UNPAGINATED_VIEWS = {
+    'completed_requests',
+    'in_progress_requests',
+    'pending_requests',
+    'technician_assigned_requests',
+    'technician_in_progress',
+    'technician_completed_requests',
+    'technician_accepted_requests',
+    'technician_rejected_requests',
+    'technician_awaiting_confirmation',
+    'request_reports_print',
+}
+
+PATH_PARAMETER = re.compile(r'<(?:\w+:)?(\w+)>')
+
+
+def benchmarked_urls():
+    """(key, route) of every GET-safe URL in BENCHMARKED_URLCONFS, in urlconf order."""
+    urls = []
+    for include in get_resolver().url_patterns:
+        if not isinstance(include, URLResolver):
+            continue
+        module = getattr(include.urlconf_name, '__name__', include.urlconf_name)
+        if module not in BENCHMARKED_URLCONFS:
+            continue
+        for pattern in include.url_patterns:
+            if not isinstance(pattern, URLPattern) or pattern.name in SKIPPED_VIEWS:
+                continue
+            route = '/' + str(include.pattern) + str(pattern.pattern)
+            app = module.split('.')[0]
+            urls.append((f"{app}:{pattern.name or route}", route))
+    return urls
+
+
+def role_users():
+    """The first active user of every role group."""
+    users = {}
+    for role in ROLES:
+        user = User.objects.filter(groups__name=role, is_active=True).order_by('pk').first()
+        if user is not None:
+            users[role] = user
+    return users
+
+
+def path_values(user, role):
+    """Values for the path parameters, picked so the views find their objects for `user`."""
+    requests = ServiceRequest.objects.order_by('-pk')
+    if role == 'staff':
+        requests = requests.filter(created_by=user)
+    elif role == 'technician':
+        requests = requests.filter(assigned_to=user)
+    service_request = requests.first()
+    technician = User.objects.filter(groups__name='technician').order_by('pk').first()
+    staff = User.objects.filter(groups__name='staff').order_by('pk').first()
+    job = ReportJob.objects.order_by('-pk').first()
+    return {
+        'pk': service_request.pk if service_request else None,
+        'request_id': service_request.pk if service_request else None,
+        'user_id': staff.pk if staff else None,
+        'job_id': job.pk if job else None,
+        'technician_pk': technician.pk if technician else None,
+    }
+
+
+def build_url(key, route, values):
+    """The concrete URL for `route`, or None when a parameter has no sample value."""
+    if key == 'service:technician_detail':
+        values = {**values, 'pk': values['technician_pk']}
+    missing = [name for name in PATH_PARAMETER.findall(route) if values.get(name) is None]
+    if missing:
+        return None
+    return PATH_PARAMETER.sub(lambda match: str(values[match.group(1)]), route)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(client, url, iterations, warmup, timeout=None):
+    """
+    Latency percentiles, query count and peak traced memory of GET `url`.
+    After `timeout` seconds no further request is started (one that is
+    running is not interrupted): the figures cover the requests made so far
+    and `timed_out` is set.
+    """
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    timed_out = False
+    for _ in range(warmup):
+        client.get(url)
+        if deadline is not None and time.perf_counter() > deadline:
+            timed_out = True
+            break
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        if deadline is not None and time.perf_counter() > deadline:
+            timed_out = True
+            break
+    if timed_out:
+        return {
+            'url': url,
+            'status': response.status_code if timings else None,
+            'timed_out': True,
+            'iterations': len(timings),
+            **({'p50_ms': round(percentile(timings, 0.50), 3)} if timings else {}),
+        }
+
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    # captured_queries reads the connection log, which the next request resets
+    query_count = len(queries.captured_queries)
+
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'url': url,
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p90_ms': round(percentile(timings, 0.90), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': query_count,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(iterations=20, warmup=2, only=None, stdout=None, timeout=60, max_list_rows=5000):
+    """
+    Benchmark every URL as every role. Returns {'<role> <app>:<name>': figures}.
+    Each URL gets `timeout` seconds; UNPAGINATED_VIEWS are skipped when there
+    are more than `max_list_rows` requests (None: never).
+    """
+    results = {}
+    skipped = set()
+    if max_list_rows is not None and ServiceRequest.objects.count() > max_list_rows:
+        skipped = UNPAGINATED_VIEWS
+        if stdout:
+            stdout.write(
+                f"Skipping views without pagination (more than {max_list_rows} requests): "
+                f"{', '.join(sorted(skipped))}"
+            )
+    # The test client talks to 'testserver', which production settings do not allow
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for role, user in role_users().items():
+            results.update(benchmark_role(role, user, iterations, warmup, only, stdout, timeout, skipped))
+    return results
+
+
+def benchmark_role(role, user, iterations, warmup, only, stdout, timeout=None, skipped=()):
+    results = {}
+    # Broken views are recorded with their 500 status instead of stopping the run
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+    values = path_values(user, role)
+    for key, route in benchmarked_urls():
+        if only and not any(part in key for part in only):
+            continue
+        if key.split(':', 1)[1] in skipped:
+            continue
+        url = build_url(key, route, values)
+        if url is None:
+            continue
+        figures = measure(client, url, iterations, warmup, timeout)
+        results[f"{role} {key}"] = figures
+        if figures.get('timed_out'):
+            if stdout:
+                stdout.write(f"{role:<10} {key:<45} timed out after {figures['iterations']} request(s)")
+            continue
+        if stdout:
+            stdout.write(
+                f"{role:<10} {key:<45} {figures['status']}  p50 {figures['p50_ms']:>8.2f} ms  "
+                f"{figures['queries']:>3} queries  {figures['peak_kib']:>8.1f} KiB"
+            )
+    return results
+
+
+# Figures compared against a baseline, with the relative change counted as a regression
+COMPARED_FIGURES = ('p50_ms', 'p90_ms', 'queries', 'peak_kib')
+
+
+def compare(baseline, current, threshold):
+    """
+    Rows of (key, figure, before, after, change) for figures that changed by
+    more than `threshold` (a fraction) between two result sets. Query counts
+    are compared exactly.
+    """
+    rows = []
+    for key, figures in current.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for name in COMPARED_FIGURES:
+            old, new = before.get(name), figures.get(name)
+            if old is None or new is None or old == new:
+                continue
+            change = (new - old) / old if old else float('inf')
+            if name == 'queries' or abs(change) > threshold:
+                rows.append((key, name, old, new, change))
+    return rows
+
+
+# --- ASGI concurrency ---
+
+# (role, URL name, sync view, async view) of the views that have an async twin
+ASYNC_VIEWS = (
+    ('admin', 'adminn_dashboard', 'users.views.adminn_dashboard', 'users.views.adminn_dashboard_async'),
+    ('staff', 'staff_dashboard', 'users.views.staff_dashboard', 'users.views.staff_dashboard_async'),
+    ('technician', 'technician_dashboard', 'service.views.technician_dashboard', 'service.views.technician_dashboard_async'),
+    ('admin', 'request_reports', 'utils.views.request_reports', 'utils.views.request_reports_async'),
+)
+
+# ROOT_URLCONF while comparing: the site plus both variants of every ASYNC_VIEWS
+# entry, whatever settings.ASYNC_VIEWS routes
+BENCHMARK_URLCONF = 'utils.benchmark_urls'
+
+
+def twin_patterns():
+    """URL patterns named '<name>_sync' and '<name>_async' for every ASYNC_VIEWS entry."""
+    patterns = []
+    for _, name, sync_view, async_view in ASYNC_VIEWS:
+        patterns += [
+            path(f'benchmark/{name}/sync/', import_string(sync_view), name=f'{name}_sync'),
+            path(f'benchmark/{name}/async/', import_string(async_view), name=f'{name}_async'),
+        ]
+    return patterns
+
+
+async def measure_concurrent(client, url, requests, concurrency):
+    """Latency percentiles and throughput of `requests` GETs of `url`, `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, statuses = [], set()
+
+    async def timed_get():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses.add(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed_get() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        'url': url,
+        'status': max(statuses),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'requests_per_s': round(requests / elapsed, 1),
+    }
+
+
+async def run_concurrency_benchmarks(users, requests=100, concurrency=(1, 8, 32), stdout=None):
+    """
+    GET the sync and async variant of every view in ASYNC_VIEWS through the
+    ASGI handler at each concurrency level; ROOT_URLCONF must be
+    BENCHMARK_URLCONF. `users` is role_users(), loaded before the event loop
+    starts. Returns {'<role> <name>_<variant> c<concurrency>': figures}.
+    """
+    results = {}
+    for role, name, _, _ in ASYNC_VIEWS:
+        user = users.get(role)
+        if user is None:
+            continue
+        client = AsyncClient(raise_request_exception=False)
+        await client.aforce_login(user)
+        try:
+            for view_name in (f"{name}_sync", f"{name}_async"):
+                url = reverse(view_name)
+                await client.get(url)
+                for level in concurrency:
+                    figures = await measure_concurrent(client, url, requests, level)
+                    results[f"{role} {view_name} c{level}"] = figures
+                    if stdout:
+                        stdout.write(
+                            f"{role:<10} {view_name:<28} c{level:<4} {figures['status']}  "
+                            f"p50 {figures['p50_ms']:>8.2f} ms  p95 {figures['p95_ms']:>8.2f} ms  "
+                            f"{figures['requests_per_s']:>7.1f} req/s"
+                        )
+        finally:
+            await client.alogout()
+    return results
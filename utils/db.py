@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+
+
+@contextmanager
+def write_lock(using=None):
+    """
+    transaction.atomic() for read-then-write transactions that race. SQLite has
+    no row locks (select_for_update is a no-op there), so on SQLite the
+    transaction starts with BEGIN IMMEDIATE: it takes the database write lock
+    up front and such transactions run one after the other instead of on stale
+    reads. Other transactions keep SQLite's deferred BEGIN, so readers do not
+    queue behind writers. Nested in an outer atomic block this is a savepoint:
+    the outer transaction has to be a write_lock() too.
+    """
+    connection = transaction.get_connection(using)
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    mode = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        # Entering the outermost block runs BEGIN with transaction_mode
+        with transaction.atomic(using=using):
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
+
+
+# Keys per statement: the WHERE of an UPDATE is one OR term per key, and
+# SQLite limits both the expression depth and the number of parameters
+COUNT_DELTA_BATCH = 50
+
+
+def apply_count_deltas(model, fields, deltas):
+    """
+    Add `deltas` ({key: delta}, a key being the values of `fields`) to the
+    `count` column of the matching `model` rows, which must be unique on
+    `fields`. Missing rows are created first (INSERT OR IGNORE, so concurrent
+    writers cannot lose a delta), then one UPDATE adds every delta: two
+    statements per batch of keys, however many rows they touch. A negative
+    delta without a row is dropped; only a rebuild can fix that count.
+    """
+    deltas = [(dict(zip(fields, key)), delta) for key, delta in deltas.items() if delta]
+    for start in range(0, len(deltas), COUNT_DELTA_BATCH):
+        batch = deltas[start:start + COUNT_DELTA_BATCH]
+        model.objects.bulk_create(
+            [model(**values, count=0) for values, delta in batch if delta > 0], ignore_conflicts=True
+        )
+        model.objects.filter(reduce(or_, (Q(**values) for values, _ in batch))).update(
+            count=F('count') + Case(*(When(Q(**values), then=Value(delta)) for values, delta in batch), default=Value(0))
+        )
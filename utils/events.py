@@ -0,0 +1,209 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Event
+
+# Server-Sent Events push channel. Each process keeps one EventHub that fans
+# events out to the streams connected to it; a broker carries the published
+# events to the hubs: straight to this process's hub (EVENT_BROKER='local',
+# one worker), or through the Event table that every worker polls
+# (EVENT_BROKER='database', several workers).
+
+Message = namedtuple('Message', 'id channel kind data')
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def group_channel(group_name):
+    return f'group:{group_name}'
+
+
+def format_event(message):
+    """The text/event-stream frame of `message`."""
+    return f"id: {message.id}\nevent: {message.kind}\ndata: {json.dumps(message.data)}\n\n"
+
+
+class Subscription:
+    def __init__(self, channels):
+        self.channels = channels
+        self.queue = asyncio.Queue(maxsize=settings.EVENT_QUEUE_SIZE)
+        # Set when the client fell behind and events were dropped: the stream
+        # ends and the browser reconnects, replaying from its Last-Event-ID
+        self.overflowed = False
+
+
+class EventHub:
+    """Fan-out of events to the subscriptions of one process, on its event loop."""
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.loop = None
+
+    def subscribe(self, channels):
+        self.loop = asyncio.get_running_loop()
+        subscription = Subscription(channels)
+        for channel in channels:
+            self.subscriptions[channel].add(subscription)
+        get_broker().listen(self)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for channel in subscription.channels:
+            subscribers = self.subscriptions.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[channel]
+
+    def deliver(self, messages):
+        """Queue `messages` for their subscribers. Runs on the hub's event loop."""
+        for message in messages:
+            for subscription in list(self.subscriptions.get(message.channel, ())):
+                try:
+                    subscription.queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    subscription.overflowed = True
+                    self.unsubscribe(subscription)
+
+    def deliver_threadsafe(self, messages):
+        loop = self.loop
+        if loop is not None and not loop.is_closed() and self.subscriptions:
+            loop.call_soon_threadsafe(self.deliver, messages)
+
+
+hub = EventHub()
+
+
+class LocalBroker:
+    """Delivers to this process's hub only; recent events are kept in memory for replay."""
+
+    def __init__(self):
+        # Ids keep growing across restarts, so an old Last-Event-ID never hides new events
+        self.ids = itertools.count(time.time_ns() // 1000)
+        self.recent = deque(maxlen=settings.EVENT_BACKLOG)
+        self.lock = threading.Lock()
+
+    def publish(self, events):
+        with self.lock:
+            messages = [Message(next(self.ids), channel, kind, data) for channel, kind, data in events]
+            self.recent.extend(messages)
+        hub.deliver_threadsafe(messages)
+
+    def replay(self, channels, last_id):
+        with self.lock:
+            return [m for m in self.recent if m.id > last_id and m.channel in channels]
+
+    def listen(self, hub):
+        pass
+
+
+class DatabaseBroker:
+    """
+    Events go through the Event table: publish() inserts them and one poller
+    per process reads the new rows every EVENT_POLL_INTERVAL seconds while
+    streams are connected, so the cost does not grow with the connections.
+    Rows older than EVENT_RETENTION are deleted by the publishers, at most
+    once a minute per process: the table only grows when events are published.
+    """
+    PRUNE_INTERVAL = 60  # seconds
+
+    def __init__(self):
+        self.poller = None
+        self.pruned_at = None
+        self.lock = threading.Lock()
+
+    def publish(self, events):
+        Event.objects.bulk_create([Event(channel=channel, kind=kind, data=data) for channel, kind, data in events])
+        with self.lock:
+            due = self.pruned_at is None or time.monotonic() - self.pruned_at > self.PRUNE_INTERVAL
+            if due:
+                self.pruned_at = time.monotonic()
+        if due:
+            self.prune()
+
+    def prune(self):
+        cutoff = timezone.now() - timedelta(seconds=settings.EVENT_RETENTION)
+        return Event.objects.filter(created_at__lt=cutoff).delete()[0]
+
+    def replay(self, channels, last_id):
+        rows = Event.objects.filter(channel__in=channels, pk__gt=last_id).order_by('pk')[:settings.EVENT_BACKLOG]
+        return [Message(row.pk, row.channel, row.kind, row.data) for row in rows]
+
+    def listen(self, hub):
+        if self.poller is None or self.poller.done():
+            # A fresh context: the poller outlives the request that started it
+            self.poller = hub.loop.create_task(self.poll(hub), context=contextvars.Context())
+
+    async def poll(self, hub):
+        last_id = (await Event.objects.order_by('-pk').values_list('pk', flat=True).afirst()) or 0
+        while hub.subscriptions:
+            await asyncio.sleep(settings.EVENT_POLL_INTERVAL)
+            rows = [row async for row in Event.objects.filter(pk__gt=last_id).order_by('pk')[:500]]
+            if rows:
+                last_id = rows[-1].pk
+                hub.deliver([Message(row.pk, row.channel, row.kind, row.data) for row in rows])
+
+
+_brokers = {'local': LocalBroker, 'database': DatabaseBroker}
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = _brokers[settings.EVENT_BROKER]()
+    return _broker
+
+
+def publish(events):
+    """
+    Publish (channel, kind, data) events once the current transaction commits,
+    so streams never announce a change that was rolled back. Does nothing
+    when EVENT_STREAM is off: there is no stream to deliver them to.
+    """
+    if not settings.EVENT_STREAM:
+        return
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: get_broker().publish(events))
+
+
+async def stream(channels, last_id=None):
+    """
+    text/event-stream of `channels`: the events after `last_id` (a reconnect),
+    then live ones, with keep-alive comments in between.
+    """
+    subscription = hub.subscribe(channels)
+    try:
+        yield "retry: 5000\n\n"
+        sent = last_id
+        if last_id is not None:
+            for message in await sync_to_async(get_broker().replay)(channels, last_id):
+                sent = message.id
+                yield format_event(message)
+        while not (subscription.overflowed and subscription.queue.empty()):
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), settings.EVENT_HEARTBEAT)
+            except TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            # Already sent by the replay
+            if sent is not None and message.id <= sent:
+                continue
+            sent = message.id
+            yield format_event(message)
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,97 @@
+import csv
+import io
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+EXPORT_HEADER = [
+    'ID', 'Title', 'Requester', 'Technician', 'Category',
+    'Priority', 'Status', 'Created At', 'Updated At'
+]
+
+# Flat columns read straight from the database; no model instances are built
+EXPORT_FIELDS = (
+    'id', 'title',
+    'created_by__first_name', 'created_by__last_name',
+    'assigned_to__first_name', 'assigned_to__last_name',
+    'category__name', 'priority__name',
+    'status', 'created_at', 'updated_at',
+)
+
+# Rows fetched from the database cursor per round trip
+EXPORT_CHUNK_SIZE = 2000
+# Rows written into each chunk of the streamed response
+ROWS_PER_WRITE = 500
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def full_name(first_name, last_name):
+    # Same result as AbstractUser.get_full_name()
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+
+def export_rows(queryset):
+    """Yield one list per request, in EXPORT_HEADER order, reading in chunks."""
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for (pk, title, requester_first, requester_last, technician_first, technician_last,
+         category, priority, status, created_at, updated_at) in rows:
+        yield [
+            pk,
+            title,
+            full_name(requester_first, requester_last),
+            full_name(technician_first, technician_last),
+            category,
+            priority or '',
+            status,
+            created_at,
+            updated_at,
+        ]
+
+
+def csv_chunks(queryset):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    for i, row in enumerate(export_rows(queryset), start=1):
+        writer.writerow(row)
+        if i % ROWS_PER_WRITE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_csv(queryset, filename):
+    """
+    Stream `queryset` as CSV. Memory stays flat whatever the row count and the
+    header reaches the client before the first database chunk is read.
+    """
+    response = StreamingHttpResponse(csv_chunks(queryset), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def write_xlsx(queryset, file):
+    """
+    Write `queryset` to `file` with a write-only workbook: rows are serialized
+    as they are appended, so only the current row is held in memory.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(EXPORT_HEADER)
+    for row in export_rows(queryset):
+        # Excel has no time zones: write the stored UTC values as naive datetimes
+        row[7] = row[7].replace(tzinfo=None)
+        row[8] = row[8].replace(tzinfo=None)
+        sheet.append(row)
+    workbook.save(file)
+
+
+def xlsx_response(queryset, filename):
+    """Build the workbook in a temporary file and stream it back in chunks."""
+    file = tempfile.TemporaryFile()
+    write_xlsx(queryset, file)
+    file.seek(0)
+    return FileResponse(file, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from xhtml2pdf import pisa
+
+from users.roles import has_group
+
+from .models import ReportJob
+from .reports import ReportFilters, period_range
+
+logger = logging.getLogger(__name__)
+
+REPORT_CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+}
+
+
+def export_dir():
+    path = Path(settings.REPORT_EXPORT_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def job_fingerprint(export_format, params, now):
+    """
+    Identity of a report: its format, filters and the created_at range its
+    period resolves to at `now`. Relative periods (hourly, daily, ...) cover
+    a different range later on, so they only match jobs of the same range.
+    """
+    filters = ReportFilters.from_query(params)
+    bounds = period_range(filters.period, now) if filters.period else (None, None)
+    payload = json.dumps({
+        'format': export_format,
+        'params': filters.params(),
+        'range': [bound.isoformat() if bound else None for bound in bounds],
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def enqueue_report(export_format, params, user):
+    """
+    Queue a report export for `user`, or return a live job for the same
+    format, filters and period range (still pending, or finished and not yet
+    expired) so its file is reused. The job stores the time it was requested
+    (`as_of`) and is rendered for that time, however long it waits in the
+    queue. Only users who may download reports can queue them.
+    """
+    if not (user.is_authenticated and has_group(user, 'admin')):
+        raise PermissionDenied("Only admins can export reports.")
+    now = timezone.now()
+    fingerprint = job_fingerprint(export_format, params, now)
+    live = (
+        ReportJob.objects.filter(fingerprint=fingerprint)
+        .filter(
+            Q(status__in=[ReportJob.STATUS_QUEUED, ReportJob.STATUS_RUNNING])
+            | Q(status=ReportJob.STATUS_DONE, expires_at__gt=timezone.now())
+        )
+        .order_by('-created_at')
+        .first()
+    )
+    if live is not None:
+        return live
+    return ReportJob.objects.create(
+        fingerprint=fingerprint,
+        export_format=export_format,
+        params={**params, 'as_of': now.isoformat()},
+        requested_by=user,
+    )
+
+
+def claim_next_job():
+    """
+    Take the oldest queued job. The status update only succeeds for one
+    worker, so several workers can poll the same queue safely.
+    """
+    while True:
+        job = ReportJob.objects.filter(status=ReportJob.STATUS_QUEUED).order_by('created_at', 'id').first()
+        if job is None:
+            return None
+        claimed = ReportJob.objects.filter(pk=job.pk, status=ReportJob.STATUS_QUEUED).update(
+            status=ReportJob.STATUS_RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def render_pdf(job, path):
+    as_of = parse_datetime(job.params.get('as_of') or '')
+    requests = ReportFilters.from_query(job.params).queryset(now=as_of)
+    html_string = render_to_string('adminn/request_reports_pdf.html', {'requests': requests})
+    with open(path, 'wb') as output:
+        pisa_status = pisa.CreatePDF(html_string, dest=output)
+    if pisa_status.err:
+        raise RuntimeError(f"PDF rendering failed with {pisa_status.err} error(s)")
+
+
+RENDERERS = {
+    'pdf': render_pdf,
+}
+
+
+def run_job(job):
+    file_name = f"{job.fingerprint}.{job.export_format}"
+    path = export_dir() / file_name
+    partial = path.with_name(f"{file_name}.{job.pk}.part")
+    try:
+        RENDERERS[job.export_format](job, partial)
+        os.replace(partial, path)
+    except Exception as exc:
+        logger.exception("Report job %s failed", job.pk)
+        partial.unlink(missing_ok=True)
+        job.status = ReportJob.STATUS_FAILED
+        job.error = str(exc)
+    else:
+        job.status = ReportJob.STATUS_DONE
+        job.file_name = file_name
+        job.expires_at = timezone.now() + timedelta(seconds=settings.REPORT_JOB_TTL)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'file_name', 'finished_at', 'expires_at'])
+    return job
+
+
+def job_file_path(job):
+    if job.status != ReportJob.STATUS_DONE or not job.file_name:
+        return None
+    path = export_dir() / job.file_name
+    return path if path.exists() else None
+
+
+def requeue_stale_jobs(stale_after):
+    """Put jobs whose worker died while running back on the queue."""
+    return ReportJob.objects.filter(
+        status=ReportJob.STATUS_RUNNING, started_at__lt=timezone.now() - stale_after
+    ).update(status=ReportJob.STATUS_QUEUED, started_at=None)
+
+
+def cleanup_expired_jobs():
+    """Delete expired and failed jobs and their files. Returns the number removed."""
+    now = timezone.now()
+    expired = ReportJob.objects.filter(
+        Q(status=ReportJob.STATUS_DONE, expires_at__lte=now)
+        | Q(status=ReportJob.STATUS_FAILED, finished_at__lte=now - timedelta(seconds=settings.REPORT_JOB_TTL))
+    )
+    # Files are shared by fingerprint: keep those a live job still points at
+    live_files = set(
+        ReportJob.objects.filter(status=ReportJob.STATUS_DONE, expires_at__gt=now)
+        .values_list('file_name', flat=True)
+    )
+    removed = 0
+    for job in expired:
+        if job.file_name and job.file_name not in live_files:
+            (export_dir() / job.file_name).unlink(missing_ok=True)
+        job.delete()
+        removed += 1
+    return removed
@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from utils.benchmarks import BENCHMARK_URLCONF, role_users, run_concurrency_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync and async dashboard and report views through the ASGI "
+        "handler at several concurrency levels (p50/p95 latency and requests per second)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help="Requests per URL and concurrency level.")
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 8, 32], help="Requests in flight at once.",
+        )
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        users = role_users()
+        if not users:
+            raise CommandError("Nothing was benchmarked: create users in the role groups first (see seed_data).")
+
+        # The ASGI handler runs the views in its own thread, outside any transaction
+        # opened here; the sessions it creates are deleted by logging out. Both
+        # variants of each view are routed whatever ASYNC_VIEWS says
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], ROOT_URLCONF=BENCHMARK_URLCONF,
+        ):
+            results = asyncio.run(run_concurrency_benchmarks(
+                users,
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                stdout=self.stdout,
+            ))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}."))
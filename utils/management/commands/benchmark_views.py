@@ -0,0 +1,76 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from service.models import ServiceRequest
+from utils.benchmarks import compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Call every service/users/utils URL as each role and record latency "
+        "percentiles, query counts and peak memory, optionally against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per URL and role.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests before timing.")
+        parser.add_argument('--only', action='append', help="Only URLs whose key contains this text (repeatable).")
+        parser.add_argument('--timeout', type=float, default=60.0, help="Seconds per URL and role before it is cut short.")
+        parser.add_argument(
+            '--max-list-rows', type=int, default=5000,
+            help="Skip the views without pagination above this many requests (0: never skip).",
+        )
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="Baseline JSON file from an earlier run.")
+        parser.add_argument('--threshold', type=float, default=0.2, help="Relative change reported as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true', help="Exit with an error on regressions.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        # Views are only called with GET, but roll back anything they write (sessions, caches rows)
+        with transaction.atomic():
+            results = run_benchmarks(
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                only=options['only'],
+                stdout=self.stdout,
+                timeout=options['timeout'],
+                max_list_rows=options['max_list_rows'] or None,
+            )
+            report = {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'service_requests': ServiceRequest.objects.count(),
+                'iterations': options['iterations'],
+                'results': results,
+            }
+            transaction.set_rollback(True)
+
+        if not results:
+            raise CommandError("Nothing was benchmarked: create users in the role groups first (see seed_data).")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}."))
+
+        if baseline is not None:
+            self.report_changes(baseline, results, options)
+
+    def report_changes(self, baseline, results, options):
+        rows = compare(baseline['results'], results, options['threshold'])
+        regressions = [row for row in rows if row[4] > 0]
+        for key, name, old, new, change in rows:
+            style = self.style.ERROR if change > 0 else self.style.SUCCESS
+            self.stdout.write(style(f"{key:<56} {name:<8} {old:>10} -> {new:<10} {change:+.0%}"))
+        if not rows:
+            self.stdout.write(self.style.SUCCESS("No changes beyond the threshold."))
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}.")
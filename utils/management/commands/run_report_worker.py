@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from utils.jobs import claim_next_job, cleanup_expired_jobs, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Render queued report exports (PDF) outside the web request."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process the current queue and exit.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--cleanup-interval', type=float, default=300.0, help="Seconds between expired-file cleanups.")
+        parser.add_argument('--stale-after', type=int, default=30, help="Minutes before a running job is considered abandoned.")
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_after'])
+        next_cleanup = 0.0
+
+        while True:
+            close_old_connections()
+            if time.monotonic() >= next_cleanup:
+                requeued = requeue_stale_jobs(stale_after)
+                removed = cleanup_expired_jobs()
+                if requeued or removed:
+                    self.stdout.write(f"Requeued {requeued} stale job(s), removed {removed} expired job(s).")
+                next_cleanup = time.monotonic() + options['cleanup_interval']
+
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            job = run_job(job)
+            if job.status == job.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(f"Job #{job.pk}: {job.file_name}"))
+            else:
+                self.stderr.write(f"Job #{job.pk} failed: {job.error}")
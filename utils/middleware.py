@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget(url_name):
+    """The most queries a view may run: QUERY_BUDGETS[url_name], else QUERY_BUDGET_DEFAULT."""
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+def fingerprint(sql):
+    return hashlib.sha1(sql.encode()).hexdigest()[:10]
+
+
+class QueryStats:
+    """
+    Database execute wrapper counting the queries of one request. Queries are
+    grouped by their SQL (placeholders, not parameters), so an N+1 shows up as
+    one fingerprint executed many times.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+        self.executions = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+            self.executions[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        """Queries that repeated an earlier query with the same parameters."""
+        return sum(n - 1 for n in self.executions.values())
+
+    def repeated(self, minimum=2):
+        """(fingerprint, times, sql) of the statements run at least `minimum` times, most frequent first."""
+        return [
+            (fingerprint(sql), times, sql)
+            for sql, times in self.statements.most_common()
+            if times >= minimum
+        ]
+
+
+# QueryStats of the async request being handled, carried into sync_to_async threads
+current_stats = ContextVar('current_stats', default=None)
+
+
+class ContextQueryStats:
+    """
+    Execute wrapper handing queries to `stats` only while its request is the
+    current one: concurrent ASGI requests share the executor thread's
+    connection and therefore each other's execute wrappers.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __call__(self, execute, sql, params, many, context):
+        if current_stats.get() is not self.stats:
+            return execute(sql, params, many, context)
+        return self.stats(execute, sql, params, many, context)
+
+
+def add_execute_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def remove_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class QueryBudgetMiddleware:
+    """
+    Count the SQL queries of every view and compare them with its budget
+    (settings.QUERY_BUDGETS by URL name). Over-budget views are logged with
+    their most repeated statements; with QUERY_BUDGET_HEADERS the figures are
+    also sent as X-Query-* response headers. Streaming responses only count
+    the queries run before streaming starts. Works in both sync and async
+    middleware chains, so async views stay async under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        return self.record(request, response, stats)
+
+    async def __acall__(self, request):
+        # Under ASGI the queries of a request run on the thread-sensitive
+        # executor thread, which has its own connection: count them there
+        stats = QueryStats()
+        wrapper = ContextQueryStats(stats)
+        token = current_stats.set(stats)
+        await sync_to_async(add_execute_wrapper)(wrapper)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_execute_wrapper)(wrapper)
+            current_stats.reset(token)
+        return self.record(request, response, stats)
+
+    def record(self, request, response, stats):
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        budget = query_budget(url_name)
+        response.query_stats = stats
+        response.query_budget = budget
+
+        if getattr(settings, 'QUERY_BUDGET_HEADERS', False):
+            response['X-Query-Count'] = str(stats.count)
+            response['X-Query-Time'] = f"{stats.time * 1000:.1f}ms"
+            response['X-Query-Duplicates'] = str(stats.duplicates)
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+
+        if budget is not None and stats.count > budget:
+            repeated = ', '.join(f"{key} x{times}" for key, times, _ in stats.repeated()[:5])
+            logger.warning(
+                "%s ran %d queries (budget %d, %.1f ms, %d duplicates) on %s. Repeated: %s",
+                url_name, stats.count, budget, stats.time * 1000, stats.duplicates, request.path, repeated or '-',
+            )
+            for key, times, sql in stats.repeated()[:5]:
+                logger.debug("%s x%d: %s", key, times, sql)
+        else:
+            logger.debug(
+                "%s ran %d queries (%.1f ms, %d duplicates) on %s",
+                url_name, stats.count, stats.time * 1000, stats.duplicates, request.path,
+            )
+        return response
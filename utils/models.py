@@ -1,3 +1,70 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ReportJob(models.Model):
+    """
+    A report export rendered off the request path by `manage.py run_report_worker`.
+    Jobs with the same fingerprint (format, filters and the period's date range)
+    share one file until it expires.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    FORMAT_CHOICES = [
+        ('pdf', 'PDF'),
+    ]
+
+    fingerprint = models.CharField(max_length=64)
+    export_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    file_name = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    expires_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reportjob_queue_idx'),
+            models.Index(fields=['fingerprint', 'status'], name='reportjob_fingerprint_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_export_format_display()} report #{self.pk} ({self.status})"
+
+    @property
+    def is_pending(self):
+        return self.status in (self.STATUS_QUEUED, self.STATUS_RUNNING)
+
+
+class Event(models.Model):
+    """
+    A pushed event on its way to the other worker processes (see utils.events).
+    Rows are read by every worker's poller and pruned after EVENT_RETENTION.
+    """
+    channel = models.CharField(max_length=64)
+    kind = models.CharField(max_length=32)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} on {self.channel} #{self.pk}"
@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from service.models import ServiceRequest
+from service.rollups import queryset_summary, request_summary
+from service.search import search_requests
+
+# Report periods offered by the filter form
+PERIODS = ('hourly', 'daily', 'weekly', 'monthly', '3months', '6months', 'annual')
+
+# Rolling periods end now; the others are calendar periods in the current time zone
+ROLLING_PERIODS = {
+    'hourly': timedelta(hours=1),
+    'weekly': timedelta(days=7),
+}
+CALENDAR_MONTHS = {
+    'monthly': 1,
+    '3months': 3,
+    '6months': 6,
+}
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def add_months(day, months):
+    """First day of the month `months` after (or before) the month of `day`."""
+    index = day.year * 12 + day.month - 1 + months
+    return day.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def period_range(period, now=None):
+    """
+    Half-open [start, end) bounds on created_at for a report period; `end` is
+    None for rolling periods. Calendar periods follow the current time zone.
+    Filtering on a plain range keeps any index on created_at usable.
+    """
+    now = now or timezone.now()
+    if period in ROLLING_PERIODS:
+        return now - ROLLING_PERIODS[period], None
+
+    today = timezone.localdate(now)
+    if period == 'daily':
+        return local_midnight(today), local_midnight(today + timedelta(days=1))
+    if period in CALENDAR_MONTHS:
+        first = add_months(today, 1 - CALENDAR_MONTHS[period])
+        return local_midnight(first), local_midnight(add_months(today, 1))
+    if period == 'annual':
+        return local_midnight(today.replace(month=1, day=1)), local_midnight(today.replace(year=today.year + 1, month=1, day=1))
+    raise ValueError(f"Unknown report period: {period}")
+
+
+def parse_id(value):
+    try:
+        pk = int(value)
+    except (TypeError, ValueError):
+        return None
+    return pk if pk > 0 else None
+
+
+@dataclass(frozen=True)
+class ReportFilters:
+    """
+    Validated report filters shared by the report page, the print view and
+    every export format. Invalid values are dropped and listed in `errors`.
+    """
+    status: str = ''
+    category: int = None
+    technician: int = None
+    period: str = ''
+    q: str = ''
+    errors: tuple = ()
+
+    @classmethod
+    def from_query(cls, query):
+        """Build filters from request.GET (or a stored params dict)."""
+        errors = []
+        statuses = [s[0] for s in ServiceRequest.STATUS_CHOICES]
+
+        status = query.get('status') or ''
+        if status and status not in statuses:
+            errors.append(f"Unknown status '{status}'.")
+            status = ''
+
+        ids = {}
+        for name in ('category', 'technician'):
+            value = query.get(name)
+            ids[name] = parse_id(value) if value else None
+            if value and ids[name] is None:
+                errors.append(f"Invalid {name} '{value}'.")
+
+        period = query.get('period') or ''
+        if period and period not in PERIODS:
+            errors.append(f"Unknown report period '{period}'.")
+            period = ''
+
+        q = (query.get('q') or '').strip()
+
+        return cls(status=status, period=period, q=q, errors=tuple(errors), **ids)
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+    def params(self):
+        """The active filters as a plain dict (stored with background jobs)."""
+        values = {
+            'status': self.status,
+            'category': self.category,
+            'technician': self.technician,
+            'period': self.period,
+            'q': self.q,
+        }
+        return {name: value for name, value in values.items() if value}
+
+    def apply(self, qs, now=None):
+        if self.status:
+            qs = qs.filter(status=self.status)
+        if self.category:
+            qs = qs.filter(category_id=self.category)
+        if self.technician:
+            qs = qs.filter(assigned_to_id=self.technician)
+        if self.period:
+            start, end = period_range(self.period, now)
+            qs = qs.filter(created_at__gte=start)
+            if end is not None:
+                qs = qs.filter(created_at__lt=end)
+        if self.q:
+            qs = search_requests(qs, self.q)
+        return qs
+
+    def queryset(self, now=None):
+        qs = ServiceRequest.objects.select_related('category', 'priority', 'assigned_to', 'created_by', 'location')
+        return self.apply(qs, now)
+
+    def summary(self, now=None):
+        """RequestSummary of the filtered requests, read from the rollups unless a search is active."""
+        now = now or timezone.now()
+        start, end = period_range(self.period, now) if self.period else (None, None)
+        if self.q:
+            return queryset_summary(self.apply(ServiceRequest.objects.all(), now), start, end, self.period, now)
+        return request_summary(
+            start, end, status=self.status, category=self.category, technician=self.technician,
+            period=self.period, now=now,
+        )
@@ -0,0 +1,31 @@
+from utils.middleware import query_budget
+
+
+def assert_within_query_budget(response, budget=None):
+    """
+    Fail when the view behind a test client `response` ran more SQL queries
+    than its budget (settings.QUERY_BUDGETS, or `budget` if given). Needs
+    utils.middleware.QueryBudgetMiddleware in MIDDLEWARE.
+    """
+    stats = getattr(response, 'query_stats', None)
+    if stats is None:
+        raise AssertionError("The response has no query stats: is QueryBudgetMiddleware installed?")
+    if budget is None:
+        budget = query_budget(response.resolver_match.url_name if response.resolver_match else None)
+    if budget is not None and stats.count > budget:
+        repeated = '\n'.join(f"  {times} x {sql}" for _, times, sql in stats.repeated()[:5])
+        raise AssertionError(
+            f"{response.request['PATH_INFO']} ran {stats.count} queries, over its budget of {budget}"
+            + (f". Repeated statements:\n{repeated}" if repeated else ".")
+        )
+    return stats
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin: self.assertWithinQueryBudget(self.client.get(url))."""
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        try:
+            return assert_within_query_budget(response, budget)
+        except AssertionError as exc:
+            raise self.failureException(str(exc)) from None
@@ -1,3 +1,313 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+
+from service.models import ServiceRequest, TechnicianProfile
+from service.tests import ServiceTestData
+
+from .benchmarks import BENCHMARK_URLCONF
+from .db import write_lock
+from .events import DatabaseBroker, publish
+from .jobs import job_fingerprint
+from .models import Event, ReportJob
+from .reports import ReportFilters, period_range
+from .testing import QueryBudgetTestMixin
+
+
+# Budgeted views that only answer POST: covered by their own tests below
+POST_ONLY_VIEWS = {'bulk_update_requests', 'auto_assign_requests'}
+
+# Query strings that take another path through a budgeted view
+BUDGET_VARIANTS = {
+    'all_requests': [{'q': 'printer'}, {'status': 'New', 'priority': '1'}],
+    'my_requests': [{'q': 'printer'}],
+    'request_reports': [{'q': 'printer'}, {'period': 'monthly', 'status': 'New'}],
+    'request_reports_async': [{'q': 'printer'}],
+    'request_reports_print': [{'q': 'printer'}, {'period': 'annual'}],
+}
+
+
+def budgeted_url_names():
+    """The URL names of settings.QUERY_BUDGETS that are routed and answer GET without arguments."""
+    names = []
+    for name in settings.QUERY_BUDGETS:
+        if name in POST_ONLY_VIEWS:
+            continue
+        try:
+            reverse(name)
+        except NoReverseMatch:
+            continue
+        names.append(name)
+    return names
+
+
+# --- Query budgets ---
+
+class QueryBudgetTests(ServiceTestData, QueryBudgetTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.manager = cls.make_user('mgr1', Group.objects.get(name='manager'))
+        cls.other_technician = cls.make_user('tech2', Group.objects.get(name='technician'))
+        # Enough rows of every status that a per-row query shows up over budget
+        statuses = ['New', 'Assigned', 'Accepted', 'In Progress', 'Awaiting Confirmation', 'Completed', 'Rejected']
+        for i in range(3 * len(statuses)):
+            status = statuses[i % len(statuses)]
+            technician = None if status == 'New' else [cls.technician, cls.other_technician][i % 2]
+            cls.make_request(
+                status=status, assigned_to=technician,
+                priority=[cls.high, cls.medium, cls.low, None][i % 4],
+            )
+        cls.profiles = []
+        for user in [cls.technician, cls.other_technician, cls.make_user('tech3', Group.objects.get(name='technician'))]:
+            profile = TechnicianProfile.objects.create(user=user)
+            profile.expertise.add(cls.category)
+            cls.profiles.append(profile)
+
+    def setUp(self):
+        # Budgets hold on a cold cache (a badge rebuilt after a new notification)
+        cache.clear()
+        patcher = mock.patch.object(self.client, 'request', side_effect=self.cold_request(self.client.request))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def cold_request(request):
+        def wrapper(**kwargs):
+            cache.clear()
+            return request(**kwargs)
+        return wrapper
+
+    def test_budgeted_views_as_every_role(self):
+        self.check_budgeted_views()
+
+    @override_settings(ROOT_URLCONF=BENCHMARK_URLCONF)
+    def test_async_variants_as_every_role(self):
+        # Routes the *_async views whatever settings.ASYNC_VIEWS says
+        self.check_budgeted_views()
+
+    def check_budgeted_views(self):
+        names = budgeted_url_names()
+        self.assertTrue(names)
+        rendered = set()
+        for user in [self.admin, self.staff, self.technician, self.manager]:
+            self.client.force_login(user)
+            for name in names:
+                for query in [{}, *BUDGET_VARIANTS.get(name, [])]:
+                    with self.subTest(user=user.username, view=name, query=query):
+                        response = self.client.get(reverse(name), query)
+                        self.assertWithinQueryBudget(response)
+                        if response.status_code != 200:
+                            continue
+                        rendered.add(name)
+                        # The next page seeks from a cursor
+                        page = response.context.get('requests')
+                        if getattr(page, 'next_cursor', None):
+                            self.assertWithinQueryBudget(
+                                self.client.get(reverse(name), {**query, 'cursor': page.next_cursor})
+                            )
+        # A budget only means something for a role that gets the page
+        self.assertEqual(sorted(set(names) - rendered), [])
+
+    def test_assign_technician(self):
+        self.client.force_login(self.admin)
+        service_request, other = self.make_request(), self.make_request()
+        url = reverse('assign_technician', args=[service_request.pk])
+        self.assertWithinQueryBudget(self.client.get(url))
+        self.assertWithinQueryBudget(self.client.post(url, {'technician': self.profiles[0].pk}))
+        url = reverse('assign_technician', args=[other.pk])
+        self.assertWithinQueryBudget(self.client.post(url, {'technician': 'auto'}))
+        self.assertFalse(ServiceRequest.objects.filter(pk__in=[service_request.pk, other.pk], status='New').exists())
+
+    def test_auto_assign_of_many_requests(self):
+        # One UPDATE per technician that gets requests, whatever their number
+        for _ in range(25):
+            self.make_request()
+        self.client.force_login(self.admin)
+        self.assertWithinQueryBudget(self.client.post(reverse('auto_assign_requests')), budget=15 + len(self.profiles))
+        self.assertFalse(ServiceRequest.objects.filter(status='New', assigned_to__isnull=True).exists())
+        self.assertEqual(
+            ServiceRequest.objects.filter(status='Assigned').values('assigned_to').distinct().count(), len(self.profiles)
+        )
+
+    def test_bulk_update_of_many_requests(self):
+        # The budget scales with the counters touched, so the rows share them
+        selected = [self.make_request(status='Assigned', assigned_to=self.technician) for _ in range(25)]
+        self.client.force_login(self.admin)
+        data = {'action': 'transition', 'status': 'New', 'selected': [str(r.pk) for r in selected]}
+        data.update({f'version_{r.pk}': r.updated_at.isoformat() for r in selected})
+        response = self.client.post(reverse('bulk_update_requests'), data)
+        self.assertWithinQueryBudget(response)
+        self.assertFalse(ServiceRequest.objects.filter(pk__in=[r.pk for r in selected]).exclude(status='New').exists())
+
+
+# --- Report exports ---
+
+class ReportAccessTests(ServiceTestData, TestCase):
+
+    def test_only_admins_reach_the_reports(self):
+        for name in ['request_reports', 'request_reports_print']:
+            with self.subTest(view=name):
+                self.client.logout()
+                response = self.client.get(reverse(name))
+                self.assertRedirects(response, f"{settings.LOGIN_URL}?next={reverse(name)}", fetch_redirect_response=False)
+                self.client.force_login(self.staff)
+                self.assertEqual(self.client.get(reverse(name)).status_code, 403)
+
+    def test_pdf_exports_are_queued_for_admins_only(self):
+        url = reverse('request_reports') + '?export=pdf'
+        self.client.get(url)
+        self.client.force_login(self.technician)
+        self.client.get(url)
+        self.assertFalse(ReportJob.objects.exists())
+
+        self.client.force_login(self.admin)
+        response = self.client.get(url)
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, reverse('report_job_status', args=[job.pk]))
+        self.assertEqual(job.requested_by, self.admin)
+
+
+# --- Report periods ---
+
+NEW_YORK = 'America/New_York'
+
+
+def local(*args):
+    """An aware datetime in the current time zone."""
+    return timezone.make_aware(datetime(*args))
+
+
+class PeriodRangeTests(ServiceTestData, TestCase):
+
+    def range_of(self, period, *now):
+        with timezone.override(NEW_YORK):
+            return period_range(period, local(*now))
+
+    def assertRange(self, period, now, start, end):
+        with timezone.override(NEW_YORK):
+            self.assertEqual(period_range(period, local(*now)), (local(*start), local(*end) if end else None))
+
+    def test_calendar_periods_in_the_current_time_zone(self):
+        for period, now, start, end in [
+            ('daily', (2026, 1, 31, 23, 59), (2026, 1, 31), (2026, 2, 1)),
+            ('daily', (2026, 2, 1, 0, 0), (2026, 2, 1), (2026, 2, 2)),
+            ('monthly', (2026, 1, 31, 23, 59), (2026, 1, 1), (2026, 2, 1)),
+            ('monthly', (2026, 12, 15), (2026, 12, 1), (2027, 1, 1)),
+            ('3months', (2026, 2, 15), (2025, 12, 1), (2026, 3, 1)),
+            ('6months', (2026, 6, 30), (2026, 1, 1), (2026, 7, 1)),
+            ('annual', (2026, 12, 31, 23, 59), (2026, 1, 1), (2027, 1, 1)),
+        ]:
+            with self.subTest(period=period, now=now):
+                self.assertRange(period, now, start, end)
+
+    def test_a_day_across_a_dst_change(self):
+        start, end = self.range_of('daily', 2026, 3, 8, 12)
+        # Compared as instants: subtracting datetimes of one zone ignores the change
+        self.assertEqual(end.timestamp() - start.timestamp(), timedelta(hours=23).total_seconds())
+
+    def test_the_local_date_decides(self):
+        # 03:00 UTC on January 1st is still December 31st in New York
+        now = datetime(2026, 1, 1, 3, tzinfo=timezone.get_fixed_timezone(0))
+        with timezone.override(NEW_YORK):
+            self.assertEqual(period_range('monthly', now)[0], local(2025, 12, 1))
+        with timezone.override('UTC'):
+            self.assertEqual(period_range('monthly', now)[0], now.replace(hour=0))
+
+    def test_rolling_periods_end_now(self):
+        now = timezone.now()
+        self.assertEqual(period_range('weekly', now), (now - timedelta(days=7), None))
+        self.assertEqual(period_range('hourly', now), (now - timedelta(hours=1), None))
+
+    def test_filters_are_half_open(self):
+        with timezone.override(NEW_YORK):
+            now = local(2026, 3, 15, 12)
+            start, end = period_range('monthly', now)
+            created = {
+                'first': start, 'last': end - timedelta(microseconds=1),
+                'before': start - timedelta(microseconds=1), 'after': end,
+            }
+            for title, created_at in created.items():
+                service_request = self.make_request(title=title)
+                ServiceRequest.objects.filter(pk=service_request.pk).update(created_at=created_at)
+            filters = ReportFilters.from_query({'period': 'monthly'})
+            self.assertEqual(sorted(filters.queryset(now).values_list('title', flat=True)), ['first', 'last'])
+            weekly = ReportFilters.from_query({'period': 'weekly'}).queryset(start + timedelta(days=7))
+            self.assertEqual(sorted(weekly.values_list('title', flat=True)), ['after', 'first', 'last'])
+
+    def test_job_fingerprint_follows_the_range(self):
+        params = {'period': 'daily'}
+        with timezone.override(NEW_YORK):
+            morning, evening = local(2026, 1, 31, 0, 0), local(2026, 1, 31, 23, 59)
+            self.assertEqual(job_fingerprint('pdf', params, morning), job_fingerprint('pdf', params, evening))
+            self.assertNotEqual(
+                job_fingerprint('pdf', params, evening), job_fingerprint('pdf', params, local(2026, 2, 1))
+            )
+            fingerprint = job_fingerprint('pdf', params, evening)
+        # The same instant is another day in UTC
+        with timezone.override('UTC'):
+            self.assertNotEqual(job_fingerprint('pdf', params, evening), fingerprint)
+
+
+# --- Event stream ---
+
+@override_settings(EVENT_BROKER='database')
+class PublishTests(TestCase):
+
+    def setUp(self):
+        # get_broker() builds the broker of EVENT_BROKER again
+        patcher = mock.patch('utils.events._broker', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def publish(self, events):
+        with self.captureOnCommitCallbacks(execute=True):
+            publish(events)
+
+    @override_settings(EVENT_STREAM=False)
+    def test_nothing_is_stored_without_the_stream(self):
+        self.publish([('user:1', 'request', {'id': 1})])
+        self.assertFalse(Event.objects.exists())
+
+    @override_settings(EVENT_STREAM=True)
+    def test_published_events_are_stored(self):
+        self.publish([('user:1', 'request', {'id': 1}), ('group:admin', 'notification', {'id': 2})])
+        self.assertEqual(Event.objects.count(), 2)
+
+    def test_publishing_prunes_expired_events(self):
+        Event.objects.create(channel='user:1', kind='request')
+        Event.objects.update(created_at=timezone.now() - timedelta(seconds=settings.EVENT_RETENTION + 1))
+        broker = DatabaseBroker()
+        broker.publish([('user:1', 'request', {'id': 1})])
+        self.assertEqual(list(Event.objects.values_list('data', flat=True)), [{'id': 1}])
+        # At most once per PRUNE_INTERVAL
+        Event.objects.update(created_at=timezone.now() - timedelta(seconds=settings.EVENT_RETENTION + 1))
+        broker.publish([('user:1', 'request', {'id': 2})])
+        self.assertEqual(Event.objects.count(), 2)
+
+
+# --- Write lock ---
+
+class WriteLockTests(TransactionTestCase):
+
+    def begins(self, block):
+        with CaptureQueriesContext(connection) as queries:
+            with block():
+                with block():
+                    pass
+        return [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+
+    def test_only_write_lock_begins_immediate(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("BEGIN IMMEDIATE is SQLite's")
+        self.assertEqual(self.begins(write_lock), ['BEGIN IMMEDIATE'])
+        self.assertEqual(self.begins(transaction.atomic), ['BEGIN'])
@@ -1,8 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 
 urlpatterns = [
-    path('reports/requests/', views.request_reports, name='request_reports'),
+    path('reports/requests/', views.request_reports_async if settings.ASYNC_VIEWS else views.request_reports, name='request_reports'),
     path('reports/requests/print/', views.request_reports_print, name='request_reports_print'),
-]
\ No newline at end of file
+    path('reports/jobs/<int:job_id>/', views.report_job_status, name='report_job_status'),
+    path('reports/jobs/<int:job_id>/download/', views.report_job_download, name='report_job_download'),
+]
+
+# The async report page under its own name too, only where it is served
+if settings.ASYNC_VIEWS:
+    urlpatterns += [
+        path('reports/requests/async/', views.request_reports_async, name='request_reports_async'),
+    ]
@@ -1,138 +1,136 @@
-import csv
-import pandas as pd
-from django.http import HttpResponse
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.contrib import messages
+from django.http import FileResponse, Http404, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
 from service.models import ServiceRequest, ServiceCategory, TechnicianProfile
 from django.core.paginator import Paginator
-from django.template.loader import render_to_string
-from xhtml2pdf import pisa
-from django.utils import timezone
-from datetime import timedelta
+from django.urls import reverse
+from .exports import stream_csv, xlsx_response
+from .jobs import REPORT_CONTENT_TYPES, enqueue_report, job_file_path
+from .models import ReportJob
+from .reports import ReportFilters
+from service.metrics import alist
+from users.decorators import group_required
 
 
+@login_required
+@group_required('admin')
 def request_reports(request):
-    qs = ServiceRequest.objects.select_related('category', 'assigned_to', 'created_by').all()
-
-    # Filters
-    status = request.GET.get('status')
-    category = request.GET.get('category')
-    technician = request.GET.get('technician')
-    period = request.GET.get('period')
+    filters = ReportFilters.from_query(request.GET)
+    qs = filters.queryset()
     export = request.GET.get('export')
 
-    if status:
-        qs = qs.filter(status=status)
-    if category:
-        qs = qs.filter(category_id=category)
-    if technician:
-        qs = qs.filter(assigned_to_id=technician)
-
-    # Period filtering (daily, weekly, monthly, etc.)
-    now = timezone.now()
-    if period == "hourly":
-        qs = qs.filter(created_at__gte=now - timedelta(hours=1))
-    elif period == "daily":
-        qs = qs.filter(created_at__date=now.date())
-    elif period == "weekly":
-        qs = qs.filter(created_at__gte=now - timedelta(days=7))
-    elif period == "monthly":
-        qs = qs.filter(created_at__month=now.month, created_at__year=now.year)
-    elif period == "annual":
-        qs = qs.filter(created_at__year=now.year)
+    if export and not filters.is_valid:
+        return HttpResponseBadRequest(' '.join(filters.errors))
 
     # Export CSV
     if export == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="service_requests.csv"'
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Title', 'Requester', 'Technician', 'Category',
-            'Priority', 'Status', 'Created At', 'Updated At'
-        ])
-        for r in qs:
-            writer.writerow([
-                r.id,
-                r.title,
-                r.created_by.get_full_name(),
-                r.assigned_to.get_full_name() if r.assigned_to else '',
-                r.category.name,
-                r.priority.name if r.priority else '',
-                r.status,
-                r.created_at,
-                r.updated_at
-            ])
-        return response
+        return stream_csv(qs, 'service_requests.csv')
 
     # Export Excel
     if export == 'excel':
-        df = pd.DataFrame([{
-            'ID': r.id,
-            'Title': r.title,
-            'Requester': r.created_by.get_full_name(),
-            'Technician': r.assigned_to.get_full_name() if r.assigned_to else '',
-            'Category': r.category.name,
-            'Priority': r.priority.name if r.priority else '',
-            'Status': r.status,
-            'Created At': r.created_at.replace(tzinfo=None),  # make naive
-            'Updated At': r.updated_at.replace(tzinfo=None),  # make naive
-        } for r in qs])
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename="service_requests.xlsx"'
-        with pd.ExcelWriter(response, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False)
-        return response
-
-    # Export PDF
+        return xlsx_response(qs, 'service_requests.xlsx')
+
+    # Export PDF: rendered by the report worker, see utils.jobs
     if export == 'pdf':
-        html_string = render_to_string('adminn/request_reports_pdf.html', {'requests': qs})
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="service_requests.pdf"'
-        pisa_status = pisa.CreatePDF(html_string, dest=response)
-        return response
+        job = enqueue_report('pdf', filters.params(), request.user)
+        return redirect('report_job_status', job_id=job.id)
+
+    for error in filters.errors:
+        messages.error(request, error)
 
     # Pagination
     paginator = Paginator(qs.order_by('-created_at'), 5)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    context = {
+    context = report_page_context(
+        request, page_obj, ServiceCategory.objects.all(), TechnicianProfile.objects.select_related('user').all(),
+        filters.summary(),
+    )
+    return render(request, 'adminn/request_reports.html', context)
+
+def report_page_context(request, page_obj, categories, technicians, summary):
+    return {
         'statuses': [s[0] for s in ServiceRequest.STATUS_CHOICES],
-        'categories': ServiceCategory.objects.all(),
-        'technicians': TechnicianProfile.objects.select_related('user').all(),
+        'categories': categories,
+        'technicians': technicians,
         'page_obj': page_obj,
-        'filters': request.GET
+        'filters': request.GET,
+        # Totals and charts come from the hourly/daily rollups (see service.rollups)
+        'summary': summary,
+        **summary.chart_context(),
     }
 
-    return render(request, 'adminn/request_reports.html', context)
+@login_required
+@group_required('admin')
+async def request_reports_async(request):
+    """request_reports for ASGI (settings.ASYNC_VIEWS). Exports go through the sync view."""
+    # The user login_required loaded, shared with the templates' request.user
+    request.user = await request.auser()
+    if request.GET.get('export'):
+        return await sync_to_async(request_reports)(request)
+
+    filters = ReportFilters.from_query(request.GET)
+    for error in filters.errors:
+        messages.error(request, error)
 
+    # Building the queryset may check for the search index, a sync database call
+    qs = (await sync_to_async(filters.queryset)()).order_by('-created_at')
+    count = await qs.acount()
+    categories = await alist(ServiceCategory.objects.all())
+    technicians = await alist(TechnicianProfile.objects.select_related('user'))
+    summary = await sync_to_async(filters.summary)()
+    paginator = Paginator(qs, 5)
+    # Already counted above; the page's rows are read while rendering
+    paginator.count = count
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = report_page_context(request, page_obj, categories, technicians, summary)
+    return await sync_to_async(render)(request, 'adminn/request_reports.html', context)
+
+@login_required
+@group_required('admin')
 def request_reports_print(request):
-    qs = ServiceRequest.objects.select_related('category', 'assigned_to', 'created_by').all()
-    # Same filters as above
-    status = request.GET.get('status')
-    category = request.GET.get('category')
-    technician = request.GET.get('technician')
-    period = request.GET.get('period')
-
-    from django.utils import timezone
-    from datetime import timedelta
-    now = timezone.now()
-    if status:
-        qs = qs.filter(status=status)
-    if category:
-        qs = qs.filter(category_id=category)
-    if technician:
-        qs = qs.filter(assigned_to_id=technician)
-    if period == "hourly":
-        qs = qs.filter(created_at__gte=now - timedelta(hours=1))
-    elif period == "daily":
-        qs = qs.filter(created_at__date=now.date())
-    elif period == "weekly":
-        qs = qs.filter(created_at__gte=now - timedelta(days=7))
-    elif period == "monthly":
-        qs = qs.filter(created_at__month=now.month, created_at__year=now.year)
-    elif period == "annual":
-        qs = qs.filter(created_at__year=now.year)
+    filters = ReportFilters.from_query(request.GET)
+    if not filters.is_valid:
+        return HttpResponseBadRequest(' '.join(filters.errors))
+    qs = filters.queryset()
 
     return render(request, 'adminn/request_reports_print.html', {'requests': qs})
+
+
+@login_required
+@group_required('admin')
+def report_job_status(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id)
+    download_url = reverse('report_job_download', args=[job.id]) if job.status == ReportJob.STATUS_DONE else None
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'id': job.id,
+            'status': job.status,
+            'error': job.error,
+            'download_url': download_url,
+            'expires_at': job.expires_at,
+        })
+
+    return render(request, 'adminn/report_job.html', {
+        'job': job,
+        'download_url': download_url,
+    })
+
+@login_required
+@group_required('admin')
+def report_job_download(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id)
+    path = job_file_path(job)
+    if path is None:
+        raise Http404("Report is not available.")
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f"service_requests.{job.export_format}",
+        content_type=REPORT_CONTENT_TYPES[job.export_format],
+    )